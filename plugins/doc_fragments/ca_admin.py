@@ -23,7 +23,7 @@ class ModuleDocFragment:
       admin_password:
         description: >
             The password to encrypt or decrypt the private key.
-            Will be passed to step-cli through a temporary file.
+            Will be passed to step-cli through a temporary file or file descriptor, see I(step_cli_secret_passing).
             Mutually exclusive with I(admin_password_file)
         type: str
       admin_password_file:
@@ -5,9 +5,33 @@ class ModuleDocFragment:
     DOCUMENTATION = r'''
     requirements:
       - C(step-cli) must be installed on the remote host. You can set the executable name/path with I(step_cli_executable).
+    notes:
+      - >
+        Whenever the module runs C(step-cli), it returns C(version_cache_hits): the number of times the cached
+        C(step-cli version) result was used instead of running the executable (0 or 1).
+      - >
+        If I(step_cli_timings=true), the module returns C(timings), also when it fails: a list with one entry per
+        C(step-cli) invocation, in the order in which they finished, starting with the C(step-cli version) check.
+        Each entry contains the command line with secret values replaced by C(********) (C(argv)), its exit code
+        (C(rc)), and its wall time and the user and system CPU time of its child processes in seconds
+        (C(wall_time), C(user_time), C(system_time)). The version check entry also contains C(probe=true) and
+        whether its result was taken from the cache (C(cached)). All other entries contain C(timed_out),
+        which is true if the command was killed because it exceeded its timeout.
     options:
       step_cli_executable:
-        description: Name (or absolute path) of the C(step-cli) executable to use
+        description: >
+          Name (or absolute path) of the C(step-cli) executable to use.
+          The result of the C(step-cli version) check is cached in C($XDG_CACHE_HOME/ansible-smallstep)
+          on the remote host (C(~/.cache/ansible-smallstep) by default)
+          and is only refreshed once the executable changes.
         default: step-cli
         type: path
+      step_cli_timings:
+        description: >
+          Record the wall time, CPU time of child processes, exit code and (redacted) arguments of every C(step-cli)
+          invocation, including the C(step-cli version) check, and return them in C(timings) (see the notes).
+          CPU times may overlap if the module runs multiple commands concurrently.
+        default: false
+        type: bool
+        version_added: '0.25.0'
     '''
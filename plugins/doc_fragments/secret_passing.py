@@ -0,0 +1,21 @@
+# Copyright: (c) 2023, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+class ModuleDocFragment:
+    DOCUMENTATION = r'''
+    options:
+      step_cli_secret_passing:
+        description: >
+          How secret values such as passwords are passed to C(step-cli).
+          If set to C(tmpfile), each secret is written to a file in a private temporary directory that is
+          removed once the command has finished.
+          If set to C(fd), secrets are written to an anonymous in-memory file (or a pipe on systems without
+          C(memfd_create)) and passed to C(step-cli) as a C(/dev/fd/N) path, so they never touch the filesystem.
+          C(fd) requires a C(/dev/fd) filesystem on the remote host, as is present on Linux and BSD systems.
+        type: str
+        choices:
+          - tmpfile
+          - fd
+        default: tmpfile
+        version_added: '0.25.0'
+    '''
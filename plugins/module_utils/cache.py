@@ -0,0 +1,90 @@
+import json
+import os
+from pathlib import Path
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+CACHE_DIR_NAME = "ansible-smallstep"
+
+
+def default_cache_dir() -> Path:
+    """Returns the directory used for host-local caches, honoring $XDG_CACHE_HOME
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / CACHE_DIR_NAME
+
+
+def file_stamp(path: str) -> Optional[Dict[str, Any]]:
+    """Build a stamp that identifies the current version of a file.
+
+    Args:
+        path (str): Path to the file. Symlinks are resolved.
+
+    Returns:
+        Optional[Dict[str, Any]]: The resolved path, inode, size and mtime of the file, or None if it can't be read
+    """
+    resolved = os.path.realpath(path)
+    try:
+        st = os.stat(resolved)
+    except OSError:
+        return None
+    return {"path": resolved, "inode": st.st_ino, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+class HostCache:
+    """A small JSON file on the managed host that persists values across module runs.
+
+    Each entry is stored together with a stamp (such as the one returned by file_stamp()) and is only
+    returned as long as the stamp still matches and, if a max_age is given, the entry is not older than that.
+    Errors while reading or writing the cache are ignored, as the cache is purely an optimization
+    and the caller can always recompute the value.
+    """
+
+    def __init__(self, name: str, directory: Optional[Path] = None) -> None:
+        self.path = (directory or default_cache_dir()) / f"{name}.json"
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _store(self, data: Dict[str, Any]) -> None:
+        try:
+            self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=f".{self.path.name}.", dir=self.path.parent)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            pass
+
+    def get(self, key: str, stamp: Dict[str, Any], max_age: Optional[float] = None) -> Any:
+        """Return the cached value for key, or None if there is no entry, the stamp has changed
+        or the entry is older than max_age seconds
+        """
+        entry = self._load().get(key)
+        if not isinstance(entry, dict) or entry.get("stamp") != stamp:
+            return None
+        if max_age is not None:
+            created = entry.get("created")
+            if not isinstance(created, (int, float)) or not 0 <= time.time() - created <= max_age:
+                return None
+        return entry.get("value")
+
+    def set(self, key: str, stamp: Dict[str, Any], value: Any) -> None:
+        data = self._load()
+        data[key] = {"stamp": stamp, "value": value, "created": time.time()}
+        self._store(data)
+
+    def invalidate(self, key: str) -> None:
+        data = self._load()
+        if data.pop(key, None) is not None:
+            self._store(data)
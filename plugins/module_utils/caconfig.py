@@ -0,0 +1,327 @@
+import codecs
+import filecmp
+import json
+import os
+import re
+import shutil
+import tempfile
+from typing import IO, AbstractSet, Any, Dict, Iterator, List, Tuple
+
+from .cache import file_stamp
+
+try:
+    import ijson
+    HAS_IJSON = True
+except ImportError:
+    HAS_IJSON = False
+
+# Read size of the pure-Python reader. Only the current chunk and the provisioner being parsed are kept in memory
+READ_CHUNK_SIZE = 64 * 1024
+PROVISIONERS_PATH = ("authority", "provisioners")
+
+# Characters that change the nesting level or start a string
+_STRUCTURE_RE = re.compile(r'["{}\[\]]')
+_WHITESPACE_RE = re.compile(r"[ \t\r\n]*")
+_SCALAR_RE = re.compile(r"[^,}\] \t\r\n]+")
+
+
+class CaConfigError(Exception):
+    pass
+
+
+class CaConfigTransaction:
+    """Stages changes to a step-ca config file in a working copy, which is written back in a single atomic step.
+
+    The working copy is created in the same directory as the config, so that relative paths in the config still resolve.
+    Point step-cli at path (e.g. with --ca-config) to make changes, then call commit() to replace the config with the
+    working copy, or close() to discard all changes. Use as a context manager to ensure that the copy is always removed.
+    """
+
+    def __init__(self, ca_config: str) -> None:
+        self.ca_config = os.path.realpath(ca_config)
+        self._stamp = file_stamp(self.ca_config)
+        if self._stamp is None:
+            raise CaConfigError(f"CA config {ca_config} does not exist")
+
+        directory, name = os.path.split(self.ca_config)
+        self.path = ""
+        try:
+            fd, self.path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+            os.close(fd)
+            shutil.copyfile(self.ca_config, self.path)
+            shutil.copymode(self.ca_config, self.path)
+            st = os.stat(self.ca_config)
+            if (st.st_uid, st.st_gid) != (os.getuid(), os.getgid()):
+                os.chown(self.path, st.st_uid, st.st_gid)
+        except OSError as e:
+            self.close()
+            raise CaConfigError(f"Could not create a working copy of CA config {ca_config}: {e}") from e
+
+    def __enter__(self) -> "CaConfigTransaction":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def commit(self) -> bool:
+        """Replace the config with the working copy
+
+        Raises:
+            CaConfigError: If the config was modified by someone else since the working copy was created
+
+        Returns:
+            bool: Whether the config was replaced. False if the working copy is identical to the config
+        """
+        if file_stamp(self.ca_config) != self._stamp:
+            raise CaConfigError(f"CA config {self.ca_config} was modified during the transaction, not overwriting it")
+        try:
+            if filecmp.cmp(self.ca_config, self.path, shallow=False):
+                return False
+            os.replace(self.path, self.ca_config)
+        except OSError as e:
+            raise CaConfigError(f"Could not write CA config {self.ca_config}: {e}") from e
+        return True
+
+    def close(self) -> None:
+        """Discard the working copy, if it still exists
+        """
+        if not self.path:
+            return
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def read_provisioners(path: str, keys: AbstractSet[str]) -> List[Dict[str, Any]]:
+    """Read the provisioners (authority.provisioners) from a step-ca configuration file.
+
+    The file is parsed incrementally, so only the provisioners are loaded into memory,
+    not other large parts of the config such as templates.
+    Each provisioner is reduced to the given top-level keys, so that callers only hold the fields they need
+    (and no secrets they don't). Of the "key" field, only the key ID ("kid") is kept.
+
+    Args:
+        path (str): Path to the ca.json file
+        keys (AbstractSet[str]): The top-level provisioner fields to keep
+
+    Raises:
+        CaConfigError: If the file can't be read or is not valid JSON
+
+    Returns:
+        List[Dict[str, Any]]: The provisioners, or an empty list if the config does not contain any
+    """
+    try:
+        with open(path, "rb") as f:
+            items = _iter_provisioners_ijson(f) if HAS_IJSON else iter_json_items(f, PROVISIONERS_PATH)
+            return [_project(provisioner, keys) for provisioner in items]
+    except OSError as e:
+        raise CaConfigError(f"Could not read CA config {path}: {e}") from e
+
+
+def _project(provisioner: Any, keys: AbstractSet[str]) -> Dict[str, Any]:
+    if not isinstance(provisioner, dict) or not isinstance(provisioner.get("name"), str):
+        raise CaConfigError("Invalid CA config: provisioners must be objects with a name")
+    projected = {k: v for k, v in provisioner.items() if k in keys}
+    # Only the key ID is needed, not the full public key
+    key = projected.pop("key", None)
+    if isinstance(key, dict) and "kid" in key:
+        projected["key"] = {"kid": key["kid"]}
+    return projected
+
+
+def _iter_provisioners_ijson(f: IO[bytes]) -> Iterator[Dict[str, Any]]:
+    try:
+        # use_float keeps numbers as int/float instead of Decimal, like the json module
+        yield from ijson.items(f, ".".join(PROVISIONERS_PATH) + ".item", use_float=True)
+    except ijson.JSONError as e:
+        raise CaConfigError(f"Invalid CA config: {e}") from e
+
+
+def iter_json_items(f: IO[bytes], path: Tuple[str, ...]) -> Iterator[Any]:
+    """Yield the items of the array at path in a JSON document, without loading the rest of the document.
+
+    Pure-Python fallback for when ijson is not available. Everything outside of the array is only scanned, not parsed.
+    If path does not exist or does not point to an array, nothing is yielded.
+
+    Raises:
+        CaConfigError: If the document is not valid JSON
+    """
+    scanner = _Scanner(f)
+    try:
+        if _find(scanner, path):
+            yield from _iter_array(scanner)
+    except ValueError as e:
+        raise CaConfigError(f"Invalid CA config: {e}") from e
+
+
+def _find(scanner: "_Scanner", path: Tuple[str, ...]) -> bool:
+    """Advance the scanner to the value at path. Returns False if the path does not exist
+    """
+    for key in path:
+        if scanner.next_char() != "{":
+            return False
+        scanner.advance(1)
+        if scanner.next_char() == "}":
+            return False
+        while True:
+            name = json.loads(scanner.read_string())
+            scanner.expect(":")
+            if name == key:
+                break
+            scanner.skip_value()
+            if scanner.next_char() == "}":
+                return False
+            scanner.expect(",")
+    return True
+
+
+def _iter_array(scanner: "_Scanner") -> Iterator[Any]:
+    if scanner.next_char() != "[":
+        return
+    scanner.advance(1)
+    if scanner.next_char() == "]":
+        return
+    while True:
+        scanner.start_capture()
+        scanner.skip_value()
+        yield json.loads(scanner.stop_capture())
+        if scanner.next_char() == "]":
+            return
+        scanner.expect(",")
+
+
+class _Scanner:
+    """Scans a UTF-8 encoded JSON document chunk by chunk, optionally capturing the text of a single value"""
+
+    def __init__(self, f: IO[bytes], chunk_size: int = READ_CHUNK_SIZE) -> None:
+        self._f = f
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._capture: List[str] = []
+        self._capturing = False
+        self._capture_start = 0
+
+    def _fill(self) -> bool:
+        """Read the next chunk. Returns False at the end of the file
+        """
+        if self._eof:
+            return False
+        data = self._f.read(self._chunk_size)
+        if not data:
+            self._eof = True
+        text = self._decoder.decode(data, final=not data)
+        if self._capturing:
+            self._capture.append(self._buf[self._capture_start:self._pos])
+            self._capture_start = 0
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        return True
+
+    def advance(self, count: int) -> None:
+        self._pos += count
+
+    def next_char(self) -> str:
+        """Skip whitespace and return the next character without consuming it
+        """
+        while True:
+            self._pos = _WHITESPACE_RE.match(self._buf, self._pos).end()  # type: ignore
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError("unexpected end of document")
+
+    def expect(self, char: str) -> None:
+        if self.next_char() != char:
+            raise ValueError(f"expected '{char}' at '{self._buf[self._pos:self._pos + 20]}'")
+        self.advance(1)
+
+    def read_string(self) -> str:
+        """Consume a string and return its raw JSON representation, including the quotes
+        """
+        return self._scan_string(keep=True)
+
+    def _scan_string(self, keep: bool) -> str:
+        if self.next_char() != '"':
+            raise ValueError(f"expected a string at '{self._buf[self._pos:self._pos + 20]}'")
+        start = self._pos
+        end = start + 1
+        while True:
+            quote = self._buf.find('"', end)
+            if quote != -1:
+                if self._escapes_before(quote, start + 1) % 2 == 0:
+                    self._pos = quote + 1
+                    return self._buf[start:self._pos] if keep else ""
+                end = quote + 1
+                continue
+            # The string continues in the next chunk. _fill() discards everything before _pos,
+            # so either keep the whole string or only the trailing backslashes, which may escape the next character
+            end = len(self._buf) - self._escapes_before(len(self._buf), start + 1)
+            self._pos = start if keep else end
+            offset = self._pos
+            if not self._fill():
+                raise ValueError("unterminated string")
+            start, end = start - offset, end - offset
+
+    def _escapes_before(self, index: int, lower: int) -> int:
+        """Count the backslashes directly before index, but not before lower
+        """
+        count = 0
+        while index - count - 1 >= max(lower, 0) and self._buf[index - count - 1] == "\\":
+            count += 1
+        return count
+
+    def skip_value(self) -> None:
+        char = self.next_char()
+        if char == '"':
+            self._scan_string(keep=False)
+        elif char in "{[":
+            self._skip_container()
+        else:
+            while True:
+                match = _SCALAR_RE.match(self._buf, self._pos)
+                end = match.end() if match else self._pos
+                if end < len(self._buf) or self._eof:
+                    if end == self._pos:
+                        raise ValueError(f"unexpected character '{char}'")
+                    self._pos = end
+                    return
+                # The value may continue in the next chunk
+                self._fill()
+
+    def _skip_container(self) -> None:
+        depth = 0
+        while True:
+            match = _STRUCTURE_RE.search(self._buf, self._pos)
+            if not match:
+                self._pos = len(self._buf)
+                if not self._fill():
+                    raise ValueError("unexpected end of document")
+                continue
+            self._pos = match.start()
+            char = match.group()
+            if char == '"':
+                self._scan_string(keep=False)
+                continue
+            self._pos += 1
+            depth += 1 if char in "{[" else -1
+            if depth == 0:
+                return
+
+    def start_capture(self) -> None:
+        """Start recording the scanned text, for example to parse a single value
+        """
+        self._capture = []
+        self._capturing = True
+        self._capture_start = self._pos
+
+    def stop_capture(self) -> str:
+        """Stop recording and return the text scanned since start_capture()
+        """
+        captured = "".join(self._capture) + self._buf[self._capture_start:self._pos]
+        self._capture = []
+        self._capturing = False
+        return captured
@@ -0,0 +1,557 @@
+import base64
+import binascii
+from dataclasses import dataclass
+import datetime
+import hashlib
+import ipaddress
+import os
+import re
+import ssl
+import warnings
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from cryptography import x509
+    from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, ed448, rsa
+    from cryptography.exceptions import InvalidSignature
+    HAS_CRYPTOGRAPHY = True
+except ImportError:
+    HAS_CRYPTOGRAPHY = False
+
+# Certificate.verify_directly_issued_by() was added in cryptography 40
+HAS_NATIVE_VERIFY = HAS_CRYPTOGRAPHY and hasattr(x509.Certificate, "verify_directly_issued_by")
+
+PEM_CERTIFICATE_RE = re.compile(
+    rb"-----BEGIN CERTIFICATE-----\s*(.+?)\s*-----END CERTIFICATE-----", re.DOTALL)
+
+# Names used by step-cli (zcrypto) for signature algorithms, keyed by OID
+SIGNATURE_ALGORITHM_NAMES = {
+    "1.2.840.113549.1.1.4": "MD5-RSA",
+    "1.2.840.113549.1.1.5": "SHA1-RSA",
+    "1.2.840.113549.1.1.10": "SHA256-RSAPSS",
+    "1.2.840.113549.1.1.11": "SHA256-RSA",
+    "1.2.840.113549.1.1.12": "SHA384-RSA",
+    "1.2.840.113549.1.1.13": "SHA512-RSA",
+    "1.2.840.10045.4.1": "ECDSA-SHA1",
+    "1.2.840.10045.4.3.2": "ECDSA-SHA256",
+    "1.2.840.10045.4.3.3": "ECDSA-SHA384",
+    "1.2.840.10045.4.3.4": "ECDSA-SHA512",
+    "1.3.101.112": "Ed25519",
+}
+EC_CURVE_NAMES = {
+    "secp256r1": "P-256",
+    "secp384r1": "P-384",
+    "secp521r1": "P-521",
+}
+KEY_USAGE_NAMES = [
+    "digital_signature", "content_commitment", "key_encipherment", "data_encipherment",
+    "key_agreement", "key_cert_sign", "crl_sign",
+]
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+MAX_CHAIN_DEPTH = 10
+
+# Parsed root certificates, keyed by file path and mtime. Shared by all verifications in one module run
+_ROOTS_CACHE: Dict[Tuple[str, int], List[Any]] = {}
+
+
+class CertificateParseError(Exception):
+    pass
+
+
+@dataclass
+class CertificateValidity:
+    """The serial number, validity period and fingerprint of a certificate
+    """
+    serial: int
+    not_before: datetime.datetime
+    not_after: datetime.datetime
+    fingerprint: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "serial": str(self.serial),
+            "not_before": self.not_before.strftime(TIME_FORMAT),
+            "not_after": self.not_after.strftime(TIME_FORMAT),
+            "fingerprint": self.fingerprint,
+        }
+
+
+def read_validity(der: bytes) -> CertificateValidity:
+    """Read the serial number and validity period of a DER-encoded certificate.
+
+    Only the first few fields of the certificate are decoded, without any dependencies outside the standard library.
+    The certificate is not verified in any way.
+
+    Raises:
+        CertificateParseError: If the data is not a valid certificate
+    """
+    try:
+        _, cert_start, _ = _der_element(der, 0, 0x30)
+        _, pos, _ = _der_element(der, cert_start, 0x30)  # tbsCertificate
+        if der[pos] == 0xa0:  # optional [0] version
+            pos = _der_element(der, pos, 0xa0)[2]
+        _, serial_start, pos = _der_element(der, pos, 0x02)
+        serial = int.from_bytes(der[serial_start:pos], "big", signed=True)
+        pos = _der_element(der, pos, 0x30)[2]  # signature algorithm
+        pos = _der_element(der, pos, 0x30)[2]  # issuer
+        _, pos, _ = _der_element(der, pos, 0x30)  # validity
+        tag, start, pos = _der_element(der, pos)
+        not_before = _der_time(tag, der[start:pos])
+        tag, start, pos = _der_element(der, pos)
+        not_after = _der_time(tag, der[start:pos])
+    except (IndexError, ValueError) as e:
+        raise CertificateParseError(f"Invalid certificate: {e}") from e
+    return CertificateValidity(serial, not_before, not_after, fingerprint(der))
+
+
+def load_validity(path: str) -> CertificateValidity:
+    """Read the serial number and validity period of the first certificate in a PEM or DER file
+
+    Raises:
+        CertificateParseError: If the file contains no certificates or they cannot be parsed
+        OSError: If the file cannot be read
+    """
+    with open(path, "rb") as f:
+        ders = split_certificates(f.read())
+    if not ders:
+        raise CertificateParseError(f"No certificates found in {path}")
+    return read_validity(ders[0])
+
+
+def try_load_validity(path: str) -> Optional[CertificateValidity]:
+    """Like load_validity(), but return None if the file does not exist or does not contain a valid certificate
+    """
+    try:
+        return load_validity(path)
+    except (OSError, CertificateParseError):
+        return None
+
+
+def _der_element(der: bytes, offset: int, expected_tag: int = -1) -> Tuple[int, int, int]:
+    """Decode the header of the DER element at offset
+
+    Returns:
+        Tuple[int, int, int]: The tag of the element and the start and end offsets of its content
+    """
+    tag, length = der[offset], der[offset + 1]
+    if expected_tag >= 0 and tag != expected_tag:
+        raise ValueError(f"unexpected tag {tag:#x} at offset {offset}, expected {expected_tag:#x}")
+    start = offset + 2
+    if length & 0x80:
+        size = length & 0x7f
+        if not 0 < size <= 4:
+            raise ValueError(f"unsupported length encoding at offset {offset}")
+        length = int.from_bytes(der[start:start + size], "big")
+        start += size
+    if start + length > len(der):
+        raise ValueError(f"element at offset {offset} exceeds the certificate")
+    return tag, start, start + length
+
+
+def _der_time(tag: int, value: bytes) -> datetime.datetime:
+    text = value.decode("ascii")
+    # strptime also accepts single-digit fields, so check the fixed length required by RFC 5280
+    if len(text) != {0x17: 13, 0x18: 15}.get(tag, len(text)):
+        raise ValueError(f"invalid time {text!r}")
+    if tag == 0x17:  # UTCTime, two-digit years are 1950-2049 (RFC 5280)
+        parsed = datetime.datetime.strptime(text, "%y%m%d%H%M%SZ")
+        if parsed.year >= 2050:
+            parsed = parsed.replace(year=parsed.year - 100)
+    elif tag == 0x18:  # GeneralizedTime
+        parsed = datetime.datetime.strptime(text, "%Y%m%d%H%M%SZ")
+    else:
+        raise ValueError(f"unexpected time tag {tag:#x}")
+    return parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+def split_certificates(data: bytes) -> List[bytes]:
+    """Extract the DER-encoded certificates from PEM or DER data
+
+    Args:
+        data (bytes): Contents of a certificate file
+
+    Returns:
+        List[bytes]: DER-encoded certificates in the order in which they appear.
+            Empty if the data contains no certificates (for example a CSR).
+    """
+    blocks = PEM_CERTIFICATE_RE.findall(data)
+    if blocks:
+        try:
+            return [base64.b64decode(b, validate=False) for b in blocks]
+        except (binascii.Error, ValueError) as e:
+            raise CertificateParseError(f"Invalid PEM data: {e}") from e
+    if b"-----BEGIN" not in data and data[:1] == b"\x30":
+        return [data]
+    return []
+
+
+def fingerprint(der: bytes) -> str:
+    """Return the hex-encoded SHA-256 fingerprint of a DER-encoded certificate, as printed by step-cli
+    """
+    return hashlib.sha256(der).hexdigest()
+
+
+def load_certificates(path: str) -> List[Any]:
+    """Load all certificates in a PEM or DER file
+
+    Raises:
+        CertificateParseError: If the file contains no certificates or they cannot be parsed
+        OSError: If the file cannot be read
+    """
+    with open(path, "rb") as f:
+        ders = split_certificates(f.read())
+    if not ders:
+        raise CertificateParseError(f"No certificates found in {path}")
+    try:
+        return [x509.load_der_x509_certificate(der) for der in ders]
+    except ValueError as e:
+        raise CertificateParseError(f"Could not parse certificate in {path}: {e}") from e
+
+
+def not_valid_before(cert) -> datetime.datetime:
+    # not_valid_before_utc was introduced in cryptography 42, older versions return naive UTC datetimes
+    if hasattr(cert, "not_valid_before_utc"):
+        return cert.not_valid_before_utc
+    return cert.not_valid_before.replace(tzinfo=datetime.timezone.utc)
+
+
+def not_valid_after(cert) -> datetime.datetime:
+    if hasattr(cert, "not_valid_after_utc"):
+        return cert.not_valid_after_utc
+    return cert.not_valid_after.replace(tzinfo=datetime.timezone.utc)
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def _int_bytes(value: int) -> bytes:
+    return value.to_bytes((value.bit_length() + 7) // 8 or 1, "big")
+
+
+def _name_to_dict(name) -> Dict[str, List[str]]:
+    keys = {
+        NameOID.COMMON_NAME: "common_name",
+        NameOID.COUNTRY_NAME: "country",
+        NameOID.DOMAIN_COMPONENT: "domain_component",
+        NameOID.EMAIL_ADDRESS: "email_address",
+        NameOID.LOCALITY_NAME: "locality",
+        NameOID.ORGANIZATION_NAME: "organization",
+        NameOID.ORGANIZATIONAL_UNIT_NAME: "organizational_unit",
+        NameOID.POSTAL_CODE: "postal_code",
+        NameOID.SERIAL_NUMBER: "serial_number",
+        NameOID.STATE_OR_PROVINCE_NAME: "province",
+        NameOID.STREET_ADDRESS: "street_address",
+    }
+    result: Dict[str, List[str]] = {}
+    for attr in name:
+        key = keys.get(attr.oid, attr.oid.dotted_string)
+        result.setdefault(key, []).append(str(attr.value))
+    return result
+
+
+def _name_to_dn(name) -> str:
+    return ", ".join(rdn.rfc4514_string() for rdn in reversed(list(name.rdns)))
+
+
+def _key_info(cert) -> Dict[str, Any]:
+    key = cert.public_key()
+    spki = key.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    info: Dict[str, Any] = {"fingerprint_sha256": hashlib.sha256(spki).hexdigest()}
+    if isinstance(key, rsa.RSAPublicKey):
+        numbers = key.public_numbers()
+        info["key_algorithm"] = {"name": "RSA"}
+        info["rsa_public_key"] = {
+            "exponent": numbers.e,
+            "modulus": _b64(_int_bytes(numbers.n)),
+            "length": key.key_size,
+        }
+    elif isinstance(key, ec.EllipticCurvePublicKey):
+        numbers = key.public_numbers()
+        info["key_algorithm"] = {"name": "ECDSA"}
+        info["ecdsa_public_key"] = {
+            "curve": EC_CURVE_NAMES.get(key.curve.name, key.curve.name),
+            "length": key.key_size,
+            "x": _b64(_int_bytes(numbers.x)),
+            "y": _b64(_int_bytes(numbers.y)),
+            "pub": _b64(key.public_bytes(serialization.Encoding.X962,
+                                         serialization.PublicFormat.UncompressedPoint)),
+        }
+    elif isinstance(key, ed25519.Ed25519PublicKey):
+        info["key_algorithm"] = {"name": "Ed25519"}
+        info["ed25519_public_key"] = {
+            "public_key": _b64(key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)),
+        }
+    elif isinstance(key, ed448.Ed448PublicKey):
+        info["key_algorithm"] = {"name": "Ed448"}
+    else:
+        info["key_algorithm"] = {"name": "unknown"}
+    return info
+
+
+def _extensions(cert) -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    eku_names = {
+        ExtendedKeyUsageOID.SERVER_AUTH: "server_auth",
+        ExtendedKeyUsageOID.CLIENT_AUTH: "client_auth",
+        ExtendedKeyUsageOID.CODE_SIGNING: "code_signing",
+        ExtendedKeyUsageOID.EMAIL_PROTECTION: "email_protection",
+        ExtendedKeyUsageOID.TIME_STAMPING: "time_stamping",
+        ExtendedKeyUsageOID.OCSP_SIGNING: "ocsp_signing",
+    }
+    for ext in cert.extensions:
+        value = ext.value
+        if isinstance(value, x509.BasicConstraints):
+            result["basic_constraints"] = {"is_ca": value.ca}
+            if value.path_length is not None:
+                result["basic_constraints"]["max_path_len"] = value.path_length
+        elif isinstance(value, x509.SubjectAlternativeName):
+            san: Dict[str, List[str]] = {}
+            for key, name_type in [("dns_names", x509.DNSName), ("email_addresses", x509.RFC822Name),
+                                   ("ip_addresses", x509.IPAddress),
+                                   ("uniform_resource_identifiers", x509.UniformResourceIdentifier)]:
+                values = [str(v) for v in value.get_values_for_type(name_type)]
+                if values:
+                    san[key] = values
+            result["subject_alt_name"] = san
+        elif isinstance(value, x509.KeyUsage):
+            usage = {}
+            for attr in KEY_USAGE_NAMES:
+                if getattr(value, attr):
+                    usage[attr] = True
+            if value.key_agreement:
+                usage["encipher_only"] = value.encipher_only
+                usage["decipher_only"] = value.decipher_only
+            result["key_usage"] = usage
+        elif isinstance(value, x509.ExtendedKeyUsage):
+            result["extended_key_usage"] = {eku_names.get(oid, oid.dotted_string): True for oid in value}
+        elif isinstance(value, x509.SubjectKeyIdentifier):
+            result["subject_key_id"] = value.digest.hex()
+        elif isinstance(value, x509.AuthorityKeyIdentifier) and value.key_identifier:
+            result["authority_key_id"] = value.key_identifier.hex()
+    return result
+
+
+def certificate_names(cert) -> List[str]:
+    """Return the deduplicated list of the subject common name(s) and all subject alternative names
+    """
+    names = [str(attr.value) for attr in cert.subject.get_attributes_for_oid(NameOID.COMMON_NAME)]
+    try:
+        san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+        for name_type in [x509.DNSName, x509.IPAddress, x509.RFC822Name, x509.UniformResourceIdentifier]:
+            names.extend(str(v) for v in san.get_values_for_type(name_type))
+    except x509.ExtensionNotFound:
+        pass
+    return list(dict.fromkeys(names))
+
+
+def certificate_to_dict(cert) -> Dict[str, Any]:
+    """Convert a certificate into a data structure that matches the output of `step certificate inspect --format json`.
+
+    Only the commonly used fields are included, step-cli may return additional information.
+    """
+    der = cert.public_bytes(serialization.Encoding.DER)
+    sig_oid = cert.signature_algorithm_oid.dotted_string
+    sig_alg = {"name": SIGNATURE_ALGORITHM_NAMES.get(sig_oid, sig_oid), "oid": sig_oid}
+    start = not_valid_before(cert)
+    end = not_valid_after(cert)
+
+    return {
+        "version": cert.version.value + 1,
+        "serial_number": str(cert.serial_number),
+        "signature_algorithm": sig_alg,
+        "issuer": _name_to_dict(cert.issuer),
+        "issuer_dn": _name_to_dn(cert.issuer),
+        "validity": {
+            "start": start.strftime(TIME_FORMAT),
+            "end": end.strftime(TIME_FORMAT),
+            "length": int((end - start).total_seconds()),
+        },
+        "subject": _name_to_dict(cert.subject),
+        "subject_dn": _name_to_dn(cert.subject),
+        "subject_key_info": _key_info(cert),
+        "extensions": _extensions(cert),
+        "signature": {
+            "signature_algorithm": sig_alg,
+            "value": _b64(cert.signature),
+            "self_signed": cert.issuer == cert.subject,
+        },
+        "fingerprint_sha1": hashlib.sha1(der).hexdigest(),  # nosec - fingerprint only
+        "fingerprint_sha256": fingerprint(der),
+        "names": certificate_names(cert),
+    }
+
+
+def certificate_summary(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce the output of certificate_to_dict() or `step certificate inspect --format json` to the fields
+    needed for an inventory of certificates: subject, SANs, end of validity and fingerprint
+    """
+    san = data.get("extensions", {}).get("subject_alt_name", {})
+    return {
+        "subject": data.get("subject_dn", ""),
+        "sans": [v for key in ("dns_names", "email_addresses", "ip_addresses", "uniform_resource_identifiers")
+                 for v in san.get(key, [])],
+        "not_after": data.get("validity", {}).get("end", ""),
+        "fingerprint": data.get("fingerprint_sha256", ""),
+    }
+
+
+def load_roots(roots: str = "") -> List[Any]:
+    """Load trusted root certificates, using the same semantics as the --roots flag of step-cli.
+
+    Args:
+        roots (str, optional): A file, comma-separated list of files or a directory containing PEM certificates.
+            If empty, the system trust store is used. Defaults to "".
+
+    Raises:
+        CertificateParseError: If no roots could be loaded
+
+    Returns:
+        List[Any]: The root certificates. Each file is only parsed once per module run (unless it changes).
+    """
+    if roots:
+        paths = [p.strip() for p in roots.split(",") if p.strip()]
+    else:
+        defaults = ssl.get_default_verify_paths()
+        paths = [p for p in [defaults.cafile, defaults.capath] if p and os.path.exists(p)][:1]
+
+    files: List[Tuple[str, bool]] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend((os.path.join(path, f), False) for f in sorted(os.listdir(path))
+                         if os.path.isfile(os.path.join(path, f)))
+        else:
+            files.append((path, True))
+
+    certs: List[Any] = []
+    for file, explicit in files:
+        try:
+            certs.extend(_load_cached_roots(file))
+        except (CertificateParseError, OSError):
+            # Directories may contain unrelated files, but explicitly listed files must be valid
+            if explicit:
+                raise
+    if not certs:
+        raise CertificateParseError(f"No root certificates found in {roots or 'system trust store'}")
+    return certs
+
+
+def _load_cached_roots(path: str) -> List[Any]:
+    key = (os.path.realpath(path), os.stat(path).st_mtime_ns)
+    if key not in _ROOTS_CACHE:
+        # System trust stores may contain legacy certificates that cause deprecation warnings in cryptography
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            _ROOTS_CACHE[key] = load_certificates(path)
+    return _ROOTS_CACHE[key]
+
+
+def _is_ca(cert) -> bool:
+    try:
+        return cert.extensions.get_extension_for_class(x509.BasicConstraints).value.ca
+    except x509.ExtensionNotFound:
+        return False
+
+
+def _issued_by(cert, issuer) -> bool:
+    try:
+        cert.verify_directly_issued_by(issuer)
+    except (ValueError, TypeError, InvalidSignature):
+        return False
+    return True
+
+
+def _validity_error(cert, now: datetime.datetime) -> str:
+    start = not_valid_before(cert)
+    end = not_valid_after(cert)
+    if now < start:
+        return (f"x509: certificate has expired or is not yet valid: current time {now.strftime(TIME_FORMAT)} "
+                f"is before {start.strftime(TIME_FORMAT)}")
+    if now > end:
+        return (f"x509: certificate has expired or is not yet valid: current time {now.strftime(TIME_FORMAT)} "
+                f"is after {end.strftime(TIME_FORMAT)}")
+    return ""
+
+
+def _hostname_error(cert, server_name: str) -> str:
+    try:
+        san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+    except x509.ExtensionNotFound:
+        return "x509: certificate relies on legacy Common Name field, use SANs instead"
+
+    try:
+        ip = ipaddress.ip_address(server_name.strip("[]"))
+        candidates = [str(v) for v in san.get_values_for_type(x509.IPAddress)]
+        if ip in san.get_values_for_type(x509.IPAddress):
+            return ""
+    except ValueError:
+        host = server_name.lower().rstrip(".")
+        candidates = san.get_values_for_type(x509.DNSName)
+        for name in candidates:
+            name = name.lower().rstrip(".")
+            if name == host:
+                return ""
+            # Wildcards only match a single, left-most label
+            if name.startswith("*.") and "." in host and host.split(".", 1)[1] == name[2:]:
+                return ""
+    if not candidates:
+        return f"x509: certificate is not valid for any names, but wanted to match {server_name}"
+    return f"x509: certificate is valid for {', '.join(candidates)}, not {server_name}"
+
+
+def _usage_error(cert) -> str:
+    try:
+        eku = cert.extensions.get_extension_for_class(x509.ExtendedKeyUsage).value
+    except x509.ExtensionNotFound:
+        return ""
+    if ExtendedKeyUsageOID.SERVER_AUTH in eku or ExtendedKeyUsageOID.ANY_EXTENDED_KEY_USAGE in eku:
+        return ""
+    return "x509: certificate specifies an incompatible key usage"
+
+
+def _find_chain(cert, intermediates: List[Any], roots: List[Any], now: datetime.datetime, depth: int = 0) -> bool:
+    if depth > MAX_CHAIN_DEPTH:
+        return False
+    for root in roots:
+        if root.subject == cert.issuer and _issued_by(cert, root):
+            return True
+    for inter in intermediates:
+        if inter is cert or inter.subject != cert.issuer or not _is_ca(inter):
+            continue
+        if _validity_error(inter, now) or not _issued_by(cert, inter):
+            continue
+        remaining = [i for i in intermediates if i is not inter]
+        if _find_chain(inter, remaining, roots, now, depth + 1):
+            return True
+    return False
+
+
+def verify_certificate(chain: List[Any], roots: List[Any], server_name: str = "") -> str:
+    """Verify a certificate the same way that step certificate verify does.
+
+    Checks the validity window, the hostname (if given) and that a signature chain exists from the
+    leaf certificate to one of the roots, using any other certificates in the chain as intermediates.
+
+    Args:
+        chain (List[Any]): The certificate to verify, optionally followed by intermediates
+        roots (List[Any]): Trusted root certificates
+        server_name (str, optional): Hostname or IP that the certificate must be valid for. Defaults to "".
+
+    Returns:
+        str: The reason why the certificate is invalid, or an empty string if it is valid
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    leaf = chain[0]
+
+    reason = _validity_error(leaf, now)
+    if not reason and server_name:
+        reason = _hostname_error(leaf, server_name)
+    if not reason:
+        reason = _usage_error(leaf)
+    if not reason:
+        trusted = leaf in roots or _find_chain(leaf, chain[1:], roots, now)
+        if not trusted:
+            reason = "x509: certificate signed by unknown authority"
+    return f"failed to verify certificate: {reason}" if reason else ""
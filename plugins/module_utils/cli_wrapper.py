@@ -1,34 +1,117 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass, field
+import os
 from pathlib import Path
+import resource
+import shutil
 import tempfile
-from typing import List, Dict, cast
+import threading
+import time
+from typing import Any, List, Dict, Optional, cast
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.text.converters import to_native
 from ansible.module_utils.compat.version import LooseVersion
 
+from .cache import HostCache, file_stamp
 from .constants import COLLECTION_VERSION, COLLECTION_MIN_STEP_CLI_VERSION, COLLECTION_REPO
 
+VERSION_CACHE_NAME = "step-cli-version"
+# Read size when capturing the output of asynchronously executed commands
+STREAM_CHUNK_SIZE = 64 * 1024
+# Module parameter that selects how secrets are passed to step-cli, see SecretFiles
+SECRET_PASSING_PARAM = "step_cli_secret_passing"
+SECRET_PASSING_TMPFILE = "tmpfile"
+SECRET_PASSING_FD = "fd"
+# Module parameter that enables recording the timings of all step-cli invocations, see StepCliExecutable
+TIMINGS_PARAM = "step_cli_timings"
+REDACTED_VALUE = "********"
+
 
 class CliError(Exception):
     pass
 
 
+class CommandTimer:
+    """Measures the wall time and the CPU time of child processes spent between its creation and record().
+
+    CPU times are taken from getrusage(RUSAGE_CHILDREN), which covers all child processes of the module
+    that have been waited for. If multiple commands run concurrently, their CPU times may therefore overlap.
+    """
+
+    def __init__(self) -> None:
+        self._start = time.monotonic()
+        self._usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    def record(self, module: AnsibleModule, argv: List[str], rc: Optional[int], **extra: Any) -> Dict[str, Any]:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return {
+            "argv": [REDACTED_VALUE if arg in module.no_log_values else str(arg) for arg in argv],
+            "rc": rc,
+            "wall_time": round(time.monotonic() - self._start, 6),
+            "user_time": round(usage.ru_utime - self._usage.ru_utime, 6),
+            "system_time": round(usage.ru_stime - self._usage.ru_stime, 6),
+            **extra,
+        }
+
+
+def parse_cli_version(version_output: str) -> Optional[str]:
+    """Extract the version number from the output of step-cli version, such as "Smallstep CLI/0.28.0 (linux/amd64)"
+
+    Returns:
+        Optional[str]: The version number, or None if the output does not have the expected format
+    """
+    parts = version_output.split(" ")
+    if len(parts) < 2 or len(parts[1].split("/")) < 2:
+        return None
+    version = parts[1].split("/")[1]
+    return version if version[:1].isdigit() else None
+
+
 class StepCliExecutable:
     """Represents the presence of a step-cli executable with a given version on the system
+
+    The output of `step-cli version` is cached on the host, keyed on the resolved path, inode, size and mtime
+    of the executable. This way, an unchanged binary is only probed once, while an upgrade is detected immediately.
+    version_cache_hits counts how often the cached result was used instead of running the executable.
+
+    If the module param step_cli_timings is set, timings is a list that receives one entry per step-cli invocation
+    (see CommandTimer), starting with the version probe. Otherwise, timings is None.
     """
 
     def __init__(self, module: AnsibleModule, executable: str = "step-cli") -> None:
         self._exec = executable
-
-        rc, stdout, stderr = module.run_command([executable, "version"])
-        if rc != 0:
-            module.fail_json(msg=f"Could not launch step-cli executable. Error: {stderr}")
+        self.version_cache_hits = 0
+        self.timings: Optional[List[Dict[str, Any]]] = [] if cast(Dict, module.params).get(TIMINGS_PARAM) else None
+
+        timer = CommandTimer()
+        resolved = shutil.which(executable)
+        stamp = file_stamp(resolved) if resolved else None
+        cache = HostCache(VERSION_CACHE_NAME)
+
+        # A corrupted or outdated cache entry is treated like a cache miss
+        cached_output = cache.get(stamp["path"], stamp) if stamp else None
+        version = parse_cli_version(cached_output) if isinstance(cached_output, str) else None
+        if version is not None:
+            self.version_cache_hits += 1
+            self.record_timing(module, timer, [executable, "version"], 0, probe=True, cached=True)
+        else:
+            rc, stdout, stderr = module.run_command([executable, "version"])
+            self.record_timing(module, timer, [executable, "version"], rc, probe=True, cached=False)
+            if rc != 0:
+                self.fail_json(module, f"Could not launch step-cli executable. Error: {stderr}")
+            version = parse_cli_version(stdout)
+            if version is None:
+                self.fail_json(module, f"Could not determine the step-cli version from its output: {stdout}")
+            # Check mode must not change the system, and that includes the cache
+            if stamp and not module.check_mode:
+                cache.set(stamp["path"], stamp, stdout)
 
         # Check whether the CLI version is supported by this collection version.
         # Performs a basic version check, as packaging may not be available on target systems.
-        cli_version = LooseVersion(stdout.split(" ")[1].split("/")[1])
+        cli_version = LooseVersion(version)
         collection_min_version = LooseVersion(COLLECTION_MIN_STEP_CLI_VERSION)
         if cli_version < collection_min_version:
             module.warn(
@@ -40,6 +123,20 @@ class StepCliExecutable:
     def path(self) -> str:
         return self._exec
 
+    def fail_json(self, module: AnsibleModule, msg: str, **kwargs: Any) -> None:
+        """Fail the module like module.fail_json(), also returning the timings recorded so far (if enabled)
+        """
+        if self.timings is not None:
+            kwargs.setdefault("timings", self.timings)
+        module.fail_json(msg, **kwargs)
+
+    def record_timing(self, module: AnsibleModule, timer: CommandTimer, argv: List[str], rc: Optional[int],
+                      **extra: Any) -> None:
+        """Add a timings entry for a finished command, if timings are enabled
+        """
+        if self.timings is not None:
+            self.timings.append(timer.record(module, argv, rc, **extra))
+
 
 @dataclass
 class CliCommandResult:
@@ -50,6 +147,80 @@ class CliCommandResult:
     stderr: str
 
 
+class SecretFiles:
+    """Provides file paths through which secret values (such as passwords) are passed to step-cli.
+
+    In "tmpfile" mode, each secret is written to a file in a private temporary directory.
+    In "fd" mode, secrets never touch the filesystem: each secret is written to an anonymous memory file
+    (memfd_create) or, where that is unavailable, to a pipe. The descriptor is inherited by step-cli,
+    which reads it through its /dev/fd/N path. The descriptors to inherit are listed in pass_fds.
+
+    Use as a context manager to ensure that all secrets are cleaned up once the command has finished.
+    """
+
+    def __init__(self, mode: str = SECRET_PASSING_TMPFILE) -> None:
+        self.mode = mode
+        self.pass_fds: List[int] = []
+        self._tmpdir: Optional[tempfile.TemporaryDirectory] = None
+
+    def __enter__(self) -> SecretFiles:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for fd in self.pass_fds:
+            os.close(fd)
+        self.pass_fds = []
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
+
+    def add(self, name: str, content: str) -> str:
+        """Store a secret and return the path that step-cli should read it from
+        """
+        if self.mode == SECRET_PASSING_FD:
+            fd = _secret_fd(name, content.encode("utf-8"))
+            self.pass_fds.append(fd)
+            return f"/dev/fd/{fd}"
+
+        # The temporary directory is only created once it is actually needed
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.TemporaryDirectory("-ansible-smallstep")
+        # Since these files may contain sensitive data, we first create the fd with locked-down permissions,
+        # then write the actual content
+        path = Path(self._tmpdir.name) / name
+        path.touch(0o700, exist_ok=False)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path.as_posix()
+
+
+def _secret_fd(name: str, content: bytes) -> int:
+    if hasattr(os, "memfd_create"):
+        try:
+            fd = os.memfd_create(f"ansible-smallstep-{name}")
+        except OSError:
+            pass
+        else:
+            try:
+                os.write(fd, content)
+                os.lseek(fd, 0, os.SEEK_SET)
+            except OSError:
+                os.close(fd)
+                raise
+            return fd
+
+    # Secrets are short, so the write can't block on a full pipe buffer
+    read_fd, write_fd = os.pipe()
+    try:
+        os.write(write_fd, content)
+    except OSError:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+    return read_fd
+
+
 @dataclass
 class CliCommandArgs:
     """Arguments to be passed to the command.
@@ -83,19 +254,25 @@ class CliCommandArgs:
                               {**self.module_tmpfile_args, **other.module_tmpfile_args}
                               )
 
-    def build(self, module: AnsibleModule, tmpdir: Path) -> List[str]:
-        args = self.args
-        module_params = cast(Dict, module.params)
+    def build(self, module: AnsibleModule, secrets: SecretFiles, params: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Build the final argument list
 
-        # Create temporary files for any parameters that need to point to files, such as password-file
-        # Since these files may contain sensitive data, we first create the fd with locked-down permissions,
-        # then write the actual content
+        Args:
+            module (AnsibleModule): The Ansible module
+            secrets (SecretFiles): Where to store the values of module_tmpfile_args
+            params (Optional[Dict[str, Any]], optional): Parameters to use instead of module.params,
+                for example when processing a single item of a list option.
+                Must use the same keys as the module argspec.
+
+        Returns:
+            List[str]: The arguments to pass to step-cli
+        """
+        args = list(self.args)
+        module_params = cast(Dict, module.params if params is None else params)
+
+        # Pass any parameters that need to point to files, such as password-file, through secret files
         for module_arg in [arg for arg in self.module_tmpfile_args if module_params[arg]]:
-            path = tmpdir / module_arg
-            path.touch(0o700, exist_ok=False)
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(module_params[module_arg])
-            args.extend([self.module_tmpfile_args[module_arg], path.as_posix()])
+            args.extend([self.module_tmpfile_args[module_arg], secrets.add(module_arg, module_params[module_arg])])
 
         # transform the values in module_params into valid step-coi arguments using module_args_params mapping
         for param_name in [arg for arg in self.module_param_args if module_params[arg]]:
@@ -126,11 +303,22 @@ class CliCommand:
                                   If false and check_mode is enabled, the invocation will exit with rc=0 and no output.
                                   Only set this on invocations that don't change the system state! Default is false
         fail_on_error(bool): Whether to run module_fail if this invocation fails. Default is true
+        params (Optional[Dict[str, Any]]): Parameters to build the arguments from instead of module.params.
+                                           See CliCommandArgs.build(). Default is None
+        raise_errors (bool): Raise a CliError instead of running module_fail if fail_on_error is set.
+                             Useful when processing multiple items, where one failure should not abort the module.
+                             Default is false
+        timeout (Optional[float]): Kill the command if it has not finished after this many seconds.
+                                   A timeout is always treated as an error, regardless of fail_on_error.
+                                   Default is None (no timeout)
     """
     executable: StepCliExecutable
     args: CliCommandArgs
     run_in_check_mode: bool = False
     fail_on_error: bool = True
+    params: Optional[Dict[str, Any]] = None
+    raise_errors: bool = False
+    timeout: Optional[float] = None
 
     def run(self, module: AnsibleModule) -> CliCommandResult:
         """Execute the command with the given step-cli executable and Ansible module
@@ -142,26 +330,156 @@ class CliCommand:
             CliCommandResult: Result of the command.
 
         Raises:
-            CliError if the module args don't match with the provided params
+            CliError if the module args don't match with the provided params, or if the command failed
+            and raise_errors is set
         """
         # use a context manager to ensure that our sensitive temporary files are *always* deleted
-        with tempfile.TemporaryDirectory("-ansible-smallstep") as tmpdir:
-            cmd = [self.executable.path] + self.args.build(module, Path(tmpdir))
+        with SecretFiles(self._secret_passing(module)) as secrets:
+            cmd = [self.executable.path] + self.args.build(module, secrets, self.params)
+
+            if module.check_mode and not self.run_in_check_mode:
+                return CliCommandResult(0, "", "")
+
+            timers: List[threading.Timer] = []
+            timed_out = threading.Event()
+
+            def start_timeout(proc) -> None:
+                def kill() -> None:
+                    timed_out.set()
+                    proc.kill()
+                timer = threading.Timer(cast(float, self.timeout), kill)
+                timer.daemon = True
+                timer.start()
+                timers.append(timer)
+
+            command_timer = CommandTimer()
+            rc, stdout, stderr = module.run_command(
+                cmd, pass_fds=secrets.pass_fds, before_communicate_callback=start_timeout if self.timeout else None)
+            for timer in timers:
+                timer.cancel()
+            self.executable.record_timing(module, command_timer, cmd, rc, timed_out=timed_out.is_set())
+
+            if timed_out.is_set():
+                self._fail(module, self._timeout_message(cmd))
+            return self._check_result(module, cmd, CliCommandResult(rc, stdout, stderr))
+
+    async def run_async(self, module: AnsibleModule) -> CliCommandResult:
+        """Execute the command asynchronously. Behaves like run(), but does not block the event loop.
+
+        stdout and stderr are read incrementally while the command runs, so commands with large outputs
+        can not stall on a full pipe. If the task running this coroutine is cancelled, the command is killed.
+
+        Args:
+            module (AnsibleModule): The Ansible module
+
+        Returns:
+            CliCommandResult: Result of the command.
+
+        Raises:
+            CliError if the module args don't match with the provided params, or if the command failed
+            and raise_errors is set
+        """
+        with SecretFiles(self._secret_passing(module)) as secrets:
+            cmd = [self.executable.path] + self.args.build(module, secrets, self.params)
 
             if module.check_mode and not self.run_in_check_mode:
                 return CliCommandResult(0, "", "")
 
-            rc, stdout, stderr = module.run_command(cmd)
-            if rc != 0 and self.fail_on_error:
-                if ("error allocating terminal" in stderr or "open /dev/tty: no such device or address" in stderr):
-                    module.fail_json(
-                        "Failed to run command: step-cli tried to open a terminal for interactive input. "
-                        "This happens when step-cli prompts for additional parameters or asks for confirmation. "
-                        "You may be missing a required parameter (such as 'force'). Check the module documentation. "
-                        "If you are sure that you provided all required parameters, you may have encountered a bug. "
-                        f"Please file an issue at {COLLECTION_REPO} if you think this is the case. "
-                        f"Failed command: \'{' '.join(cmd)}\'"
-                    )
-                else:
-                    module.fail_json(f"Error running command \'{' '.join(cmd)}\'. Error: {stderr}")
-            return CliCommandResult(rc, stdout, stderr)
+            command_timer = CommandTimer()
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd, stdin=asyncio.subprocess.DEVNULL, pass_fds=secrets.pass_fds, env=_command_env(module),
+                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            except OSError as e:
+                self._fail(module, f"Error running command \'{' '.join(cmd)}\'. Error: {e}")
+                raise  # only here to satisfy the type checker, _fail never returns
+
+            try:
+                b_stdout, b_stderr, rc = await asyncio.wait_for(asyncio.gather(
+                    _read_stream(cast(asyncio.StreamReader, proc.stdout)),
+                    _read_stream(cast(asyncio.StreamReader, proc.stderr)),
+                    proc.wait(),
+                ), self.timeout)
+            except asyncio.TimeoutError:
+                await _kill(proc)
+                self.executable.record_timing(module, command_timer, cmd, proc.returncode, timed_out=True)
+                self._fail(module, self._timeout_message(cmd))
+                raise  # only here to satisfy the type checker, _fail never returns
+            except asyncio.CancelledError:
+                await _kill(proc)
+                raise
+            self.executable.record_timing(module, command_timer, cmd, rc, timed_out=False)
+            # decode the same way module.run_command() does
+            stdout = to_native(b_stdout, errors="surrogate_or_strict")
+            stderr = to_native(b_stderr, errors="surrogate_or_strict")
+            return self._check_result(module, cmd, CliCommandResult(rc, stdout, stderr))
+
+    def _secret_passing(self, module: AnsibleModule) -> str:
+        module_params = cast(Dict, module.params if self.params is None else self.params)
+        return module_params.get(SECRET_PASSING_PARAM) or SECRET_PASSING_TMPFILE
+
+    def _timeout_message(self, cmd: List[str]) -> str:
+        return f"Command \'{' '.join(cmd)}\' did not finish within {self.timeout} seconds and was killed"
+
+    def _fail(self, module: AnsibleModule, msg: str) -> None:
+        if self.raise_errors:
+            raise CliError(msg)
+        self.executable.fail_json(module, msg)
+
+    def _check_result(self, module: AnsibleModule, cmd: List[str], res: CliCommandResult) -> CliCommandResult:
+        if res.rc != 0 and self.fail_on_error:
+            if ("error allocating terminal" in res.stderr or
+                    "open /dev/tty: no such device or address" in res.stderr):
+                self._fail(module, (
+                    "Failed to run command: step-cli tried to open a terminal for interactive input. "
+                    "This happens when step-cli prompts for additional parameters or asks for confirmation. "
+                    "You may be missing a required parameter (such as 'force'). Check the module documentation. "
+                    "If you are sure that you provided all required parameters, you may have encountered a bug. "
+                    f"Please file an issue at {COLLECTION_REPO} if you think this is the case. "
+                    f"Failed command: \'{' '.join(cmd)}\'"
+                ))
+            else:
+                self._fail(module, f"Error running command \'{' '.join(cmd)}\'. Error: {res.stderr}")
+        return res
+
+
+def _command_env(module: AnsibleModule) -> Dict[str, str]:
+    # Same environment that module.run_command() passes to its commands
+    env = os.environ.copy()
+    env.update(module.run_command_environ_update or {})
+    return env
+
+
+async def _read_stream(stream: asyncio.StreamReader) -> bytes:
+    chunks = []
+    while True:
+        chunk = await stream.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def _kill(proc: asyncio.subprocess.Process) -> None:
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+
+
+def run_commands(module: AnsibleModule, commands: List[CliCommand]) -> List[CliCommandResult]:
+    """Run multiple independent commands concurrently and wait for all of them to finish.
+    This is a blocking wrapper around CliCommand.run_async() for use in regular module code.
+
+    Args:
+        module (AnsibleModule): The Ansible module
+        commands (List[CliCommand]): The commands to run
+
+    Returns:
+        List[CliCommandResult]: The result of each command, in the same order as commands
+    """
+    async def run_all() -> List[CliCommandResult]:
+        return list(await asyncio.gather(*[command.run_async(module) for command in commands]))
+    return asyncio.run(run_all())
@@ -0,0 +1,24 @@
+import re
+from typing import Optional
+
+DURATION_RE = re.compile(r"(\d+(?:\.\d*)?|\.\d+)(ns|us|µs|μs|ms|s|m|h)")
+DURATION_UNITS = {
+    "ns": 1, "us": 10**3, "µs": 10**3, "μs": 10**3, "ms": 10**6, "s": 10**9, "m": 60 * 10**9, "h": 3600 * 10**9,
+}
+
+
+def parse_duration(value: str) -> Optional[int]:
+    """Parse a Go duration string such as "1h30m" or "-1.5h" into nanoseconds
+
+    Returns:
+        Optional[int]: The duration in nanoseconds, or None if value is not a valid duration
+    """
+    value = value.strip()
+    sign = -1 if value.startswith("-") else 1
+    if value[:1] in ("+", "-"):
+        value = value[1:]
+    if value == "0":
+        return 0
+    if not value or DURATION_RE.sub("", value):
+        return None
+    return sign * round(sum(float(num) * DURATION_UNITS[unit] for num, unit in DURATION_RE.findall(value)))
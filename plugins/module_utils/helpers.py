@@ -1,10 +1,16 @@
 from dataclasses import dataclass
+import datetime
 import json
+import os
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 from ansible.module_utils.basic import AnsibleModule
-from ..module_utils.cli_wrapper import CliCommand, StepCliExecutable, CliCommandArgs
+from ..module_utils.cli_wrapper import (
+    CliCommand, CliCommandResult, CliError, StepCliExecutable, CliCommandArgs, run_commands
+)
+from ..module_utils import certinfo, sshcert
+from ..module_utils.duration import parse_duration
 
 
 @dataclass
@@ -29,9 +35,113 @@ def get_certificate_info(
         server_name (str, optional): See step-cli docs. Defaults to "".
         roots (str, optional): See step-cli docs. Defaults to "".
 
+    Raises:
+        CliError: If step-cli has to be used and fails to inspect the certificate
+
     Returns:
         CertificateInfo: The JSON information as output by step-cli as well as validity information
     """
+    certs = load_local_certificates(path)
+    if certs is None:
+        # Neither inspection nor verification can be done natively, run both step-cli commands concurrently
+        inspect_res, verify_res = run_commands(module, [
+            inspect_certificate_command(executable, path, bundle, insecure, server_name, roots),
+            verify_certificate_command(executable, path, server_name, roots),
+        ])
+        data = parse_inspect_result(inspect_res)
+        invalid_reason = verify_result_reason(verify_res)
+        return CertificateInfo(data, not invalid_reason, invalid_reason)
+
+    data = [certinfo.certificate_to_dict(c) for c in certs] if bundle else certinfo.certificate_to_dict(certs[0])
+    invalid_reason = verify_certificate_native(certs, server_name, roots)
+    if invalid_reason is None:
+        invalid_reason = verify_certificate_cli(executable, module, path, server_name, roots)
+
+    return CertificateInfo(data, not invalid_reason, invalid_reason)
+
+
+def load_local_certificates(path: Path) -> Optional[List[Any]]:
+    """Parse a local certificate file in-process, without running step-cli.
+
+    Args:
+        path (Path): Path to the certificate
+
+    Returns:
+        Optional[List[Any]]: The certificates in the file, or None if they could not be parsed natively
+            (cryptography is missing, the path is not a local certificate file, ...)
+    """
+    if not certinfo.HAS_CRYPTOGRAPHY or not os.path.isfile(path):
+        return None
+    try:
+        return certinfo.load_certificates(str(path))
+    except (certinfo.CertificateParseError, OSError):
+        return None
+
+
+def verify_certificate_native(certs: List[Any], server_name: str = "", roots: str = "") -> Optional[str]:
+    """Verify a parsed certificate (chain) in-process.
+
+    Returns:
+        Optional[str]: The reason why the certificate is invalid, an empty string if it is valid,
+            or None if native verification is not possible and step-cli should be used instead.
+    """
+    if not certinfo.HAS_NATIVE_VERIFY:
+        return None
+    try:
+        trusted = certinfo.load_roots(roots or "")
+    except (certinfo.CertificateParseError, OSError):
+        return None
+    return certinfo.verify_certificate(certs, trusted, server_name or "")
+
+
+def verify_certificate_cli(
+    executable: StepCliExecutable, module: AnsibleModule, path: Path, server_name: str = "", roots: str = ""
+) -> str:
+    """Verify a certificate by running step certificate verify.
+
+    Returns:
+        str: The reason why the certificate is invalid as output by step-cli, or an empty string if it is valid
+    """
+    verify_cmd = verify_certificate_command(executable, path, server_name, roots)
+    return verify_result_reason(verify_cmd.run(module))
+
+
+def verify_certificate_command(
+    executable: StepCliExecutable, path: Path, server_name: str = "", roots: str = ""
+) -> CliCommand:
+    verify_args = ["certificate", "verify", path]
+    if server_name:
+        verify_args.extend(["--server-name", server_name])
+    if roots:
+        verify_args.extend(["--roots", roots])
+    return CliCommand(executable, CliCommandArgs(verify_args), run_in_check_mode=True, fail_on_error=False,
+                      raise_errors=True)
+
+
+def verify_result_reason(verify_res: CliCommandResult) -> str:
+    if verify_res.rc == 0:
+        return ""
+    return verify_res.stderr or f"step certificate verify exited with code {verify_res.rc}"
+
+
+def inspect_certificate_cli(
+    executable: StepCliExecutable, module: AnsibleModule, path: Path,
+    bundle: bool = False, insecure: bool = False, server_name: str = "", roots: str = ""
+) -> Any:
+    """Retrieve information about a certificate by running step certificate inspect.
+    Arguments are the same as for get_certificate_info()
+
+    Returns:
+        Any: The JSON information as output by step-cli
+    """
+    inspect_cmd = inspect_certificate_command(executable, path, bundle, insecure, server_name, roots)
+    return parse_inspect_result(inspect_cmd.run(module))
+
+
+def inspect_certificate_command(
+    executable: StepCliExecutable, path: Path,
+    bundle: bool = False, insecure: bool = False, server_name: str = "", roots: str = ""
+) -> CliCommand:
     inspect_args = ["certificate", "inspect", path, "--format", "json"]
     if bundle:
         inspect_args.append("--bundle")
@@ -41,50 +151,67 @@ def get_certificate_info(
         inspect_args.extend(["--server-name", server_name])
     if roots:
         inspect_args.extend(["--roots", roots])
+    return CliCommand(executable, CliCommandArgs(inspect_args), run_in_check_mode=True, raise_errors=True)
 
-    inspect_cmd = CliCommand(executable, CliCommandArgs(inspect_args), run_in_check_mode=True)
-    inspect_res = inspect_cmd.run(module)
+
+def parse_inspect_result(inspect_res: CliCommandResult) -> Any:
+    """Decode the output of step certificate inspect --format json
+
+    Raises:
+        CliError: If the output is not valid JSON
+    """
     # The docs say inspect outputs to stderr, but my shell says otherwise:
     # https://github.com/smallstep/cli/issues/1032
     try:
-        data = json.loads(inspect_res.stdout)
+        return json.loads(inspect_res.stdout)
     except json.JSONDecodeError as e:
-        module.fail_json(f"Unable to decode returned certificate information. Error: {e}")
-
-    verify_args = ["certificate", "verify", path]
-    if server_name:
-        verify_args.extend(["--server-name", server_name])
-    if roots:
-        verify_args.extend(["--roots", roots])
-    verify_cmd = CliCommand(executable, CliCommandArgs(verify_args), run_in_check_mode=True, fail_on_error=False)
-    verify_res = verify_cmd.run(module)
-    valid = verify_res.rc == 0
-    invalid_reason = "" if valid else verify_res.stderr
+        raise CliError(f"Unable to decode returned certificate information. Error: {e}") from e
 
-    return CertificateInfo(data, valid, invalid_reason)
 
 def get_ssh_renewal_info(
     executable: StepCliExecutable, module: AnsibleModule, path: Path, expires_in: str = ""
 ) -> CertificateInfo:
-    """Retrieve information about a certificate and return step-cli exit code
+    """Check whether an SSH certificate needs to be renewed.
+
+    The certificate is parsed in-process. step ssh needs-renewal is only run for certificates that
+    can't be parsed natively, such as unsupported key types.
 
     Args:
         executable (StepCliExecutable): The executable to run this command with
         module (AnsibleModule): The Ansible module
         path (Path): Path to the certificate
-        expires_in (str, optional): See step-cli docs. Defaults to "".
+        expires_in (str, optional): See step-cli docs. Defaults to "", which means that the certificate
+          needs to be renewed after two thirds of its lifetime.
 
     Returns:
-        CertificateInfo: Returns '0' if the SSH certificate needs renewal, '1' if the SSH certificate does not need renewal,
-          '2' if the SSH certificate file does not exist, and '255' for any other error.
+        CertificateInfo: valid is False if the certificate needs renewal or cannot be read, with the reason
+          in invalid_reason. data contains the certificate fields (see sshcert.SshCertificate.to_dict()),
+          or is empty if the certificate could only be checked with step-cli
     """
-    verify_args = ["ssh", "needs-renewal", path]
+    expires_in_ns = parse_duration(expires_in) if expires_in else None
+    try:
+        certificate = sshcert.load_certificate(str(path))
+    except OSError as e:
+        return CertificateInfo({}, False, f"Could not read SSH certificate: {e}")
+    except sshcert.SshCertificateParseError:
+        certificate = None
+    if certificate is not None and (not expires_in or expires_in_ns is not None):
+        threshold = None if expires_in_ns is None else datetime.timedelta(microseconds=expires_in_ns / 1000)
+        if certificate.needs_renewal(threshold):
+            return CertificateInfo(certificate.to_dict(), False,
+                                   f"Certificate expires at {certificate.to_dict()['valid_before']} "
+                                   "and needs to be renewed")
+        return CertificateInfo(certificate.to_dict(), True)
+
+    verify_args = ["ssh", "needs-renewal", str(path)]
     if expires_in:
         verify_args.extend(["--expires-in", expires_in])
-    verify_cmd = CliCommand(executable, CliCommandArgs(verify_args), run_in_check_mode=True, fail_on_error=False)
+    verify_cmd = CliCommand(executable, CliCommandArgs(verify_args), run_in_check_mode=True, fail_on_error=False,
+                            raise_errors=True)
     verify_res = verify_cmd.run(module)
-    verify_res_rc = verify_res.rc
-    valid = verify_res_rc == 0
-    invalid_reason = "" if valid else verify_res.stderr
-
-    return CertificateInfo(verify_res_rc, valid, invalid_reason)
+    # step ssh needs-renewal exits with 0 if the certificate needs renewal and with 1 if it does not
+    if verify_res.rc == 1:
+        return CertificateInfo({}, True)
+    if verify_res.rc == 0:
+        return CertificateInfo({}, False, "Certificate needs to be renewed")
+    return CertificateInfo({}, False, verify_res.stderr)
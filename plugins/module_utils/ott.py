@@ -0,0 +1,208 @@
+import base64
+import binascii
+import json
+import secrets
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+    from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+    from cryptography.hazmat.primitives.keywrap import InvalidUnwrap, aes_key_unwrap
+    HAS_CRYPTOGRAPHY = True
+except ImportError:
+    HAS_CRYPTOGRAPHY = False
+
+# Lifetime of the tokens generated by step ca token, unless --not-after is set
+DEFAULT_TOKEN_VALIDITY = 5 * 60
+
+# Key-wrapping algorithms used for JWK provisioner keys, mapped to the PBKDF2 hash and the key length in bytes
+PBES2_ALGORITHMS = {
+    "PBES2-HS256+A128KW": ("sha256", 16),
+    "PBES2-HS384+A192KW": ("sha384", 24),
+    "PBES2-HS512+A256KW": ("sha512", 32),
+}
+GCM_ENCRYPTIONS = {"A128GCM": 16, "A192GCM": 24, "A256GCM": 32}
+# Default JWS algorithm for each EC curve, if the key does not specify one
+EC_CURVE_ALGORITHMS = {"P-256": "ES256", "P-384": "ES384", "P-521": "ES512"}
+
+
+class TokenError(Exception):
+    pass
+
+
+def b64url_decode(data: str) -> bytes:
+    try:
+        return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+    except (binascii.Error, ValueError) as e:
+        raise TokenError(f"Invalid base64url data: {e}") from e
+
+
+def b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_int(data: str) -> int:
+    return int.from_bytes(b64url_decode(data), "big")
+
+
+def decrypt_jwe(token: str, password: bytes) -> bytes:
+    """Decrypt a password-protected JWE in compact serialization, such as the encryptedKey of a JWK provisioner.
+
+    Only the algorithms that step-cli uses for provisioner keys are supported (PBES2 key wrapping with AES-GCM).
+
+    Raises:
+        TokenError: If the JWE is invalid, uses an unsupported algorithm or the password is wrong
+    """
+    parts = token.split(".")
+    if len(parts) != 5:
+        raise TokenError("Invalid JWE: expected five parts in compact serialization")
+    try:
+        header = json.loads(b64url_decode(parts[0]))
+    except ValueError as e:
+        raise TokenError(f"Invalid JWE header: {e}") from e
+    if header.get("alg") not in PBES2_ALGORITHMS or header.get("enc") not in GCM_ENCRYPTIONS:
+        raise TokenError(f"Unsupported JWE algorithm: {header.get('alg')}/{header.get('enc')}")
+
+    hash_name, key_length = PBES2_ALGORITHMS[header["alg"]]
+    salt = header["alg"].encode("utf-8") + b"\x00" + b64url_decode(header.get("p2s", ""))
+    try:
+        kdf = PBKDF2HMAC(getattr(hashes, hash_name.upper())(), key_length, salt, int(header.get("p2c", 0)))
+        cek = aes_key_unwrap(kdf.derive(password), b64url_decode(parts[1]))
+        if len(cek) != GCM_ENCRYPTIONS[header["enc"]]:
+            raise TokenError("Invalid JWE: content encryption key has the wrong length")
+        return AESGCM(cek).decrypt(b64url_decode(parts[2]), b64url_decode(parts[3]) + b64url_decode(parts[4]),
+                                   parts[0].encode("ascii"))
+    except (InvalidUnwrap, InvalidTag) as e:
+        raise TokenError("Could not decrypt JWE: incorrect password or corrupted data") from e
+    except (TypeError, ValueError) as e:
+        raise TokenError(f"Invalid JWE: {e}") from e
+
+
+class JwkSigner:
+    """Signs JWTs with a private JWK, as used by JWK provisioners.
+
+    EC (ES256/ES384/ES512), RSA (RS256) and Ed25519 (EdDSA) keys are supported.
+    The key is only held in memory, so a signer can be reused for all tokens generated during one module run.
+    """
+
+    def __init__(self, jwk: Dict[str, Any]) -> None:
+        self.kid: Optional[str] = jwk.get("kid")
+        try:
+            if jwk.get("kty") == "EC" and jwk.get("crv") in EC_CURVE_ALGORITHMS:
+                self.alg = jwk.get("alg") or EC_CURVE_ALGORITHMS[jwk["crv"]]
+                curve = {"P-256": ec.SECP256R1, "P-384": ec.SECP384R1, "P-521": ec.SECP521R1}[jwk["crv"]]()
+                self._key: Any = ec.derive_private_key(_b64url_int(jwk["d"]), curve)
+                self._size = (curve.key_size + 7) // 8
+            elif jwk.get("kty") == "OKP" and jwk.get("crv") == "Ed25519":
+                self.alg = "EdDSA"
+                self._key = ed25519.Ed25519PrivateKey.from_private_bytes(b64url_decode(jwk["d"]))
+            elif jwk.get("kty") == "RSA":
+                self.alg = jwk.get("alg") or "RS256"
+                public = rsa.RSAPublicNumbers(_b64url_int(jwk["e"]), _b64url_int(jwk["n"]))
+                self._key = rsa.RSAPrivateNumbers(
+                    _b64url_int(jwk["p"]), _b64url_int(jwk["q"]), _b64url_int(jwk["d"]), _b64url_int(jwk["dp"]),
+                    _b64url_int(jwk["dq"]), _b64url_int(jwk["qi"]), public).private_key()
+            else:
+                raise TokenError(f"Unsupported JWK key type: {jwk.get('kty')} {jwk.get('crv', '')}".rstrip())
+        except (KeyError, ValueError) as e:
+            raise TokenError(f"Invalid JWK: {e}") from e
+        if self.alg not in ("ES256", "ES384", "ES512", "RS256", "EdDSA"):
+            raise TokenError(f"Unsupported JWS algorithm: {self.alg}")
+
+    @classmethod
+    def from_encrypted(cls, encrypted_key: str, password: bytes) -> "JwkSigner":
+        """Create a signer from the encryptedKey of a JWK provisioner
+        """
+        try:
+            jwk = json.loads(decrypt_jwe(encrypted_key, password))
+        except ValueError as e:
+            raise TokenError(f"Invalid JWK: {e}") from e
+        return cls(jwk)
+
+    def sign(self, claims: Dict[str, Any]) -> str:
+        """Return a compact JWS containing the claims
+        """
+        header = {"alg": self.alg, "kid": self.kid, "typ": "JWT"}
+        signing_input = ".".join(b64url_encode(json.dumps(part, separators=(",", ":")).encode("utf-8"))
+                                 for part in (header, claims))
+        data = signing_input.encode("ascii")
+        if self.alg == "EdDSA":
+            signature = self._key.sign(data)
+        elif self.alg == "RS256":
+            signature = self._key.sign(data, padding.PKCS1v15(), hashes.SHA256())
+        else:
+            hash_algorithm = {"ES256": hashes.SHA256, "ES384": hashes.SHA384, "ES512": hashes.SHA512}[self.alg]()
+            r, s = decode_dss_signature(self._key.sign(data, ec.ECDSA(hash_algorithm)))
+            signature = r.to_bytes(self._size, "big") + s.to_bytes(self._size, "big")
+        return f"{signing_input}.{b64url_encode(signature)}"
+
+
+def decode_claims(token: str) -> Dict[str, Any]:
+    """Return the claims of a JWT without verifying its signature
+
+    Raises:
+        TokenError: If the token is not a valid JWT
+    """
+    parts = token.strip().split(".")
+    if len(parts) != 3:
+        raise TokenError("Invalid JWT: expected three parts in compact serialization")
+    try:
+        claims = json.loads(b64url_decode(parts[1]))
+    except ValueError as e:
+        raise TokenError(f"Invalid JWT claims: {e}") from e
+    if not isinstance(claims, dict):
+        raise TokenError("Invalid JWT claims: not an object")
+    return claims
+
+
+def token_audience_path(ssh: bool = False, revoke: bool = False, renew: bool = False, rekey: bool = False) -> str:
+    """Return the path of the CA API endpoint that a token authorizes
+    """
+    endpoint = "revoke" if revoke else "renew" if renew else "rekey" if rekey else "sign"
+    return f"/1.0/{'ssh/' if ssh else ''}{endpoint}"
+
+
+def token_audience(ca_url: str, ssh: bool = False, revoke: bool = False, renew: bool = False,
+                   rekey: bool = False) -> str:
+    """Return the audience of a token, which is the URL of the CA API endpoint that the token authorizes
+    """
+    if "://" not in ca_url:
+        ca_url = f"https://{ca_url}"
+    return ca_url.rstrip("/") + token_audience_path(ssh, revoke, renew, rekey)
+
+
+def token_claims(issuer: str, subject: str, audience: str, root_fingerprint: str, sans: Optional[List[str]] = None,
+                 ssh: Optional[Dict[str, Any]] = None, now: Optional[int] = None) -> Dict[str, Any]:
+    """Build the claims of a provisioner token, like step ca token does.
+
+    Args:
+        issuer (str): Name of the provisioner
+        subject (str): Subject of the token (the certificate name, SSH key ID or serial number to revoke)
+        audience (str): See token_audience()
+        root_fingerprint (str): SHA-256 fingerprint of the root certificate of the CA
+        sans (Optional[List[str]], optional): SANs authorized by the token. Defaults to None.
+        ssh (Optional[Dict[str, Any]], optional): SSH certificate options (certType, keyID, principals, ...).
+            Defaults to None.
+        now (Optional[int], optional): Issue time as a Unix timestamp. Defaults to the current time.
+    """
+    now = int(time.time()) if now is None else now
+    claims: Dict[str, Any] = {
+        "iss": issuer,
+        "sub": subject,
+        "aud": audience,
+        "iat": now,
+        "nbf": now,
+        "exp": now + DEFAULT_TOKEN_VALIDITY,
+        "jti": secrets.token_hex(32),
+        "sha": root_fingerprint,
+    }
+    if sans is not None:
+        claims["sans"] = sans
+    if ssh is not None:
+        claims["step"] = {"ssh": ssh}
+    return claims
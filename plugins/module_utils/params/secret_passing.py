@@ -0,0 +1,31 @@
+# Copyright: (c) 2023, Max Hösel <ansible@maxhoesel.de>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from typing import Dict, Any
+
+from ansible.module_utils.basic import AnsibleModule
+
+from ..cli_wrapper import CliCommandArgs, SECRET_PASSING_PARAM, SECRET_PASSING_TMPFILE, SECRET_PASSING_FD
+from .params_helper import ParamsHelper
+
+
+class SecretPassingParams(ParamsHelper):
+    """Selects how secret module params (such as passwords) are passed to step-cli.
+    The param is read by CliCommand directly, so this helper does not add any CLI args.
+    """
+
+    argument_spec: Dict[str, Dict[str, Any]] = {
+        SECRET_PASSING_PARAM: dict(type="str", choices=[SECRET_PASSING_TMPFILE, SECRET_PASSING_FD],
+                                   default=SECRET_PASSING_TMPFILE),
+    }
+
+    @classmethod
+    def cli_args(cls) -> CliCommandArgs:
+        return CliCommandArgs([])
+
+    # pylint: disable=useless-parent-delegation
+    def __init__(self, module: AnsibleModule) -> None:
+        super().__init__(module)
+
+    def check(self):
+        pass
@@ -0,0 +1,29 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def map_parallel(func: Callable[[T], R], items: Sequence[T], max_workers: int = 1) -> List[R]:
+    """Apply func to each item using a bounded pool of worker threads.
+
+    Intended for independent step-cli invocations, where most of the time is spent waiting for the CA.
+    Results are returned in the order of items, regardless of the order in which the workers finish.
+    func must not call module.fail_json(): it exits with the result of the single failing item and raises SystemExit,
+    which map_parallel re-raises, ending the whole module run without the results of the other items.
+    Raise an exception (such as CliError) and catch it per item, or return an error result instead.
+
+    Args:
+        func (Callable[[T], R]): Function to apply to each item
+        items (Sequence[T]): The items to process
+        max_workers (int, optional): Maximum number of concurrent workers. Values below 2 process all
+            items sequentially in the calling thread. Defaults to 1.
+
+    Returns:
+        List[R]: The result of func for each item, in input order
+    """
+    if max_workers < 2 or len(items) < 2:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(func, items))
@@ -0,0 +1,488 @@
+import base64
+import binascii
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple, cast
+
+from ansible.module_utils.basic import AnsibleModule
+
+from .cache import HostCache, file_stamp
+from .caconfig import CaConfigError, read_provisioners
+from .cli_wrapper import CliCommand, CliCommandArgs, CliError, StepCliExecutable
+from .duration import parse_duration
+from .params.ca_admin import AdminParams
+
+PROVISIONER_CACHE_NAME = "step-ca-provisioners"
+
+# Maps module params to the field in the provisioner JSON (as output by `step ca provisioner list`) that they set,
+# and to how the values are compared:
+#   - bool: only true is compared, as false values are never passed to step-cli
+#   - str/int: compared as strings
+#   - list: compared ignoring order
+#   - duration: Go duration strings, compared by their value (e.g. "24h" == "24h0m0s")
+#   - file: a file whose content is stored base64-encoded in the JSON
+#   - template: a template file, stored either as a path (templateFile) or inline (template)
+#   - json_file: a JSON file whose content is stored as-is in the JSON
+PROVISIONER_FIELDS: Dict[str, Tuple[Tuple[str, ...], str]] = {
+    "allow_renewal_after_expiry": (("claims", "allowRenewalAfterExpiry"), "bool"),
+    "aws_accounts": (("accounts",), "list"),
+    "azure_audience": (("audience",), "str"),
+    "azure_object_ids": (("objectIDs",), "list"),
+    "azure_resource_groups": (("resourceGroups",), "list"),
+    "azure_subscription_ids": (("subscriptionIDs",), "list"),
+    "azure_tenant": (("tenantID",), "str"),
+    "disable_custom_sans": (("disableCustomSANs",), "bool"),
+    "disable_renewal": (("claims", "disableRenewal"), "bool"),
+    "disable_trust_on_first_use": (("disableTrustOnFirstUse",), "bool"),
+    "force_cn": (("forceCN",), "bool"),
+    "gcp_projects": (("projectIDs",), "list"),
+    "gcp_service_accounts": (("serviceAccounts",), "list"),
+    "instance_age": (("instanceAge",), "duration"),
+    "nebula_root": (("roots",), "file"),
+    "oidc_admins": (("admins",), "list"),
+    "oidc_client_id": (("clientID",), "str"),
+    "oidc_client_secret": (("clientSecret",), "str"),
+    "oidc_configuration_endpoint": (("configurationEndpoint",), "str"),
+    "oidc_groups": (("groups",), "list"),
+    "oidc_listen_address": (("listenAddress",), "str"),
+    "oidc_tenant_id": (("tenantID",), "str"),
+    "require_eab": (("requireEAB",), "bool"),
+    "scep_capabilities": (("capabilities",), "str"),
+    "scep_challenge": (("challenge",), "str"),
+    "scep_encryption_algorithm_identifier": (("encryptionAlgorithmIdentifier",), "int"),
+    "scep_include_root": (("includeRoot",), "bool"),
+    "scep_min_public_key_length": (("minimumPublicKeyLength",), "int"),
+    "ssh": (("claims", "enableSSHCA"), "bool"),
+    "ssh_host_min_dur": (("claims", "minHostSSHCertDuration"), "duration"),
+    "ssh_host_max_dur": (("claims", "maxHostSSHCertDuration"), "duration"),
+    "ssh_host_default_dur": (("claims", "defaultHostSSHCertDuration"), "duration"),
+    "ssh_user_min_dur": (("claims", "minUserSSHCertDuration"), "duration"),
+    "ssh_user_max_dur": (("claims", "maxUserSSHCertDuration"), "duration"),
+    "ssh_user_default_dur": (("claims", "defaultUserSSHCertDuration"), "duration"),
+    "ssh_template": (("options", "ssh"), "template"),
+    "ssh_template_data": (("options", "ssh", "templateData"), "json_file"),
+    "x509_template": (("options", "x509"), "template"),
+    "x509_template_data": (("options", "x509", "templateData"), "json_file"),
+    "x509_min_dur": (("claims", "minTLSCertDuration"), "duration"),
+    "x509_max_dur": (("claims", "maxTLSCertDuration"), "duration"),
+    "x509_default_dur": (("claims", "defaultTLSCertDuration"), "duration"),
+    "x5c_root": (("roots",), "file"),
+}
+# Params whose effect can't be determined from the provisioner JSON, such as key material.
+# Setting any of these always causes an update.
+OPAQUE_PARAMS = ["jwk_create", "jwk_private_key", "password", "password_file"]
+# Params whose values must not be returned in a diff
+SECRET_PARAMS = ["oidc_client_secret", "password", "scep_challenge"]
+SECRET_VALUE = "********"
+# Fields of the provisioner JSON that contain secrets. They are never written to the provisioner cache
+SECRET_FIELDS = ("clientSecret", "challenge", "encryptedKey")
+# Top-level provisioner fields read from the CA config if the CA is offline: the name and type, the key ID,
+# and the non-secret fields compared by provisioner_diff()
+OFFLINE_PROVISIONER_KEYS = frozenset(
+    {"name", "type", "key", "publicKeys"} | {path[0] for path, _ in PROVISIONER_FIELDS.values()}
+) - frozenset(SECRET_FIELDS)
+
+# We cannot use the default connection module util, as that one includes the --offline flag,
+# which is not valid for the provisioner API call
+CONNECTION_CLIARG_MAP = {
+    "ca_config": "--ca-config",
+    "ca_url": "--ca-url",
+    "root": "--root"
+}
+
+CREATE_UPDATE_CLIARGS = {
+    "allow_renewal_after_expiry": "--allow-renewal-after-expiry",
+    "aws_accounts": "--aws-account",
+    "azure_audience": "--azure-audience",
+    "azure_object_ids": "--azure-object-id",
+    "azure_resource_groups": "--azure-resource-group",
+    "azure_subscription_ids": "--azure-subscription-id",
+    "azure_tenant": "--azure-tenant",
+    "disable_custom_sans": "--disable-custom-sans",
+    "disable_renewal": "--disable-renewal",
+    "disable_trust_on_first_use": "--disable-trust-on-first-use",
+    "force_cn": "--force-cn",
+    "gcp_projects": "--gcp-project",
+    "gcp_service_accounts": "--gcp-service-account",
+    "instance_age": "--instance-age",
+    "jwk_create": "--create",
+    "jwk_private_key": "--private-key",
+    "nebula_root": "--nebula-root",
+    "oidc_admins": "--admin",
+    "oidc_client_id": "--client-id",
+    "oidc_client_secret": "--client-secret",
+    "oidc_configuration_endpoint": "--configuration-endpoint",
+    "oidc_groups": "--group",
+    "oidc_listen_address": "--listen-address",
+    "oidc_tenant_id": "--tenant-id",
+    "password_file": "--password-file",
+    "public_key": "--public-key",
+    "require_eab": "--require-eab",
+    "scep_capabilities": "--capabilities",
+    "scep_challenge": "--challenge",
+    "scep_encryption_algorithm_identifier": "--encryption-algorithm-identifier",
+    "scep_include_root": "--include-root",
+    "scep_min_public_key_length": "--min-public-key-length",
+    "ssh": "--ssh",
+    "ssh_host_min_dur": "--ssh-host-min-dur",
+    "ssh_host_max_dur": "--ssh-host-max-dur",
+    "ssh_host_default_dur": "--ssh-host-default-dur",
+    "ssh_user_min_dur": "--ssh-user-min-dur",
+    "ssh_user_max_dur": "--ssh-user-max-dur",
+    "ssh_user_default_dur": "--ssh-user-default-dur",
+    "ssh_template": "--ssh-template",
+    "ssh_template_data": "--ssh-template-data",
+    "x509_template": "--x509-template",
+    "x509_template_data": "--x509-template-data",
+    "x509_min_dur": "--x509-min-dur",
+    "x509_max_dur": "--x509-max-dur",
+    "x509_default_dur": "--x509-default-dur",
+    "x5c_root": "--x5c-root",
+}
+CREATE_UPDATE_TMPFILE_ARGS = {
+    "password": "--password-file"
+}
+PROVISIONER_ITEM_PARAMS = ["name", "type", "state", "password", *CREATE_UPDATE_CLIARGS]
+
+
+class ProvisionerInventory:
+    """The provisioners configured in a CA, indexed by name and by type.
+
+    Provisioner names are unique within a CA, so lookups by name are O(1) instead of scanning
+    the full provisioner list for each name.
+    """
+
+    def __init__(self, provisioners: List[Dict[str, Any]]) -> None:
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        self._by_type: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for provisioner in provisioners:
+            self.add(provisioner)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._by_name.values())
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the provisioner with the given name, or None if it does not exist
+        """
+        return self._by_name.get(name)
+
+    def of_type(self, provisioner_type: str) -> List[Dict[str, Any]]:
+        """Return all provisioners of the given type, such as "JWK" or "ACME"
+        """
+        return list(self._by_type.get(provisioner_type, {}).values())
+
+    def add(self, provisioner: Dict[str, Any]) -> None:
+        """Add a provisioner to the index, replacing any existing provisioner with the same name
+        """
+        self.remove(provisioner["name"])
+        self._by_name[provisioner["name"]] = provisioner
+        self._by_type.setdefault(provisioner.get("type", ""), {})[provisioner["name"]] = provisioner
+
+    def remove(self, name: str) -> None:
+        provisioner = self._by_name.pop(name, None)
+        if provisioner is not None:
+            self._by_type[provisioner.get("type", "")].pop(name, None)
+
+
+class ProvisionerCache:
+    """Caches the provisioner list of a CA on the managed host for up to ttl seconds.
+
+    Entries are keyed on the connection parameters used to retrieve the list (such as the CA URL and config path),
+    and also expire as soon as the local ca.json changes. A ttl of 0 disables the cache.
+    Since the CA can also be modified by other means, callers should keep the ttl short (e.g. the duration of a play)
+    and must invalidate() the cache after modifying a provisioner.
+    Secret fields (see SECRET_FIELDS) are stripped before caching, so cached provisioners always differ
+    from params that set a secret, such as oidc_client_secret.
+    """
+
+    def __init__(self, source: Dict[str, Any], ca_config: Optional[str], ttl: int) -> None:
+        self.key = json.dumps(source, sort_keys=True)
+        self.ttl = ttl
+        self._ca_config = ca_config
+        self._cache = HostCache(PROVISIONER_CACHE_NAME)
+
+    def _stamp(self) -> Dict[str, Any]:
+        return {"ca_config": file_stamp(self._ca_config) if self._ca_config else None}
+
+    def get(self) -> Optional[ProvisionerInventory]:
+        if self.ttl <= 0:
+            return None
+        provisioners = self._cache.get(self.key, self._stamp(), max_age=self.ttl)
+        if not isinstance(provisioners, list):
+            return None
+        return ProvisionerInventory(provisioners)
+
+    def set(self, inventory: ProvisionerInventory) -> None:
+        if self.ttl > 0:
+            self._cache.set(self.key, self._stamp(), [strip_secrets(p) for p in inventory])
+
+    def invalidate(self) -> None:
+        # Always invalidate, as the entry may have been written by an earlier run with a non-zero ttl
+        self._cache.invalidate(self.key)
+
+
+def strip_secrets(provisioner: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of the provisioner without its secret fields (see SECRET_FIELDS)
+    """
+    return {k: v for k, v in provisioner.items() if k not in SECRET_FIELDS}
+
+
+def _lookup(provisioner: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    value: Any = provisioner
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _read_file(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _decode_b64(value: Any) -> Optional[bytes]:
+    if not isinstance(value, str):
+        return None
+    try:
+        return base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def _first(value: Any) -> Any:
+    return value[0] if isinstance(value, list) and value else value
+
+
+def _field_equal(kind: str, current: Any, desired: Any) -> bool:
+    if kind == "bool":
+        return bool(current)
+    if kind in ("str", "int"):
+        return current is not None and str(current) == str(desired)
+    if kind == "list":
+        return sorted(str(v) for v in current or []) == sorted(str(v) for v in desired)
+    if kind == "duration":
+        return isinstance(current, str) and parse_duration(current) is not None and \
+            parse_duration(current) == parse_duration(str(desired))
+
+    content = _read_file(desired)
+    if content is None:
+        return False
+    if kind == "file":
+        return _decode_b64(current) == content
+    if kind == "template":
+        current = current if isinstance(current, dict) else {}
+        if current.get("templateFile") == desired:
+            return True
+        template = current.get("template")
+        return template is not None and content in (template.encode("utf-8"), _decode_b64(template))
+    if kind == "json_file":
+        try:
+            return current == json.loads(content)
+        except ValueError:
+            return False
+    raise ValueError(f"Unknown provisioner field kind: {kind}")
+
+
+def provisioner_diff(provisioner: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Compare the desired provisioner params with the current provisioner configuration.
+
+    Only params that are set are compared, as `step ca provisioner update` leaves all other fields untouched.
+
+    Args:
+        provisioner (Dict[str, Any]): The provisioner, as output by `step ca provisioner list`
+        params (Dict[str, Any]): The desired params, using the keys of the step_ca_provisioner argspec
+
+    Returns:
+        Dict[str, Dict[str, Any]]: A diff with "before" and "after" dicts containing the params that differ.
+            Both are empty if an update would not change anything.
+    """
+    diff: Dict[str, Dict[str, Any]] = {"before": {}, "after": {}}
+    for param in OPAQUE_PARAMS:
+        if params.get(param):
+            diff["before"][param] = None
+            diff["after"][param] = SECRET_VALUE if param in SECRET_PARAMS else params[param]
+
+    for param, (path, kind) in PROVISIONER_FIELDS.items():
+        desired = params.get(param)
+        if desired is None or (kind == "bool" and not desired):
+            continue
+        current = _lookup(provisioner, path)
+        if _field_equal(kind, current, desired):
+            continue
+        if kind == "template":
+            diff["before"][param] = current.get("templateFile") if isinstance(current, dict) else None
+        else:
+            diff["before"][param] = None if kind in ("file", "json_file") else current
+        diff["after"][param] = desired
+        if param in SECRET_PARAMS:
+            diff["before"][param], diff["after"][param] = SECRET_VALUE, SECRET_VALUE
+
+    # The public key of K8SSA provisioners is stored in the JSON, but JWK keys are encrypted and can't be compared
+    if params.get("public_key"):
+        if provisioner.get("type") != "K8SSA" or _decode_b64(_first(provisioner.get("publicKeys"))) != \
+                _read_file(params["public_key"]):
+            diff["before"]["public_key"] = None
+            diff["after"]["public_key"] = params["public_key"]
+    return diff
+
+
+def add_provisioner(name: str, provisioner_type: str, executable: StepCliExecutable, module: AnsibleModule,
+                    params: Optional[Dict[str, Any]] = None):
+    args = AdminParams.cli_args().join(CliCommandArgs(
+        ["ca", "provisioner", "add", name, "--type", provisioner_type],
+        {**CREATE_UPDATE_CLIARGS, **CONNECTION_CLIARG_MAP},
+        CREATE_UPDATE_TMPFILE_ARGS
+    ))
+    cmd = CliCommand(executable, args, params=params, raise_errors=True)
+    cmd.run(module)
+    return
+
+
+def update_provisioner(name: str, executable: StepCliExecutable, module: AnsibleModule,
+                       params: Optional[Dict[str, Any]] = None):
+    args = AdminParams.cli_args().join(CliCommandArgs(
+        ["ca", "provisioner", "update", name],
+        {**CREATE_UPDATE_CLIARGS, **CONNECTION_CLIARG_MAP},
+        CREATE_UPDATE_TMPFILE_ARGS
+    ))
+    cmd = CliCommand(executable, args, params=params, raise_errors=True)
+    cmd.run(module)
+    return
+
+
+def remove_provisioner(name: str, executable: StepCliExecutable, module: AnsibleModule,
+                       params: Optional[Dict[str, Any]] = None):
+    args = AdminParams.cli_args().join(CliCommandArgs(
+        ["ca", "provisioner", "remove", name],
+        CONNECTION_CLIARG_MAP
+    ))
+    cmd = CliCommand(executable, args, params=params, raise_errors=True)
+    cmd.run(module)
+    return
+
+
+def manage_provisioner(executable: StepCliExecutable, module: AnsibleModule, provisioners: ProvisionerInventory,
+                       params: Dict[str, Any]) -> Dict[str, Any]:
+    """Bring a single provisioner into the state described by params. provisioners is updated to match
+
+    Raises:
+        CliError: If the provisioner could not be modified
+    """
+    result: Dict[str, Any] = {}
+    name, state = params["name"], params["state"]
+    p = provisioners.get(name)
+    if p is not None:
+        if state == "present" and p["type"] == params["type"]:
+            result["msg"] = "Provisioner found in CA config - not modified"
+        elif state == "updated":
+            diff = provisioner_diff(p, params)
+            if diff["after"]:
+                update_provisioner(name, executable, module, params)
+                result.update(changed=True, diff=diff)
+            else:
+                result["msg"] = "Provisioner matches the requested configuration - not modified"
+        elif state == "absent":
+            remove_provisioner(name, executable, module, params)
+            provisioners.remove(name)
+            result["changed"] = True
+    elif state == "present":
+        add_provisioner(name, params["type"], executable, module, params)
+        provisioners.add({"name": name, "type": params["type"]})
+        result["changed"] = True
+    elif state == "updated":
+        raise CliError(f"Provisioner {name} not found but state is 'updated'")
+    return result
+
+
+def apply_provisioner_changes(executable: StepCliExecutable, module: AnsibleModule,
+                              provisioners: ProvisionerInventory,
+                              items: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Run manage_provisioner() for each item and prune unlisted provisioners if requested
+
+    Returns:
+        Tuple[List[Dict[str, Any]], List[str]]: The result of each item, followed by the pruned provisioners,
+            and the names of all pruned provisioners. Failed items contain failed and msg
+    """
+    # Provisioner changes all modify the same CA configuration, so they are applied one after another
+    item_results = []
+    for params in items:
+        item_result: Dict[str, Any] = {"name": params["name"], "changed": False}
+        try:
+            item_result.update(manage_provisioner(executable, module, provisioners, params))
+        except CliError as e:
+            item_result.update(failed=True, msg=str(e))
+        item_results.append(item_result)
+
+    pruned = []
+    base = items[0]
+    if base["prune"]:
+        # Never remove the provisioner that is used to authenticate the admin making these changes
+        keep = {params["name"] for params in items} | {base["admin_provisioner"]}
+        for name in sorted(set(p["name"] for p in provisioners) - keep):
+            item_result = {"name": name, "changed": True, "pruned": True}
+            try:
+                remove_provisioner(name, executable, module, {**base, "name": name})
+                pruned.append(name)
+            except CliError as e:
+                item_result.update(changed=False, failed=True, msg=str(e))
+            item_results.append(item_result)
+    return item_results, pruned
+
+
+def provisioner_items(module_params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Build the full set of params for each provisioner to manage.
+
+    In reconcile mode, each entry in I(provisioners) is merged on top of the top-level params.
+    Otherwise, the top-level params describe the only provisioner.
+    """
+    base = {k: v for k, v in module_params.items() if k != "provisioners"}
+    if not module_params["provisioners"]:
+        return [base]
+    return [{**base, **{k: v for k, v in item.items() if v is not None}} for item in module_params["provisioners"]]
+
+
+def get_provisioners(executable: StepCliExecutable, module: AnsibleModule,
+                     admin_params: AdminParams) -> ProvisionerInventory:
+    """Retrieve the provisioners from the CA, or from the local CA config if the CA is not reachable
+
+    Args:
+        executable (StepCliExecutable): Executable to run with
+        module (AnsibleModule): ansible module
+        admin_params (AdminParams): Admin parameters of the module
+
+    Returns:
+        ProvisionerInventory: All provisioners configured in the CA
+    """
+    module_params = cast(Dict, module.params)
+    ca_online_check_args = CliCommandArgs(["ca", "provisioner", "list"], CONNECTION_CLIARG_MAP)
+    ca_online_check = CliCommand(executable, ca_online_check_args, run_in_check_mode=True, fail_on_error=False)
+    ca_online_res = ca_online_check.run(module)
+    # Offline provisioner management is possible even if the CA is down.
+    # ca provisioner list does depend on the CA being available however, so we need some backup strategies.
+    if ca_online_res.rc != 0 and admin_params.is_defined():
+        # Admin credentials means that the provisioners are managed remotely and are stored in the DB.
+        # Combined with a connection failure, this means that we are unable to continue
+        executable.fail_json(
+            module,
+            "Could not contact CA to retrieve provisioners and cannot fallback to direct manipulation "
+            "as remote admin parameters are set. Aborting"
+        )
+    try:
+        if ca_online_res.rc == 0:
+            provisioners = json.loads(ca_online_res.stdout)
+        else:
+            # Without admin, provisioners are always managed locally, so we can just read them as a fallback
+            provisioners = read_provisioners(module_params["ca_config"], OFFLINE_PROVISIONER_KEYS)
+    except (json.JSONDecodeError, CaConfigError) as e:
+        executable.fail_json(module, f"Error reading provisioner config: {e}")
+        raise  # makes pylint and pylance happy
+    return ProvisionerInventory(provisioners)
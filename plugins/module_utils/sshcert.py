@@ -0,0 +1,224 @@
+import base64
+import binascii
+from dataclasses import dataclass, field
+import datetime
+import hashlib
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+# Number of length-prefixed fields (string or mpint) that hold the public key in each certificate type,
+# see https://cvsweb.openbsd.org/src/usr.bin/ssh/PROTOCOL.certkeys
+CERT_KEY_FIELDS = {
+    "ssh-rsa-cert-v01@openssh.com": 2,
+    "ssh-dss-cert-v01@openssh.com": 4,
+    "ecdsa-sha2-nistp256-cert-v01@openssh.com": 2,
+    "ecdsa-sha2-nistp384-cert-v01@openssh.com": 2,
+    "ecdsa-sha2-nistp521-cert-v01@openssh.com": 2,
+    "ssh-ed25519-cert-v01@openssh.com": 1,
+    "sk-ecdsa-sha2-nistp256-cert-v01@openssh.com": 3,
+    "sk-ssh-ed25519-cert-v01@openssh.com": 2,
+}
+CERT_TYPES = {1: "user", 2: "host"}
+# valid_before value of certificates that never expire
+FOREVER = 0xFFFFFFFFFFFFFFFF
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+class SshCertificateParseError(Exception):
+    pass
+
+
+@dataclass
+class SshCertificate:
+    """The fields of an OpenSSH certificate that are relevant for renewal and drift checks
+    """
+    key_type: str
+    public_key: bytes
+    serial: int
+    cert_type: str
+    key_id: str
+    principals: List[str]
+    valid_after: datetime.datetime
+    # None if the certificate never expires
+    valid_before: Optional[datetime.datetime]
+    critical_options: Dict[str, str] = field(default_factory=dict)
+    extensions: List[str] = field(default_factory=list)
+    signature_key_fingerprint: str = ""
+
+    def needs_renewal(self, expires_in: Optional[datetime.timedelta] = None,
+                      now: Optional[datetime.datetime] = None) -> bool:
+        """Whether the certificate is expired or about to expire.
+
+        Like step ssh needs-renewal, a certificate needs renewal if it expires within expires_in,
+        or by default once more than two thirds of its lifetime have passed.
+        """
+        if self.valid_before is None:
+            return False
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        if expires_in is None:
+            expires_in = (self.valid_before - self.valid_after) / 3
+        return self.valid_before - now <= expires_in
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "key_type": self.key_type,
+            "public_key_fingerprint": key_fingerprint(self.public_key),
+            "serial": str(self.serial),
+            "type": self.cert_type,
+            "key_id": self.key_id,
+            "principals": self.principals,
+            "valid_after": self.valid_after.strftime(TIME_FORMAT),
+            "valid_before": self.valid_before.strftime(TIME_FORMAT) if self.valid_before else "forever",
+            "critical_options": self.critical_options,
+            "extensions": self.extensions,
+            "signature_key_fingerprint": self.signature_key_fingerprint,
+        }
+
+
+class _Reader:
+    def __init__(self, data: bytes) -> None:
+        self._data = data
+        self._pos = 0
+
+    def _take(self, length: int) -> bytes:
+        if self._pos + length > len(self._data):
+            raise SshCertificateParseError("Invalid certificate: unexpected end of data")
+        value = self._data[self._pos:self._pos + length]
+        self._pos += length
+        return value
+
+    def uint32(self) -> int:
+        return struct.unpack(">I", self._take(4))[0]
+
+    def uint64(self) -> int:
+        return struct.unpack(">Q", self._take(8))[0]
+
+    def string(self) -> bytes:
+        return self._take(self.uint32())
+
+    def text(self) -> str:
+        try:
+            return self.string().decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise SshCertificateParseError(f"Invalid certificate: {e}") from e
+
+    def strings(self) -> List[str]:
+        """Read a string field containing a packed list of strings
+        """
+        reader = _Reader(self.string())
+        values = []
+        while not reader.at_end():
+            values.append(reader.text())
+        return values
+
+    def options(self) -> List[Tuple[str, bytes]]:
+        """Read a string field containing packed name/data pairs, as used for critical options and extensions
+        """
+        reader = _Reader(self.string())
+        values = []
+        while not reader.at_end():
+            values.append((reader.text(), reader.string()))
+        return values
+
+    def at_end(self) -> bool:
+        return self._pos >= len(self._data)
+
+
+def _timestamp(value: int) -> datetime.datetime:
+    # Clamp to the largest value that datetime supports
+    return datetime.datetime.fromtimestamp(min(value, 253402300799), datetime.timezone.utc)
+
+
+def key_fingerprint(blob: bytes) -> str:
+    """Return the SHA256 fingerprint of a public key blob, in the format printed by ssh-keygen -l
+    """
+    return "SHA256:" + base64.b64encode(hashlib.sha256(blob).digest()).decode("ascii").rstrip("=")
+
+
+def read_public_key_blob(line: bytes) -> Tuple[str, bytes]:
+    """Decode a line in authorized_keys format (such as the content of a .pub or -cert.pub file)
+
+    Returns:
+        Tuple[str, bytes]: The key type and the decoded key blob
+    """
+    parts = line.strip().split()
+    if len(parts) < 2:
+        raise SshCertificateParseError("Invalid public key: expected '<type> <base64 data>'")
+    try:
+        return parts[0].decode("ascii"), base64.b64decode(parts[1], validate=True)
+    except (UnicodeDecodeError, binascii.Error, ValueError) as e:
+        raise SshCertificateParseError(f"Invalid public key: {e}") from e
+
+
+def parse_certificate(blob: bytes) -> SshCertificate:
+    """Parse an OpenSSH certificate in wire format.
+
+    The certificate signature is not verified.
+
+    Raises:
+        SshCertificateParseError: If the data is not a supported OpenSSH certificate
+    """
+    reader = _Reader(blob)
+    key_type = reader.text()
+    if key_type not in CERT_KEY_FIELDS:
+        raise SshCertificateParseError(f"Unsupported certificate type: {key_type}")
+    reader.string()  # nonce
+    key_fields = [reader.string() for _ in range(CERT_KEY_FIELDS[key_type])]
+    serial = reader.uint64()
+    cert_type = reader.uint32()
+    key_id = reader.text()
+    principals = reader.strings()
+    valid_after = reader.uint64()
+    valid_before = reader.uint64()
+    critical_options = reader.options()
+    extensions = reader.options()
+    reader.string()  # reserved
+    signature_key = reader.string()
+    reader.string()  # signature
+    if cert_type not in CERT_TYPES:
+        raise SshCertificateParseError(f"Invalid certificate: unknown certificate type {cert_type}")
+
+    # The public key in the format of the corresponding plain key type, as stored in .pub files
+    # (security key types keep the @openssh.com suffix, e.g. sk-ssh-ed25519@openssh.com)
+    plain_type = key_type.replace("-cert-v01@openssh.com", "@openssh.com" if key_type.startswith("sk-") else "")
+    public_key = b"".join(struct.pack(">I", len(value)) + value
+                          for value in [plain_type.encode("ascii"), *key_fields])
+    return SshCertificate(
+        key_type=key_type,
+        public_key=public_key,
+        serial=serial,
+        cert_type=CERT_TYPES[cert_type],
+        key_id=key_id,
+        principals=principals,
+        valid_after=_timestamp(valid_after),
+        valid_before=None if valid_before == FOREVER else _timestamp(valid_before),
+        critical_options={name: _option_value(data) for name, data in critical_options},
+        extensions=[name for name, _ in extensions],
+        signature_key_fingerprint=key_fingerprint(signature_key),
+    )
+
+
+def _option_value(data: bytes) -> str:
+    # Option data is itself a string field, or empty for flags
+    if not data:
+        return ""
+    reader = _Reader(data)
+    try:
+        return reader.text()
+    except SshCertificateParseError:
+        return data.hex()
+
+
+def load_certificate(path: str) -> SshCertificate:
+    """Read an OpenSSH certificate from a -cert.pub file
+
+    Raises:
+        SshCertificateParseError: If the file does not contain a supported certificate
+        OSError: If the file cannot be read
+    """
+    with open(path, "rb") as f:
+        key_type, blob = read_public_key_blob(f.read())
+    certificate = parse_certificate(blob)
+    if certificate.key_type != key_type:
+        raise SshCertificateParseError(f"Invalid certificate: type {key_type} does not match {certificate.key_type}")
+    return certificate
@@ -68,13 +68,17 @@ def run_module():
         force=dict(type="bool", default=False),
         install=dict(type="bool", default=False),
         redirect_url=dict(),
-        step_cli_executable=dict(type="path", default="step-cli")
+        step_cli_executable=dict(type="path", default="step-cli"),
+        step_cli_timings=dict(type="bool", default=False)
     )
     result: Dict[str, Any] = dict(changed=False)
     module = AnsibleModule(argument_spec, supports_check_mode=True)
     module_params = cast(Dict, module.params)
 
     cli_exec = StepCliExecutable(module, module_params["step_cli_executable"])
+    result["version_cache_hits"] = cli_exec.version_cache_hits
+    if cli_exec.timings is not None:
+        result["timings"] = cli_exec.timings
 
     if not module_params["force"]:  # type: ignore
         try:
@@ -22,6 +22,15 @@ notes:
       This module attempts to detect when a certificates parameters have changed, but may not detect all changes.
       Currently, the following parameters are checked for changes: I(san, kty, curve, size).
       Note that the key parameters are only checked if I(kty) is set
+  - >
+      If the Python C(cryptography) library is available on the remote host, existing certificates are inspected
+      and verified (validity period and signature chain against I(verify_roots)) in-process.
+      Otherwise, C(step certificate inspect) and C(step certificate verify) are used.
+  - >
+      After an existing certificate passed all checks, its fingerprint, validity, names, key parameters and
+      a hash of the relevant module parameters are recorded in a state file next to it (C(.<crt_file name>.state.json)).
+      Subsequent runs with unchanged parameters skip all checks (and do not run C(step-cli) at all) as long as
+      the certificate file is unchanged and more than a third of its lifetime remains.
 options:
   acme:
     description: >
@@ -38,6 +47,13 @@ options:
   attestation_uri:
     description: The KMS uri used for attestation.
     type: str
+  command_timeout:
+    description: >
+      Maximum time in seconds that a single C(step ca certificate) or C(step ca revoke) invocation may take.
+      Commands that take longer are killed and the certificate is reported as failed.
+      If unset, commands may run indefinitely.
+    type: int
+    version_added: '0.25.0'
   console:
     description: Complete the flow while remaining inside the terminal
     type: bool
@@ -48,10 +64,104 @@ options:
       Must be a list
     type: list
     elements: str
+  certificates:
+    description: >
+      Manage multiple certificates in a single module invocation.
+      Each item describes one certificate and accepts a subset of the regular options.
+      Options that are not set on an item fall back to the top-level option of the same name,
+      so shared settings such as I(ca_url) or I(provisioner_password_file) only need to be set once.
+      Each certificate is processed independently - if one certificate fails, the remaining ones are still processed
+      and the module fails afterwards, listing all failed certificates.
+      Mutually exclusive with I(crt_file).
+    type: list
+    elements: dict
+    version_added: '0.25.0'
+    suboptions:
+      crt_file:
+        description: File to write the certificate (PEM format).
+        type: path
+        required: true
+      key_file:
+        description: File to write the private key (PEM format).
+        type: path
+        required: true
+      name:
+        description: See the top-level I(name) option.
+        type: str
+        aliases:
+          - subject
+      san:
+        description: See the top-level I(san) option.
+        type: list
+        elements: str
+      kty:
+        description: See the top-level I(kty) option.
+        type: str
+        choices:
+          - EC
+          - OKP
+          - RSA
+      curve:
+        description: See the top-level I(curve) option.
+        type: str
+        aliases:
+          - crv
+        choices:
+          - P-256
+          - P-384
+          - P-521
+          - Ed25519
+      size:
+        description: See the top-level I(size) option.
+        type: int
+      not_after:
+        description: See the top-level I(not_after) option.
+        type: str
+      not_before:
+        description: See the top-level I(not_before) option.
+        type: str
+      force:
+        description: See the top-level I(force) option.
+        type: bool
+      state:
+        description: See the top-level I(state) option.
+        type: str
+        choices:
+          - present
+          - revoked
+          - absent
+      token:
+        description: See the top-level I(token) option.
+        type: str
+      set:
+        description: See the top-level I(set) option.
+        type: list
+        elements: str
+      set_file:
+        description: See the top-level I(set_file) option.
+        type: path
+      revoke_on_delete:
+        description: See the top-level I(revoke_on_delete) option.
+        type: bool
+      revoke_reason:
+        description: See the top-level I(revoke_reason) option.
+        type: str
+      revoke_reason_code:
+        description: See the top-level I(revoke_reason_code) option.
+        type: str
+      verify_roots:
+        description: See the top-level I(verify_roots) option.
+        type: str
+      provisioner:
+        description: See the top-level I(provisioner) option.
+        type: str
+        aliases:
+          - issuer
   crt_file:
-    description: File to write the certificate (PEM format).
+    description: >
+      File to write the certificate (PEM format).
+      Required unless I(certificates) is set.
     type: path
-    required: true
   curve:
     aliases:
       - crv
@@ -79,9 +189,10 @@ options:
     description: Configure the file from which to read the kubernetes service account token.
     type: path
   key_file:
-    description: File to write the private key (PEM format).
+    description: >
+      File to write the private key (PEM format).
+      Required if I(crt_file) is set.
     type: path
-    required: true
   kms:
     description: The uri to configure a Cloud KMS or an HSM.
     type: str
@@ -93,6 +204,14 @@ options:
       - EC
       - OKP
       - RSA
+  max_workers:
+    description: >
+      Maximum number of certificates from I(certificates) that are checked and issued concurrently.
+      Certificates are processed sequentially if set to 1.
+      Results are always returned in the order of I(certificates).
+    type: int
+    default: 4
+    version_added: '0.25.0'
   name:
     aliases:
       - subject
@@ -129,7 +248,7 @@ options:
   provisioner_password:
     description: >
       The password to decrypt the one-time token generating key.
-      Will be passed to step-cli through a temporary file.
+      Will be passed to step-cli through a temporary file or file descriptor, see I(step_cli_secret_passing).
       Mutually exclusive with I(provisioner_password_file)
     type: str
   provisioner_password_file:
@@ -219,6 +338,7 @@ options:
 extends_documentation_fragment:
   - maxhoesel.smallstep.cli_executable
   - maxhoesel.smallstep.ca_connection
+  - maxhoesel.smallstep.secret_passing
 """
 
 EXAMPLES = r"""
@@ -267,16 +387,72 @@ EXAMPLES = r"""
     key_file: "/etc/ssl/my.key"
     state: absent
     revoke_on_delete: true
+
+- name: Ensure multiple certificates exist, sharing the provisioner settings
+  maxhoesel.smallstep.step_ca_certificate:
+    provisioner: "jwk"
+    provisioner_password_file: "/path/to/password_file"
+    not_after: 24h
+    certificates:
+      - name: "web.example.com"
+        crt_file: "/etc/ssl/web.crt"
+        key_file: "/etc/ssl/web.key"
+      - name: "db.example.com"
+        crt_file: "/etc/ssl/db.crt"
+        key_file: "/etc/ssl/db.key"
+        kty: RSA
+        size: 4096
+"""
+
+RETURN = r"""
+recreate_reason:
+  description: Why the existing certificate was recreated.
+  type: str
+  returned: When an existing certificate was recreated and I(certificates) is not set
+certificates:
+  description: Per-certificate results, in the same order as the I(certificates) option.
+  type: list
+  elements: dict
+  returned: When I(certificates) is set
+  contains:
+    crt_file:
+      description: Path of the certificate file.
+      type: str
+      returned: always
+    changed:
+      description: Whether this certificate was changed.
+      type: bool
+      returned: always
+    recreate_reason:
+      description: Why the existing certificate was recreated.
+      type: str
+      returned: When an existing certificate was recreated
+    failed:
+      description: Whether this certificate could not be managed.
+      type: bool
+      returned: When managing this certificate failed
+    msg:
+      description: Error message if this certificate failed, or a note if all checks were skipped.
+      type: str
+      returned: sometimes
 """
+import datetime
+import hashlib
+import json
+import os
 from pathlib import Path
-from typing import cast, Dict, Any
+import tempfile
+from typing import cast, Dict, Any, List, Optional
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.common.validation import check_required_if, check_mutually_exclusive
 
 from ..module_utils.params.ca_connection import CaConnectionParams
-from ..module_utils.cli_wrapper import CliCommand, CliCommandArgs, StepCliExecutable
-from ..module_utils import helpers
+from ..module_utils.params.secret_passing import SecretPassingParams
+from ..module_utils.cli_wrapper import CliCommand, CliCommandArgs, CliError, StepCliExecutable
+from ..module_utils import certinfo, helpers
+from ..module_utils.cache import file_stamp
+from ..module_utils.pool import map_parallel
 from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
 
 # maps the kty cli parameter to inspect outputs subject_key_info.key_algorithm.name
@@ -289,10 +465,16 @@ CERTINFO_KEYINFO_KEY = {
     "RSA": "rsa_public_key",
     "ECDSA": "ecdsa_public_key"
 }
+# Module params that influence whether a certificate needs to be recreated, see cert_needs_recreation()
+STATE_FILE_PARAMS = ["name", "san", "kty", "curve", "size", "verify_roots"]
+# Params that can be set per certificate in batch mode (the certificates option)
+CERTIFICATE_ITEM_PARAMS = ["crt_file", "key_file", "name", "san", "kty", "curve", "size", "not_after", "not_before",
+                           "force", "state", "token", "set", "set_file", "revoke_on_delete", "revoke_reason",
+                           "revoke_reason_code", "verify_roots", "provisioner"]
 
 
-def create_certificate(executable: StepCliExecutable, module: AnsibleModule, force: bool = False) -> Dict[str, Any]:
-    module_params = cast(Dict, module.params)
+def create_certificate(executable: StepCliExecutable, module: AnsibleModule, params: Dict[str, Any],
+                       force: bool = False) -> Dict[str, Any]:
     # step ca certificate arguments
     cert_cliargs = ["acme", "attestation_ca_url", "attestation_ca_root", "console", "contact", "curve",
                     "http_listen", "k8ssa_token_path", "kms", "kty", "nebula_cert", "nebula_key", "not_after",
@@ -301,24 +483,24 @@ def create_certificate(executable: StepCliExecutable, module: AnsibleModule, for
     # All parameters can be converted to a mapping by just appending -- and replacing the underscores
     cert_cliarg_map = {arg: f"--{arg.replace('_', '-')}" for arg in cert_cliargs}
 
-    args = ["ca", "certificate", module_params["name"], module_params["crt_file"], module_params["key_file"]]
+    args = ["ca", "certificate", params["name"], params["crt_file"], params["key_file"]]
     if force:
         args.append("--force")
 
     create_args = CaConnectionParams.cli_args().join(CliCommandArgs(
         args, cert_cliarg_map, {"provisioner_password": "--provisioner-password-file"}))
-    create_cmd = CliCommand(executable, create_args)
+    create_cmd = CliCommand(executable, create_args, params=params, raise_errors=True,
+                            timeout=params["command_timeout"])
     create_cmd.run(module)
     return {"changed": True}
 
 
-def cert_needs_recreation(executable: StepCliExecutable, module: AnsibleModule) -> str:
+def cert_needs_recreation(executable: StepCliExecutable, module: AnsibleModule, module_params: Dict[str, Any]) -> str:
     """Check whether a certificate needs to be recreated based on its validity and module parameters
 
     Returns:
         str: Reason for certificate recreation, or empty string if no recreation is needed
     """
-    module_params = cast(Dict, module.params)
 
     cert_info = helpers.get_certificate_info(
         executable, module, module_params["crt_file"], roots=module_params["verify_roots"])
@@ -351,10 +533,96 @@ def cert_needs_recreation(executable: StepCliExecutable, module: AnsibleModule)
         current_length = key_info[CERTINFO_KEYINFO_KEY[current_kty]]["length"]
         if current_length != module_params["size"]:
             return f"Key size has changed from {current_length} to {module_params['size']}"
+
+    if not module.check_mode:
+        write_cert_state(module_params, cert_info.data)
     return ""
 
 
-def revoke_certificate(executable: StepCliExecutable, module: AnsibleModule) -> Dict[str, Any]:  # pylint: disable=unused-argument
+def state_file_path(crt_file: str) -> Path:
+    crt_path = Path(crt_file)
+    return crt_path.parent / f".{crt_path.name}.state.json"
+
+
+def desired_params_hash(module_params: Dict[str, Any]) -> str:
+    """Hash all parameters that cert_needs_recreation() checks, including the current version of the root files
+    """
+    desired = {param: module_params[param] for param in STATE_FILE_PARAMS}
+    roots = module_params["verify_roots"] or ""
+    desired["verify_roots_stamps"] = [file_stamp(r.strip()) for r in roots.split(",") if r.strip()]
+    return hashlib.sha256(json.dumps(desired, sort_keys=True).encode()).hexdigest()
+
+
+def read_cert_fingerprint(crt_file: str) -> Optional[str]:
+    try:
+        with open(crt_file, "rb") as f:
+            ders = certinfo.split_certificates(f.read())
+    except (OSError, certinfo.CertificateParseError):
+        return None
+    return certinfo.fingerprint(ders[0]) if ders else None
+
+
+def write_cert_state(module_params: Dict[str, Any], cert_data: Dict[str, Any]) -> None:
+    """Record the state of a certificate that was just found to match the module params.
+    This allows subsequent runs to skip the full inspection, see cert_state_unchanged()
+    """
+    fingerprint = read_cert_fingerprint(module_params["crt_file"])
+    if not fingerprint:
+        return
+    key_info = cert_data["subject_key_info"]
+    kty = key_info["key_algorithm"]["name"]
+    key_details = key_info.get(CERTINFO_KEYINFO_KEY.get(kty, ""), {})
+    state = {
+        "fingerprint": fingerprint,
+        "not_before": cert_data["validity"]["start"],
+        "not_after": cert_data["validity"]["end"],
+        "names": sorted(cert_data["names"]),
+        "key_type": kty,
+        "key_curve": key_details.get("curve"),
+        "key_size": key_details.get("length"),
+        "params_hash": desired_params_hash(module_params),
+    }
+
+    path = state_file_path(module_params["crt_file"])
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=f"{path.name}.", dir=path.parent)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        # The state file is only an optimization, the next run will simply perform a full check again
+        pass
+
+
+def cert_state_unchanged(module_params: Dict[str, Any]) -> bool:
+    """Check whether the certificate still matches the state recorded during a previous run.
+
+    Returns:
+        bool: True if the certificate file and desired params are unchanged and the certificate
+            has more than a third of its lifetime left, meaning that no further checks are required
+    """
+    try:
+        with open(state_file_path(module_params["crt_file"]), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        not_before = datetime.datetime.strptime(state["not_before"], certinfo.TIME_FORMAT)
+        not_after = datetime.datetime.strptime(state["not_after"], certinfo.TIME_FORMAT)
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+    if state.get("params_hash") != desired_params_hash(module_params):
+        return False
+    if state.get("fingerprint") != read_cert_fingerprint(module_params["crt_file"]):
+        return False
+    # Same threshold that step ca renew --daemon uses by default
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return not_after - now > (not_after - not_before) / 3
+
+
+def revoke_certificate(executable: StepCliExecutable, module: AnsibleModule, params: Dict[str, Any]) -> Dict[str, Any]:
     revoke_cliarg_map = {
         "crt_file": "--cert",
         "key_file": "--key",
@@ -363,54 +631,112 @@ def revoke_certificate(executable: StepCliExecutable, module: AnsibleModule) ->
         "token": "--token"
     }
     revoke_args = CaConnectionParams.cli_args().join(CliCommandArgs(["ca", "revoke"], revoke_cliarg_map))
-    revoke_cmd = CliCommand(executable, revoke_args, fail_on_error=False)
+    revoke_cmd = CliCommand(executable, revoke_args, fail_on_error=False, params=params, raise_errors=True,
+                            timeout=params["command_timeout"])
     res = revoke_cmd.run(module)
 
     if res.rc != 0 and "is already revoked" in res.stderr:
         return {}
     elif res.rc != 0:
-        module.fail_json(f"Error revoking certificate: {res.stderr}")
-        return {"changed": True}  # only here to satisfy the type checker, fail_json never returns
+        raise CliError(f"Error revoking certificate: {res.stderr}")
     else:
         # ran successfully => revoked
         return {"changed": True}
 
 
-def delete_certificate(executable: StepCliExecutable, module: AnsibleModule, revoke: bool) -> Dict[str, Any]:
-    module_params = cast(Dict, module.params)
+def delete_certificate(executable: StepCliExecutable, module: AnsibleModule, params: Dict[str, Any],
+                       revoke: bool) -> Dict[str, Any]:
     result = {}
     if revoke:
-        result = revoke_certificate(executable, module)
+        result = revoke_certificate(executable, module, params)
 
-    for file in [Path(module_params["crt_file"]), Path(module_params["key_file"])]:
+    for file in [Path(params["crt_file"]), Path(params["key_file"]), state_file_path(params["crt_file"])]:
         if file.exists():
             try:
                 file.unlink()
             except FileNotFoundError:
                 pass
             except OSError as e:
-                module.fail_json(f"Could not delete file: {e}")
+                raise CliError(f"Could not delete file: {e}") from e
             result["changed"] = True
     return result
 
 
+def manage_certificate(executable: StepCliExecutable, module: AnsibleModule, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Bring a single certificate into the state described by params
+
+    Raises:
+        CliError: If any step-cli invocation or file operation fails
+    """
+    result: Dict[str, Any] = {}
+    crt_exists = Path(params["crt_file"]).exists()
+    if params["state"] == "present":
+        if not crt_exists:
+            result.update(create_certificate(executable, module, params))
+        else:
+            if params["force"]:
+                recreate_reason = "force parameter enabled"
+            else:
+                recreate_reason = cert_needs_recreation(executable, module, params)
+            if recreate_reason:
+                result["recreate_reason"] = recreate_reason
+                result.update(create_certificate(executable, module, params, force=True))
+    elif params["state"] == "revoked":
+        if crt_exists:
+            result.update(revoke_certificate(executable, module, params))
+        else:
+            raise CliError("Cannot revoke certificate as it does not exist")
+    elif params["state"] == "absent" and crt_exists:
+        result.update(delete_certificate(executable, module, params, params["revoke_on_delete"]))
+    return result
+
+
+def manage_certificates(executable: StepCliExecutable, module: AnsibleModule, items: List[Dict[str, Any]],
+                        max_workers: int) -> List[Dict[str, Any]]:
+    """Run manage_certificate() for each item, using up to max_workers concurrent workers.
+
+    Returns:
+        List[Dict[str, Any]]: The result of each item in input order. Failed items contain failed and msg
+    """
+    def manage(params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return manage_certificate(executable, module, params)
+        except CliError as e:
+            return {"failed": True, "msg": str(e)}
+    return map_parallel(manage, items, max_workers)
+
+
+def certificate_items(module_params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Build the full set of params for each certificate to manage.
+
+    In batch mode, each entry in I(certificates) is merged on top of the top-level params.
+    Otherwise, the top-level params describe the only certificate.
+    """
+    base = {k: v for k, v in module_params.items() if k != "certificates"}
+    if not module_params["certificates"]:
+        return [base]
+    return [{**base, **{k: v for k, v in item.items() if v is not None}} for item in module_params["certificates"]]
+
+
 def run_module():
     argument_spec = dict(
         acme=dict(type="str"),
         attestation_ca_url=dict(type="str"),
         attestation_ca_root=dict(type="path"),
         attestation_uri=dict(type="str"),
+        command_timeout=dict(type="int"),
         console=dict(type="bool"),
         contact=dict(type="list", elements="str"),
-        crt_file=dict(type="path", required=True),
+        crt_file=dict(type="path"),
         curve=dict(type="str", choices=[
                    "P-256", "P-384", "P-521", "Ed25519"], aliases=["crv"]),
         force=dict(type="bool"),
         http_listen=dict(type="str"),
         k8ssa_token_path=dict(type="path"),
-        key_file=dict(type="path", required=True),
+        key_file=dict(type="path"),
         kms=dict(type="str"),
         kty=dict(type="str", choices=["EC", "OKP", "RSA"]),
+        max_workers=dict(type="int", default=4),
         name=dict(type="str", aliases=["subject"]),
         nebula_cert=dict(type="path"),
         nebula_key=dict(type="path"),
@@ -434,46 +760,79 @@ def run_module():
         webroot=dict(type="path"),
         x5c_cert=dict(type="str"),
         x5c_key=dict(type="path"),
-        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE)
+        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE),
+        step_cli_timings=dict(type="bool", default=False)
     )
+    # Items in the certificates list accept the per-certificate subset of the regular params.
+    # Unset item values fall back to the top-level params, so the item options must not have defaults.
+    certificate_options = {
+        opt: {k: v for k, v in argument_spec[opt].items() if k != "default"} for opt in CERTIFICATE_ITEM_PARAMS
+    }
+    certificate_options["crt_file"]["required"] = True
+    certificate_options["key_file"]["required"] = True
+    argument_spec["certificates"] = dict(type="list", elements="dict", options=certificate_options)
+
     result: Dict[str, Any] = dict(changed=False)
     module = AnsibleModule(argument_spec={
         **CaConnectionParams.argument_spec,
+        **SecretPassingParams.argument_spec,
         **argument_spec,
-    }, supports_check_mode=True)
+    }, supports_check_mode=True,
+        required_one_of=[["crt_file", "certificates"]],
+        mutually_exclusive=[["crt_file", "certificates"]],
+        required_together=[["crt_file", "key_file"]])
     module_params = cast(Dict, module.params)
 
     try:
         CaConnectionParams(module).check()
-        check_required_if([
-            ["state", "present", ["name", "provisioner"], True],
-        ], module_params)
         check_mutually_exclusive(["provisioner_password", "provisioner_password_file"], module_params)
     except TypeError as e:
         module.fail_json(f"Parameter validation failed: {e}")
 
-    executable = StepCliExecutable(module, module_params["step_cli_executable"])
-
-    crt_exists = Path(module_params["crt_file"]).exists()
-    if module_params["state"] == "present":
-        if not crt_exists:
-            result.update(create_certificate(executable, module))
+    item_results = []
+    pending = []
+    for params in certificate_items(module_params):
+        item_result: Dict[str, Any] = {"crt_file": params["crt_file"], "changed": False}
+        try:
+            # Only count params that are actually set, as items always contain every key
+            check_required_if([
+                ["state", "present", ["name", "provisioner"], True],
+            ], {k: v for k, v in params.items() if v is not None})
+        except TypeError as e:
+            item_result.update(failed=True, msg=f"Parameter validation failed: {e}")
         else:
-            if module_params["force"]:
-                recreate_reason = "force parameter enabled"
+            if (params["state"] == "present" and not params["force"] and Path(params["crt_file"]).exists() and
+                    cert_state_unchanged(params)):
+                item_result["msg"] = "Certificate matches the recorded state - not checked further"
             else:
-                recreate_reason = cert_needs_recreation(executable, module)
-            if recreate_reason:
-                result["recreate_reason"] = recreate_reason
-                result.update(create_certificate(executable, module, force=True))
-    elif module_params["state"] == "revoked":
-        if crt_exists:
-            result.update(revoke_certificate(executable, module))
-        else:
-            module.fail_json("Cannot revoke certificate as it does not exist")
-    elif module_params["state"] == "absent" and crt_exists:
-        result.update(delete_certificate(executable, module, module_params["revoke_on_delete"]))
-
+                pending.append((item_result, params))
+        item_results.append(item_result)
+
+    if pending:
+        # All certificates share one executable, which is only probed if a certificate needs checking
+        executable = StepCliExecutable(module, module_params["step_cli_executable"])
+        result["version_cache_hits"] = executable.version_cache_hits
+        if executable.timings is not None:
+            result["timings"] = executable.timings
+        outcomes = manage_certificates(executable, module, [params for _, params in pending],
+                                       module_params["max_workers"])
+        for (item_result, _), outcome in zip(pending, outcomes):
+            item_result.update(outcome)
+
+    if not module_params["certificates"]:
+        item_result = item_results[0]
+        if item_result.get("failed"):
+            module.fail_json(item_result["msg"], **result)
+        del item_result["crt_file"]
+        result.update(item_result)
+        module.exit_json(**result)
+
+    result["certificates"] = item_results
+    result["changed"] = any(item["changed"] for item in item_results)
+    failed = [item["crt_file"] for item in item_results if item.get("failed")]
+    if failed:
+        module.fail_json(f"Failed to manage {len(failed)} of {len(item_results)} certificates: {', '.join(failed)}",
+                         **result)
     module.exit_json(**result)
 
 
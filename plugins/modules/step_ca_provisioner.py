@@ -16,6 +16,11 @@ notes:
     See the L(documentation,https://smallstep.com/docs/step-cli/reference/ca/provisioner) for more information.
   - Any files used to create the provisioner (e.g. root certificate chains) must already be present on the remote host.
   - Check mode is supported.
+  - Diff mode is supported for I(state=updated).
+  - >
+      If the CA is not reachable, the provisioners are read from I(ca_config) instead.
+      The file is parsed incrementally (using C(ijson) if it is installed on the remote host)
+      and nothing is written to the cache directory.
 options:
   allow_renewal_after_expiry:
     description: Allow renewals for expired certificates generated by this provisioner.
@@ -54,6 +59,18 @@ options:
   azure_tenant:
     description: The Microsoft Azure tenant id used to validate the identity tokens.
     type: str
+  batch_offline_changes:
+    description: >
+      When managing provisioners locally (without admin credentials), stage all changes made for I(provisioners)
+      in a working copy of I(ca_config) and write it back in a single atomic step once all changes succeeded.
+      This way, anything watching I(ca_config) (such as a reload mechanism for C(step-ca)) only sees a single change,
+      and a partially applied set of changes is never written.
+      If any provisioner fails, none of the changes are written.
+      The working copy is created in the same directory as I(ca_config), so the directory must be writable.
+      Requires I(provisioners).
+    type: bool
+    default: false
+    version_added: '0.25.0'
   ca_config:
     description: The path to the certificate authority configuration file on the host if managing provisioners locally.
     type: path
@@ -112,8 +129,9 @@ options:
     aliases:
       - private_key
   name:
-    description: The name of the provisioner to add/remove.
-    required: true
+    description: >
+      The name of the provisioner to add/remove.
+      Either this or I(provisioners) is required.
     type: str
   nebula_root:
     description: Root certificate (chain) file used to validate the signature on Nebula provisioning tokens.
@@ -167,7 +185,7 @@ options:
   password:
     description: >
         The password to encrypt or decrypt the private key.
-        Will be passed to step-cli through a temporary file.
+        Will be passed to step-cli through a temporary file or file descriptor, see I(step_cli_secret_passing).
         Mutually exclusive with I(password_file)
     type: str
   password_file:
@@ -175,6 +193,272 @@ options:
         The path to the file containing the password to encrypt or decrypt the private key.
         Mutually exclusive with I(password)
     type: path
+  provisioner_cache_ttl:
+    description: >
+      Cache the provisioner list of the CA on the remote host for this many seconds,
+      so that tasks managing many provisioners only need to retrieve it once.
+      The cache is stored in C($XDG_CACHE_HOME/ansible-smallstep) (C(~/.cache/ansible-smallstep) by default)
+      and is discarded whenever this module modifies a provisioner or the local I(ca_config) file changes.
+      Changes made through other means (e.g. another host or the C(step) CLI) are only picked up once the cache expires,
+      so this should be set to about the duration of a play. C(0) disables the cache.
+      Secrets such as OIDC client secrets, SCEP challenges and encrypted JWK keys are not cached,
+      so I(oidc_client_secret) and I(scep_challenge) always cause an update when the list is read from the cache.
+    type: int
+    default: 0
+    version_added: '0.25.0'
+  provisioners:
+    description: >
+      Manage multiple provisioners in a single module invocation.
+      Each item describes one provisioner and accepts the provisioner-specific subset of the regular options.
+      Options that are not set on an item fall back to the top-level option of the same name,
+      so shared settings such as I(ca_url) or the admin credentials only need to be set once.
+      The provisioner list is retrieved from the CA only once, and only the required
+      C(step ca provisioner add/update/remove) commands are run.
+      If a provisioner can not be modified, the remaining ones are still processed
+      and the module fails afterwards, listing all failed provisioners.
+      Mutually exclusive with I(name).
+    type: list
+    elements: dict
+    version_added: '0.25.0'
+    suboptions:
+      name:
+        description: The name of the provisioner.
+        type: str
+        required: true
+      type:
+        description: See the top-level I(type) option.
+        type: str
+        choices:
+          - JWK
+          - OIDC
+          - AWS
+          - GCP
+          - Azure
+          - ACME
+          - X5C
+          - K8SSA
+          - SSHPOP
+          - SCEP
+          - Nebula
+      state:
+        description: See the top-level I(state) option.
+        type: str
+        choices:
+          - present
+          - updated
+          - absent
+      password:
+        description: See the top-level I(password) option.
+        type: str
+      allow_renewal_after_expiry:
+        description: See the top-level I(allow_renewal_after_expiry) option.
+        type: bool
+      aws_accounts:
+        description: See the top-level I(aws_accounts) option.
+        type: list
+        elements: str
+        aliases:
+          - aws_account
+      azure_audience:
+        description: See the top-level I(azure_audience) option.
+        type: str
+      azure_object_ids:
+        description: See the top-level I(azure_object_ids) option.
+        type: list
+        elements: str
+        aliases:
+          - azure_object_id
+      azure_resource_groups:
+        description: See the top-level I(azure_resource_groups) option.
+        type: list
+        elements: str
+        aliases:
+          - azure_resource_group
+      azure_subscription_ids:
+        description: See the top-level I(azure_subscription_ids) option.
+        type: list
+        elements: str
+        aliases:
+          - azure_subscription_id
+      azure_tenant:
+        description: See the top-level I(azure_tenant) option.
+        type: str
+      disable_custom_sans:
+        description: See the top-level I(disable_custom_sans) option.
+        type: bool
+      disable_renewal:
+        description: See the top-level I(disable_renewal) option.
+        type: bool
+      disable_trust_on_first_use:
+        description: See the top-level I(disable_trust_on_first_use) option.
+        type: bool
+      force_cn:
+        description: See the top-level I(force_cn) option.
+        type: bool
+      gcp_projects:
+        description: See the top-level I(gcp_projects) option.
+        type: list
+        elements: str
+        aliases:
+          - gcp_project
+      gcp_service_accounts:
+        description: See the top-level I(gcp_service_accounts) option.
+        type: list
+        elements: str
+        aliases:
+          - gcp_service_account
+      instance_age:
+        description: See the top-level I(instance_age) option.
+        type: str
+      jwk_create:
+        description: See the top-level I(jwk_create) option.
+        type: bool
+        aliases:
+          - create
+      jwk_private_key:
+        description: See the top-level I(jwk_private_key) option.
+        type: path
+        aliases:
+          - private_key
+      nebula_root:
+        description: See the top-level I(nebula_root) option.
+        type: path
+      oidc_admins:
+        description: See the top-level I(oidc_admins) option.
+        type: list
+        elements: str
+        aliases:
+          - oidc_admin
+          - admin
+          - oidc_admin_email
+      oidc_client_id:
+        description: See the top-level I(oidc_client_id) option.
+        type: str
+        aliases:
+          - client_id
+      oidc_client_secret:
+        description: See the top-level I(oidc_client_secret) option.
+        type: str
+        aliases:
+          - client_secret
+      oidc_configuration_endpoint:
+        description: See the top-level I(oidc_configuration_endpoint) option.
+        type: str
+        aliases:
+          - configuration_endpoint
+      oidc_groups:
+        description: See the top-level I(oidc_groups) option.
+        type: list
+        elements: str
+        aliases:
+          - group
+          - oidc_group
+      oidc_listen_address:
+        description: See the top-level I(oidc_listen_address) option.
+        type: str
+        aliases:
+          - listen_address
+          - oidc_client_address
+      oidc_tenant_id:
+        description: See the top-level I(oidc_tenant_id) option.
+        type: str
+        aliases:
+          - tenant_id
+      password_file:
+        description: See the top-level I(password_file) option.
+        type: path
+      public_key:
+        description: See the top-level I(public_key) option.
+        type: path
+        aliases:
+          - jwk_public_key
+          - k8ssa_public_key
+          - k8s_pem_keys_file
+      require_eab:
+        description: See the top-level I(require_eab) option.
+        type: bool
+      scep_capabilities:
+        description: See the top-level I(scep_capabilities) option.
+        type: str
+        aliases:
+          - capabilities
+      scep_challenge:
+        description: See the top-level I(scep_challenge) option.
+        type: str
+        aliases:
+          - challenge
+      scep_encryption_algorithm_identifier:
+        description: See the top-level I(scep_encryption_algorithm_identifier) option.
+        type: int
+        aliases:
+          - encryption_algorithm_identifier
+      scep_include_root:
+        description: See the top-level I(scep_include_root) option.
+        type: bool
+        aliases:
+          - include_root
+      scep_min_public_key_length:
+        description: See the top-level I(scep_min_public_key_length) option.
+        type: str
+        aliases:
+          - min_public_key_length
+      ssh:
+        description: See the top-level I(ssh) option.
+        type: bool
+      ssh_host_min_dur:
+        description: See the top-level I(ssh_host_min_dur) option.
+        type: str
+      ssh_host_max_dur:
+        description: See the top-level I(ssh_host_max_dur) option.
+        type: str
+      ssh_host_default_dur:
+        description: See the top-level I(ssh_host_default_dur) option.
+        type: str
+      ssh_user_min_dur:
+        description: See the top-level I(ssh_user_min_dur) option.
+        type: str
+      ssh_user_max_dur:
+        description: See the top-level I(ssh_user_max_dur) option.
+        type: str
+      ssh_user_default_dur:
+        description: See the top-level I(ssh_user_default_dur) option.
+        type: str
+      ssh_template:
+        description: See the top-level I(ssh_template) option.
+        type: path
+      ssh_template_data:
+        description: See the top-level I(ssh_template_data) option.
+        type: path
+      x509_template:
+        description: See the top-level I(x509_template) option.
+        type: path
+      x509_template_data:
+        description: See the top-level I(x509_template_data) option.
+        type: path
+      x509_min_dur:
+        description: See the top-level I(x509_min_dur) option.
+        type: str
+      x509_max_dur:
+        description: See the top-level I(x509_max_dur) option.
+        type: str
+      x509_default_dur:
+        description: See the top-level I(x509_default_dur) option.
+        type: str
+      x5c_root:
+        description: See the top-level I(x5c_root) option.
+        type: path
+        aliases:
+          - x5c_root_file
+  prune:
+    description: >
+      Remove all provisioners from the CA that are not listed in I(provisioners).
+      The provisioner set in I(admin_provisioner) is never removed.
+      B(Caution:) this also removes provisioners that were created by other means, such as the default provisioner
+      created by C(step ca init).
+      Requires I(provisioners).
+    type: bool
+    default: false
+    version_added: '0.25.0'
   public_key:
     description: >
         The file containing the JWK public key.
@@ -292,8 +576,11 @@ options:
     description: >
         Whether the provisioner should be present or absent.
         Note that C(present) does not update existing provisioners.
-        C(updated) will attempt to update the provisioner regardless of whether it has changed or not.
-        Note that this will always report the task as changed.
+        C(updated) compares the given options with the current provisioner configuration
+        and only updates the provisioner if any of them differ.
+        Options that set key material (I(jwk_create), I(jwk_private_key), I(password), I(password_file)
+        and I(public_key) for non-K8SSA provisioners) can't be compared and always cause an update.
+        Options that are not set are not compared, as they are not modified by an update.
     choices:
       - 'present'
       - 'updated'
@@ -359,6 +646,7 @@ options:
 extends_documentation_fragment:
   - maxhoesel.smallstep.cli_executable
   - maxhoesel.smallstep.ca_admin
+  - maxhoesel.smallstep.secret_passing
 """
 
 EXAMPLES = r"""
@@ -441,111 +729,94 @@ EXAMPLES = r"""
       - dc760a01-2886-4a84-9abc-f3508e0f87d9
     azure_object_ids:
       - f50926c7-abbf-4c28-87dc-9adc7eaf3ba7
+
+- name: Ensure that exactly these provisioners exist, removing all others
+  maxhoesel.smallstep.step_ca_provisioner:
+    provisioners:
+      - name: acme
+        type: ACME
+      - name: cicd
+        type: JWK
+        jwk_create: true
+        password_file: /etc/step/cicd-password
+      - name: sshpop
+        type: SSHPOP
+    prune: true
+"""
+
+RETURN = r"""
+provisioner_cache_hit:
+  description: Whether the provisioner list was taken from the cache, see I(provisioner_cache_ttl).
+  type: bool
+  returned: always
+provisioners:
+  description: The result for each provisioner, in the order of I(provisioners), followed by any pruned provisioners.
+  type: list
+  elements: dict
+  returned: When I(provisioners) is set
+  contains:
+    name:
+      description: Name of the provisioner.
+      type: str
+    changed:
+      description: Whether the provisioner was added, updated or removed.
+      type: bool
+    pruned:
+      description: Whether the provisioner was removed because it is not listed in I(provisioners).
+      type: bool
+      returned: For pruned provisioners
+    failed:
+      description: Whether managing this provisioner failed.
+      type: bool
+      returned: On failure
+    diff:
+      description: See the top-level I(diff) return value.
+      type: dict
+      returned: When I(state=updated) and the provisioner was updated
+    msg:
+      description: Error message or status of the provisioner.
+      type: str
+      returned: On failure, or if the provisioner was not modified
+diff:
+  description: >
+    The options that differ from the current provisioner configuration, with their current (C(before))
+    and requested (C(after)) values. Secret values are replaced with C(********).
+    The current value of file-based options is only returned if the configuration references the file by path.
+  type: dict
+  returned: When I(state=updated) and the provisioner was updated
+  sample:
+    before:
+      x509_max_dur: 24h0m0s
+      force_cn: null
+    after:
+      x509_max_dur: 48h
+      force_cn: true
+pruned:
+  description: Names of the provisioners that were removed by I(prune).
+  type: list
+  elements: str
+  returned: When I(provisioners) is set
 """
 
-import json
 import os
 from typing import cast, Dict, Any
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible.module_utils.common.validation import check_mutually_exclusive
+from ansible.module_utils.common.validation import check_mutually_exclusive, check_required_if
 
 from ..module_utils.params.ca_admin import AdminParams
-from ..module_utils.cli_wrapper import CliCommand, CliCommandArgs, StepCliExecutable
+from ..module_utils.params.secret_passing import SecretPassingParams
+from ..module_utils.caconfig import CaConfigError, CaConfigTransaction
+from ..module_utils.cli_wrapper import StepCliExecutable
 from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
-
-# We cannot use the default connection module util, as that one includes the --offline flag,
-# which is not valid for the provisioner API call
-CONNECTION_CLIARG_MAP = {
-    "ca_config": "--ca-config",
-    "ca_url": "--ca-url",
-    "root": "--root"
-}
-
-CREATE_UPDATE_CLIARGS = {
-    "allow_renewal_after_expiry": "--allow-renewal-after-expiry",
-    "aws_accounts": "--aws-account",
-    "azure_audience": "--azure-audience",
-    "azure_object_ids": "--azure-object-id",
-    "azure_resource_groups": "--azure-resource-group",
-    "azure_subscription_ids": "--azure-subscription-id",
-    "azure_tenant": "--azure-tenant",
-    "disable_custom_sans": "--disable-custom-sans",
-    "disable_renewal": "--disable-renewal",
-    "disable_trust_on_first_use": "--disable-trust-on-first-use",
-    "force_cn": "--force-cn",
-    "gcp_projects": "--gcp-project",
-    "gcp_service_accounts": "--gcp-service-account",
-    "instance_age": "--instance-age",
-    "jwk_create": "--create",
-    "jwk_private_key": "--private-key",
-    "nebula_root": "--nebula-root",
-    "oidc_admins": "--admin",
-    "oidc_client_id": "--client-id",
-    "oidc_client_secret": "--client-secret",
-    "oidc_configuration_endpoint": "--configuration-endpoint",
-    "oidc_groups": "--group",
-    "oidc_listen_address": "--listen-address",
-    "oidc_tenant_id": "--tenant-id",
-    "password_file": "--password-file",
-    "public_key": "--public-key",
-    "require_eab": "--require-eab",
-    "scep_capabilities": "--capabilities",
-    "scep_challenge": "--challenge",
-    "scep_encryption_algorithm_identifier": "--encryption-algorithm-identifier",
-    "scep_include_root": "--include-root",
-    "scep_min_public_key_length": "--min-public-key-length",
-    "ssh": "--ssh",
-    "ssh_host_min_dur": "--ssh-host-min-dur",
-    "ssh_host_max_dur": "--ssh-host-max-dur",
-    "ssh_host_default_dur": "--ssh-host-default-dur",
-    "ssh_user_min_dur": "--ssh-user-min-dur",
-    "ssh_user_max_dur": "--ssh-user-max-dur",
-    "ssh_user_default_dur": "--ssh-user-default-dur",
-    "ssh_template": "--ssh-template",
-    "ssh_template_data": "--ssh-template-data",
-    "x509_template": "--x509-template",
-    "x509_template_data": "--x509-template-data",
-    "x509_min_dur": "--x509-min-dur",
-    "x509_max_dur": "--x509-max-dur",
-    "x509_default_dur": "--x509-default-dur",
-    "x5c_root": "--x5c-root",
-}
-CREATE_UPDATE_TMPFILE_ARGS = {
-    "password": "--password-file"
-}
-
-
-def add_provisioner(name: str, provisioner_type: str, executable: StepCliExecutable, module: AnsibleModule):
-    args = AdminParams.cli_args().join(CliCommandArgs(
-        ["ca", "provisioner", "add", name, "--type", provisioner_type],
-        {**CREATE_UPDATE_CLIARGS, **CONNECTION_CLIARG_MAP},
-        CREATE_UPDATE_TMPFILE_ARGS
-    ))
-    cmd = CliCommand(executable, args)
-    cmd.run(module)
-    return
-
-
-def update_provisioner(name: str, executable: StepCliExecutable, module: AnsibleModule):
-    args = AdminParams.cli_args().join(CliCommandArgs(
-        ["ca", "provisioner", "update", name],
-        {**CREATE_UPDATE_CLIARGS, **CONNECTION_CLIARG_MAP},
-        CREATE_UPDATE_TMPFILE_ARGS
-    ))
-    cmd = CliCommand(executable, args)
-    cmd.run(module)
-    return
-
-
-def remove_provisioner(name: str, executable: StepCliExecutable, module: AnsibleModule):
-    args = AdminParams.cli_args().join(CliCommandArgs(
-        ["ca", "provisioner", "remove", name],
-        CONNECTION_CLIARG_MAP
-    ))
-    cmd = CliCommand(executable, args)
-    cmd.run(module)
-    return
+from ..module_utils.provisioners import (
+    CONNECTION_CLIARG_MAP,
+    PROVISIONER_ITEM_PARAMS,
+    ProvisionerCache,
+    apply_provisioner_changes,
+    get_provisioners,
+    provisioner_items,
+)
 
 
 def run_module():
@@ -557,6 +828,7 @@ def run_module():
         azure_resource_groups=dict(type="list", elements="str", aliases=["azure_resource_group"]),
         azure_subscription_ids=dict(type="list", elements="str", aliases=["azure_subscription_id"]),
         azure_tenant=dict(type="str"),
+        batch_offline_changes=dict(type="bool", default=False),
         ca_config=dict(
             type="path", default=f"{os.environ.get('STEPPATH', os.environ['HOME'] + '/.step')}/config/ca.json"),
         ca_url=dict(type="str"),
@@ -569,7 +841,7 @@ def run_module():
         instance_age=dict(type="str"),
         jwk_create=dict(type="bool", aliases=["create"]),
         jwk_private_key=dict(type="path", aliases=["private_key"]),
-        name=dict(type="str", required=True),
+        name=dict(type="str"),
         nebula_root=dict(type="path"),
         oidc_admins=dict(type="list", elements="str", aliases=["oidc_admin", "admin", "oidc_admin_email"]),
         oidc_client_id=dict(type="str", aliases=["client_id"]),
@@ -578,8 +850,10 @@ def run_module():
         oidc_groups=dict(type="list", elements="str", aliases=["group", "oidc_group"]),
         oidc_listen_address=dict(type="str", aliases=["listen_address", "oidc_client_address"]),
         oidc_tenant_id=dict(type="str", aliases=["tenant_id"]),
+        provisioner_cache_ttl=dict(type="int", default=0),
         password=dict(type="str", no_log=True),
         password_file=dict(type="path", no_log=False),
+        prune=dict(type="bool", default=False),
         public_key=dict(type="path", aliases=["jwk_public_key", "k8ssa_public_key", "k8s_pem_keys_file"]),
         require_eab=dict(type="bool"),
         root=dict(type="path"),
@@ -606,76 +880,106 @@ def run_module():
         x509_max_dur=dict(type="str"),
         x509_default_dur=dict(type="str"),
         x5c_root=dict(type="path", aliases=["x5c_root_file"]),
-        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE)
+        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE),
+        step_cli_timings=dict(type="bool", default=False)
     )
+    # Items in the provisioners list accept the per-provisioner subset of the regular params.
+    # Unset item values fall back to the top-level params, so the item options must not have defaults.
+    provisioner_options = {
+        opt: {k: v for k, v in argument_spec[opt].items() if k != "default"} for opt in PROVISIONER_ITEM_PARAMS
+    }
+    provisioner_options["name"]["required"] = True
+    argument_spec["provisioners"] = dict(type="list", elements="dict", options=provisioner_options)
+
     result: Dict[str, Any] = dict(changed=False)
     module = AnsibleModule(argument_spec={
         **AdminParams.argument_spec,
+        **SecretPassingParams.argument_spec,
         **argument_spec
-    }, supports_check_mode=True)
+    }, supports_check_mode=True,
+        required_one_of=[["name", "provisioners"]],
+        mutually_exclusive=[["name", "provisioners"]],
+        required_if=[["prune", True, ["provisioners"]], ["batch_offline_changes", True, ["provisioners"]]])
     module_params = cast(Dict, module.params)
     admin_params = AdminParams(module)
 
     try:
         admin_params.check()
-        check_mutually_exclusive(["password", "password_file"], module_params)
     except TypeError as e:
         module.fail_json(f"Parameter validation failed: {e}")
 
-    executable = StepCliExecutable(module, module_params["step_cli_executable"])
-
-    state = cast(str, module_params["state"])
-    p_type = cast(str, module_params["type"])
-
-    if state == "present" and not p_type:
-        module.fail_json("Provisioner type is required when state == present")
+    items = provisioner_items(module_params)
+    for params in items:
+        try:
+            # Only count params that are actually set, as items always contain every key
+            set_params = {k: v for k, v in params.items() if v is not None}
+            check_required_if([["state", "present", ["type"]]], set_params)
+            check_mutually_exclusive(["password", "password_file"], set_params)
+        except TypeError as e:
+            module.fail_json(f"Parameter validation failed for provisioner {params['name']}: {e}")
+    names = [params["name"] for params in items]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        module.fail_json(f"Parameter validation failed: duplicate provisioner names: {', '.join(duplicates)}")
 
-    ca_online_check_args = CliCommandArgs(["ca", "provisioner", "list"], CONNECTION_CLIARG_MAP)
-    ca_online_check = CliCommand(executable, ca_online_check_args, run_in_check_mode=True, fail_on_error=False)
-    ca_online_res = ca_online_check.run(module)
-    # Offline provisioner management is possible even if the CA is down.
-    # ca provisioner list does depend on the CA being available however, so we need some backup strategies.
-    if ca_online_res.rc == 0:
+    executable = StepCliExecutable(module, module_params["step_cli_executable"])
+    result["version_cache_hits"] = executable.version_cache_hits
+    if executable.timings is not None:
+        result["timings"] = executable.timings
+
+    cache = ProvisionerCache({k: module_params[k] for k in CONNECTION_CLIARG_MAP}, module_params["ca_config"],
+                             module_params["provisioner_cache_ttl"])
+    provisioners = cache.get()
+    result["provisioner_cache_hit"] = provisioners is not None
+    if provisioners is None:
+        provisioners = get_provisioners(executable, module, admin_params)
+        cache.set(provisioners)
+
+    transaction = None
+    if module_params["batch_offline_changes"] and not admin_params.is_defined() and not module.check_mode:
+        # Without admin, all changes are made to ca_config, so they can be staged in a working copy
         try:
-            provisioners = json.loads(ca_online_res.stdout)
-        except (json.JSONDecodeError, OSError) as e:
-            module.fail_json(f"Error reading provisioner config: {e}")
-            return  # makes pylint happy
-    elif admin_params.is_defined():
-        # Admin credentials means that the provisioners are managed remotely and are stored in the DB.
-        # Combined with a connection failure, this means that we are unable to continue
-        module.fail_json(
-            "Could not contact CA to retrieve provisioners and cannot fallback to direct manipulation "
-            "as remote admin parameters are set. Aborting"
-        )
-        return  # makes pylint happy
-    else:
-        # Without admin, provisioners are always managed locally, so we can just read them as a fallback
-        with open(module_params["ca_config"], "rb") as f:
+            transaction = CaConfigTransaction(module_params["ca_config"])
+        except CaConfigError as e:
+            module.fail_json(str(e), **result)
+            raise  # makes pylint and pylance happy
+        items = [{**params, "ca_config": transaction.path} for params in items]
+
+    try:
+        item_results, pruned = apply_provisioner_changes(executable, module, provisioners, items)
+        failed = [item["name"] for item in item_results if item.get("failed")]
+        if transaction is not None and failed:
+            for item_result in item_results:
+                if item_result["changed"]:
+                    item_result.update(changed=False, msg="Not applied, as other provisioner changes failed")
+            pruned = []
+        elif transaction is not None:
             try:
-                provisioners = json.load(f).get("authority", {}).get("provisioners", [])
-            except (json.JSONDecodeError, OSError) as e:
-                module.fail_json(f"Error reading provisioner config: {e}")
-                return  # makes pylint and pylance happy
-
-    for p in provisioners:
-        if p["name"] == module_params["name"]:
-            if state == "present" and p["type"] == p_type:
-                result["msg"] = "Provisioner found in CA config - not modified"
-            elif state == "updated":
-                update_provisioner(module_params["name"], executable, module)
-                result["changed"] = True
-            elif state == "absent":
-                remove_provisioner(module_params["name"], executable, module)
-                result["changed"] = True
-            module.exit_json(**result)
-
-    # No matching provisioner found
-    if state == "present":
-        add_provisioner(module_params["name"], module_params["type"], executable, module)
-        result["changed"] = True
-    elif state == "updated":
-        module.fail_json(f"Provisioner {module_params['name']} not found but state is 'updated'")
+                transaction.commit()
+            except CaConfigError as e:
+                cache.invalidate()
+                module.fail_json(str(e), **result)
+    finally:
+        if transaction is not None:
+            transaction.close()
+
+    if failed or any(item["changed"] for item in item_results):
+        cache.invalidate()
+
+    if not module_params["provisioners"]:
+        item_result = item_results[0]
+        if item_result.get("failed"):
+            module.fail_json(item_result["msg"], **result)
+        del item_result["name"]
+        result.update(item_result)
+        module.exit_json(**result)
+
+    result["provisioners"] = item_results
+    result["pruned"] = pruned
+    result["changed"] = any(item["changed"] for item in item_results)
+    if failed:
+        module.fail_json(f"Failed to manage {len(failed)} of {len(item_results)} provisioners: {', '.join(failed)}",
+                         **result)
     module.exit_json(**result)
 
 
@@ -12,16 +12,43 @@ version_added: '0.3.0'
 description: Renew a valid certificate
 notes:
   - Check mode is supported.
+  - >
+    Multiple certificates can be renewed in a single task with I(certificates) or I(certificate_glob).
+    Certificates that are not due for renewal are skipped without running C(step-cli), and the remaining
+    certificates are renewed in parallel. The task fails if any certificate could not be renewed,
+    after all other certificates have been processed.
 options:
+  certificates:
+    description: >
+      A list of certificates to renew. Each entry accepts the per-certificate options of this module
+      (I(crt_file), I(key_file), I(expires_in), I(force), I(exec), I(password), I(password_file), I(pid),
+      I(pid_file), I(signal) and I(output_file)). Options that are not set in an entry default to the value
+      of the top-level option.
+      Mutually exclusive with I(crt_file) and I(certificate_glob).
+    type: list
+    elements: dict
+    version_added: '0.25.0'
+  certificate_glob:
+    description: >
+      A glob pattern matching the certificates to renew, such as C(/etc/ssl/step/*.crt).
+      The key of each certificate is expected next to it, with the certificate extension replaced by I(key_suffix).
+      Files ending in I(key_suffix) are never treated as certificates.
+      All other options are applied to every matching certificate.
+      Mutually exclusive with I(crt_file) and I(certificates).
+    type: str
+    version_added: '0.25.0'
   crt_file:
-    description: The certificate in PEM format that we want to renew.
-    required: true
+    description: >
+      The certificate in PEM format that we want to renew.
+      Required unless I(certificates) or I(certificate_glob) are set.
     type: path
   expires_in:
     description: >
       The amount of time remaining before certificate expiration, at which point a renewal should be attempted.
       The certificate renewal will not be performed if the time to expiration is greater than the I(expires_in) value.
       A random jitter (duration/20) will be added to avoid multiple services hitting the renew endpoint at the same time.
+      If the certificate does not expire within this duration (including the maximum jitter),
+      the module returns without running C(step-cli) at all.
       The duration is a sequence of decimal numbers, each with optional fraction and a unit suffix, such as "300ms", "-1.5h" or "2h45m".
       Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
     type: str
@@ -32,16 +59,29 @@ options:
     description: The command to run after the certificate has been renewed.
     type: str
   key_file:
-    description: They key file of the certificate.
-    required: true
+    description: They key file of the certificate. Required if I(crt_file) is set.
     type: path
+  key_suffix:
+    description: The suffix of the key files of certificates that match I(certificate_glob).
+    type: str
+    default: .key
+    version_added: '0.25.0'
+  max_workers:
+    description: >
+      Maximum number of certificates from I(certificates) or I(certificate_glob) that are renewed concurrently.
+      Certificates are processed sequentially if set to 1.
+    type: int
+    default: 4
+    version_added: '0.25.0'
   output_file:
-    description: The new certificate file path. Defaults to overwriting the crt-file positional argument.
+    description: >
+      The new certificate file path. Defaults to overwriting the crt-file positional argument.
+      Can only be used with I(crt_file), or in the entries of I(certificates).
     type: path
   password:
     description: >
         The password to encrypt or decrypt the private key.
-        Will be passed to step-cli through a temporary file.
+        Will be passed to step-cli through a temporary file or file descriptor, see I(step_cli_secret_passing).
         Mutually exclusive with I(password_file)
     type: str
   password_file:
@@ -68,6 +108,7 @@ options:
 extends_documentation_fragment:
   - maxhoesel.smallstep.cli_executable
   - maxhoesel.smallstep.ca_connection
+  - maxhoesel.smallstep.secret_passing
 """
 
 EXAMPLES = r"""
@@ -79,25 +120,199 @@ EXAMPLES = r"""
     key_file: internal.key
     ca_url: https://ca.smallstep.com:9000
     force: true
+
+- name: Renew all certificates in a directory that expire within the next 8 hours
+  maxhoesel.smallstep.step_ca_renew:
+    certificate_glob: /etc/ssl/step/*.crt
+    expires_in: 8h
+    force: true
+
+- name: Renew multiple certificates with individual settings
+  maxhoesel.smallstep.step_ca_renew:
+    certificates:
+      - crt_file: /etc/nginx/tls.crt
+        key_file: /etc/nginx/tls.key
+        pid_file: /run/nginx.pid
+      - crt_file: /etc/postgresql/server.crt
+        key_file: /etc/postgresql/server.key
+        exec: systemctl reload postgresql
+    expires_in: 8h
+    force: true
 """
 
-from typing import Dict, cast, Any
+RETURN = r"""
+old_certificate:
+  description: >
+    The certificate in I(crt_file) before the renewal, or null if it could not be read.
+    Only returned if I(crt_file) is set; see I(certificates) for the results in sweep mode.
+  returned: success
+  type: dict
+  version_added: '0.25.0'
+  contains:
+    serial:
+      description: The serial number of the certificate, as a decimal string.
+      type: str
+    not_before:
+      description: The start of the validity period of the certificate.
+      type: str
+      sample: "2024-01-01T00:00:00Z"
+    not_after:
+      description: The expiry date of the certificate.
+      type: str
+      sample: "2024-01-02T00:00:00Z"
+    fingerprint:
+      description: The SHA-256 fingerprint of the certificate.
+      type: str
+new_certificate:
+  description: >
+    The certificate in I(output_file) (or I(crt_file)) after the renewal, with the same fields as I(old_certificate).
+    The module only reports a change if the fingerprint of this certificate differs from the previous certificate,
+    so handlers (such as service reloads) can rely on C(changed) to detect an actual rotation.
+    Identical to I(old_certificate) if the certificate was not due for renewal.
+  returned: success
+  type: dict
+  version_added: '0.25.0'
+certificates:
+  description: >
+    The result for each renewed certificate, in the order of I(certificates) or sorted by path for I(certificate_glob).
+    Each entry contains the C(crt_file), whether it was C(changed) or C(skipped), the C(old_certificate)
+    and C(new_certificate) and, for failed or skipped certificates, a C(msg).
+    Only returned if I(certificates) or I(certificate_glob) are set.
+  returned: success
+  type: list
+  elements: dict
+  version_added: '0.25.0'
+renewed:
+  description: The number of renewed certificates. Only returned if I(certificates) or I(certificate_glob) are set.
+  returned: success
+  type: int
+  version_added: '0.25.0'
+not_due:
+  description: >
+    The number of certificates that were skipped because they are not within I(expires_in) yet.
+    Certificates that step-cli left unchanged for other reasons are not counted here.
+    Only returned if I(certificates) or I(certificate_glob) are set.
+  returned: success
+  type: int
+  version_added: '0.25.0'
+failed_count:
+  description: >
+    The number of certificates that could not be renewed.
+    Only returned if I(certificates) or I(certificate_glob) are set.
+  returned: success
+  type: int
+  version_added: '0.25.0'
+"""
+
+import datetime
+import glob
+import os
+from typing import Dict, List, Optional, cast, Any
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.common.validation import check_mutually_exclusive
 
-from ..module_utils.cli_wrapper import CliCommand, CliCommandArgs, StepCliExecutable
+from ..module_utils import certinfo
+from ..module_utils.cli_wrapper import CliCommand, CliCommandArgs, CliError, StepCliExecutable
+from ..module_utils.duration import parse_duration
+from ..module_utils.pool import map_parallel
 from ..module_utils.params.ca_connection import CaConnectionParams
+from ..module_utils.params.secret_passing import SecretPassingParams
 from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
 
+# All parameters can be converted to a mapping by just appending -- and replacing the underscores
+RENEW_CLIARG_MAP = {arg: f"--{arg.replace('_', '-')}" for arg in [
+    "expires_in", "force", "exec", "output_file", "password_file", "pid", "pid_file", "signal"]}
+CERTIFICATE_ITEM_PARAMS = ["crt_file", "key_file", "output_file", "expires_in", "force", "exec", "password",
+                           "password_file", "pid", "pid_file", "signal"]
+
+
+def renewal_not_due(crt_file: str, expires_in: Optional[str]) -> Optional[certinfo.CertificateValidity]:
+    """Check whether step-cli would skip the renewal because the certificate does not expire within expires_in.
+
+    step-cli adds a random jitter to expires_in, so a certificate is only considered not due if it expires
+    after the largest possible threshold (expires_in plus 1/20th of expires_in or of the certificate lifetime).
+
+    Returns:
+        Optional[certinfo.CertificateValidity]: The validity of the certificate if it is definitely not due
+            for renewal, None if it is due or if this can't be determined locally
+    """
+    expires_in_ns = parse_duration(expires_in) if expires_in else None
+    if not expires_in_ns or expires_in_ns <= 0:
+        return None
+    validity = certinfo.try_load_validity(crt_file)
+    if validity is None:
+        # Let step-cli report any problems with the certificate
+        return None
+
+    threshold = datetime.timedelta(microseconds=expires_in_ns / 1000)
+    threshold += max(threshold, validity.not_after - validity.not_before) / 20
+    if validity.not_after - datetime.datetime.now(datetime.timezone.utc) > threshold:
+        return validity
+    return None
+
+
+def renew_certificate(executable: StepCliExecutable, module: AnsibleModule, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run step ca renew for a single certificate.
+
+    Whether the certificate was renewed is determined by comparing the fingerprints of the certificate
+    before and after running step-cli, rather than by parsing its output.
+
+    Raises:
+        CliError: If the renewal failed
+    """
+    output_file = params["output_file"] or params["crt_file"]
+    old = certinfo.try_load_validity(params["crt_file"])
+    before = old if output_file == params["crt_file"] else certinfo.try_load_validity(output_file)
+
+    renew_args = CaConnectionParams.cli_args().join(CliCommandArgs(
+        ["ca", "renew", params["crt_file"], params["key_file"]],
+        RENEW_CLIARG_MAP,
+        {"password": "--password-file"}
+    ))
+    renew_cmd = CliCommand(executable, renew_args, params=params, raise_errors=True)
+    renew_cmd.run(module)
+
+    new = certinfo.try_load_validity(output_file)
+    return {
+        "changed": new is not None and (before is None or new.fingerprint != before.fingerprint),
+        "old_certificate": old.to_dict() if old else None,
+        "new_certificate": new.to_dict() if new else None,
+    }
+
+
+def not_due_message(validity: certinfo.CertificateValidity, expires_in: str) -> str:
+    return (f"Certificate expires at {validity.not_after.strftime(certinfo.TIME_FORMAT)}, "
+            f"which is not within expires_in ({expires_in}) - not renewed")
+
+
+def certificate_items(module_params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Build the full set of params for each certificate to renew.
+
+    In sweep mode, each entry in I(certificates) or each file matching I(certificate_glob)
+    is merged on top of the top-level params. Otherwise, the top-level params describe the only certificate.
+    """
+    base = {k: v for k, v in module_params.items() if k not in ("certificates", "certificate_glob")}
+    if module_params["certificates"]:
+        return [{**base, **{k: v for k, v in item.items() if v is not None}} for item in module_params["certificates"]]
+    if module_params["certificate_glob"]:
+        key_suffix = module_params["key_suffix"]
+        crt_files = [path for path in sorted(glob.glob(module_params["certificate_glob"]))
+                     if os.path.isfile(path) and not path.endswith(key_suffix)]
+        return [{**base, "crt_file": path, "key_file": os.path.splitext(path)[0] + key_suffix} for path in crt_files]
+    return [base]
+
 
 def run_module():
     argument_spec = dict(
-        crt_file=dict(type="path", required=True),
+        certificate_glob=dict(type="str"),
+        crt_file=dict(type="path"),
         expires_in=dict(type="str"),
         force=dict(type="bool"),
         exec=dict(type="str"),
-        key_file=dict(type="path", required=True),
+        key_file=dict(type="path"),
+        key_suffix=dict(type="str", default=".key"),
+        max_workers=dict(type="int", default=4),
         output_file=dict(type="path"),
         password=dict(type="str", no_log=True),
         password_file=dict(type="path", no_log=False),
@@ -105,12 +320,27 @@ def run_module():
         pid_file=dict(type="path"),
         signal=dict(type="int"),
         step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE),
+        step_cli_timings=dict(type="bool", default=False),
     )
+    # Items in the certificates list accept the per-certificate subset of the regular params.
+    # Unset item values fall back to the top-level params, so the item options must not have defaults.
+    certificate_options = {
+        opt: {k: v for k, v in argument_spec[opt].items() if k != "default"} for opt in CERTIFICATE_ITEM_PARAMS
+    }
+    certificate_options["crt_file"]["required"] = True
+    certificate_options["key_file"]["required"] = True
+    argument_spec["certificates"] = dict(type="list", elements="dict", options=certificate_options)
+
     result: Dict[str, Any] = dict(changed=False)
     module = AnsibleModule(argument_spec={
         **CaConnectionParams.argument_spec,
+        **SecretPassingParams.argument_spec,
         **argument_spec
-    }, supports_check_mode=True)
+    }, supports_check_mode=True,
+        required_one_of=[["crt_file", "certificates", "certificate_glob"]],
+        mutually_exclusive=[["crt_file", "certificates", "certificate_glob"],
+                            ["output_file", "certificates"], ["output_file", "certificate_glob"]],
+        required_together=[["crt_file", "key_file"]])
     module_params = cast(Dict, module.params)
 
     try:
@@ -119,22 +349,54 @@ def run_module():
     except TypeError as e:
         module.fail_json(f"Parameter validation failed: {e}")
 
-    executable = StepCliExecutable(module, module_params["step_cli_executable"])
+    item_results = []
+    pending = []
+    for params in certificate_items(module_params):
+        item_result: Dict[str, Any] = {"crt_file": params["crt_file"], "changed": False}
+        validity = renewal_not_due(params["crt_file"], params["expires_in"])
+        if validity is not None:
+            item_result.update(skipped=True, msg=not_due_message(validity, params["expires_in"]),
+                               old_certificate=validity.to_dict(), new_certificate=validity.to_dict())
+        else:
+            pending.append((item_result, params))
+        item_results.append(item_result)
 
-    # Regular args
-    renew_cliargs = ["expires_in", "force", "exec", "output_file", "password_file", "pid", "pid_file", "signal"]
-    # All parameters can be converted to a mapping by just appending -- and replacing the underscores
-    renew_cliarg_map = {arg: f"--{arg.replace('_', '-')}" for arg in renew_cliargs}
+    if pending:
+        # All certificates share one executable, which is only probed if a certificate is due for renewal
+        executable = StepCliExecutable(module, module_params["step_cli_executable"])
+        result["version_cache_hits"] = executable.version_cache_hits
+        if executable.timings is not None:
+            result["timings"] = executable.timings
 
-    renew_args = CaConnectionParams.cli_args().join(CliCommandArgs(
-        ["ca", "renew", module_params["crt_file"], module_params["key_file"]],
-        renew_cliarg_map,
-        {"password": "--password-file"}
-    ))
-    renew_cmd = CliCommand(executable, renew_args)
-    renew_res = renew_cmd.run(module)
-    if "Your certificate has been saved in" in renew_res.stderr:
-        result["changed"] = True
+        def renew(params: Dict[str, Any]) -> Dict[str, Any]:
+            try:
+                return renew_certificate(executable, module, params)
+            except CliError as e:
+                return {"failed": True, "msg": str(e)}
+        outcomes = map_parallel(renew, [params for _, params in pending], module_params["max_workers"])
+        for (item_result, _), outcome in zip(pending, outcomes):
+            item_result.update(outcome)
+
+    if not (module_params["certificates"] or module_params["certificate_glob"]):
+        item_result = item_results[0]
+        if item_result.get("failed"):
+            module.fail_json(item_result["msg"], **result)
+        for key in ("crt_file", "skipped"):
+            item_result.pop(key, None)
+        result.update(item_result)
+        module.exit_json(**result)
+
+    failed = [item["crt_file"] for item in item_results if item.get("failed")]
+    result.update(
+        certificates=item_results,
+        changed=any(item["changed"] for item in item_results),
+        renewed=sum(1 for item in item_results if item["changed"]),
+        not_due=sum(1 for item in item_results if item.get("skipped")),
+        failed_count=len(failed),
+    )
+    if failed:
+        module.fail_json(f"Failed to renew {len(failed)} of {len(item_results)} certificates: {', '.join(failed)}",
+                         **result)
     module.exit_json(**result)
 
 
@@ -32,7 +32,7 @@ options:
     description: The fingerprint of the targeted root certificate
     type: str
 
-extends_documentation_fragment: maxhoesel.smallstep.step_cli
+extends_documentation_fragment: maxhoesel.smallstep.cli_executable
 """
 
 EXAMPLES = r"""
@@ -43,6 +43,32 @@ EXAMPLES = r"""
     fingerprint: d9d0978692f1c7cc791f5c343ce98771900721405e834cd27b9502cc719f5097
 """
 
+RETURN = r"""
+old_certificate:
+  description: The root certificate in I(root_file) before the module ran, or null if there was none.
+  returned: success
+  type: dict
+  contains:
+    serial:
+      description: The serial number of the certificate, as a decimal string.
+      type: str
+    not_before:
+      description: The start of the validity period of the certificate.
+      type: str
+    not_after:
+      description: The expiry date of the certificate.
+      type: str
+    fingerprint:
+      description: The SHA-256 fingerprint of the certificate.
+      type: str
+new_certificate:
+  description: >
+    The root certificate in I(root_file) after the module ran, with the same fields as I(old_certificate).
+    The module only reports a change if the fingerprint of this certificate differs from the previous one.
+  returned: success
+  type: dict
+"""
+
 import json
 import os
 
@@ -51,6 +77,7 @@ from typing import Dict, cast, Any
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.common.validation import check_mutually_exclusive
 
+from ..module_utils import certinfo
 from ..module_utils.cli_wrapper import CliCommand, CliCommandArgs, StepCliExecutable
 from ..module_utils.params.ca_connection import CaConnectionParams
 from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
@@ -62,6 +89,7 @@ DEFAULTS_FILE = "{steppath}/config/defaults.json".format(
 def run_module():
     argument_spec = dict(
         step_cli_executable=dict(type="path", default="step-cli"),
+        step_cli_timings=dict(type="bool", default=False),
         root_file=dict(type="path", required=True),
         force=dict(type="bool"),
         ca_url=dict(type="str"),
@@ -80,6 +108,9 @@ def run_module():
         module.fail_json(f"Parameter validation failed: {e}")
 
     executable = StepCliExecutable(module, module_params["step_cli_executable"])
+    result["version_cache_hits"] = executable.version_cache_hits
+    if executable.timings is not None:
+        result["timings"] = executable.timings
 
     # Regular args
     ca_root_cliargs = ["force", "ca_url", "fingerprint"]
@@ -90,10 +121,15 @@ def run_module():
         ["ca", "root", module_params["root_file"]],
         ca_root_cliarg_map
     ))
+    # Compare the root certificate before and after running step-cli instead of parsing its output
+    old = certinfo.try_load_validity(module_params["root_file"])
     ca_root_cmd = CliCommand(executable, ca_root_args)
-    ca_root_res = ca_root_cmd.run(module)
-    if "The root certificate has been saved in" in ca_root_res.stderr:
-        result["changed"] = True
+    ca_root_cmd.run(module)
+    new = certinfo.try_load_validity(module_params["root_file"])
+
+    result["changed"] = new is not None and (old is None or new.fingerprint != old.fingerprint)
+    result["old_certificate"] = old.to_dict() if old else None
+    result["new_certificate"] = new.to_dict() if new else None
     module.exit_json(**result)
 
 
@@ -15,6 +15,14 @@ description: >
 notes:
   - Check mode is supported.
   - This module currently not supports all options provided by step-cli command.
+  - >
+    Multiple tokens can be generated in a single task with I(names) or I(requests).
+    The tokens are generated in parallel and returned in I(tokens). The task fails if any token
+    could not be generated, after all other tokens have been processed.
+  - >
+    Tokens for JWK provisioners can be signed in-process with I(native_signing).
+    The provisioner list is then retrieved and the provisioner key is decrypted once per task,
+    instead of running C(step-cli) for each token.
 options:
   cert_not_after:
     description: >
@@ -43,6 +51,13 @@ options:
   kid:
     description: The provisioner kid to use.
     type: str
+  max_workers:
+    description: >
+      Maximum number of tokens from I(names) or I(requests) that are generated concurrently.
+      Tokens are generated sequentially if set to 1.
+    type: int
+    default: 4
+    version_added: '0.25.0'
   name:
     aliases:
       - subject
@@ -50,8 +65,29 @@ options:
       The Common Name, DNS Name, or IP address that will be set by the certificate authority.
       When there are no additional Subject Alternative Names configured (via the I(san) parameter,
       the subject will be added as the only element of the 'sans' claim on the token.
+      Exactly one of I(name), I(names) or I(requests) must be set.
     type: str
-    required: true
+  names:
+    description: >
+      Generate one token for each of the given names, using the other options of this module for all of them.
+      The tokens are returned in I(tokens), keyed by name, so I(return_token) must be set.
+      Exactly one of I(name), I(names) or I(requests) must be set.
+    type: list
+    elements: str
+    version_added: '0.25.0'
+  native_signing:
+    description: >
+      Sign tokens for JWK provisioners in-process instead of running C(step ca token) for each token.
+      Requires the C(cryptography) Python library on the remote host, the provisioner password and a configured
+      CA URL and root certificate (either through I(ca_url) and I(root) or in the C(step-cli) defaults).
+      Tokens that use options not supported by the native implementation
+      (I(cert_not_after), I(cert_not_before), I(k8ssa_token_path), I(key), I(not_after), I(not_before),
+      I(sshpop_cert), I(sshpop_key), I(x5c_cert), I(x5c_key), I(ca_config) or I(offline)),
+      and tokens for other provisioner types are always generated with C(step-cli).
+      The tokens contain the same claims as those generated by C(step-cli).
+    type: bool
+    default: false
+    version_added: '0.25.0'
   not_after:
     description: >
       The time/duration when the certificate validity period ends. If a time is used it is expected to be in RFC 3339 format.
@@ -81,7 +117,7 @@ options:
   provisioner_password:
     description: >
         The password to encrypt or decrypt the one-time token generating key.
-        Will be passed to step-cli through a temporary file.
+        Will be passed to step-cli through a temporary file or file descriptor, see I(step_cli_secret_passing).
         Mutually exclusive with I(password_file)
     type: str
   provisioner_password_file:
@@ -94,6 +130,37 @@ options:
       Return the OTT through the module return values.
       Depending on your security needs, you might want to use I(output_path) instead.
     type: bool
+  requests:
+    description: >
+      Generate one token for each entry in this list. Each entry accepts the per-token options of this module
+      (I(name), I(san), I(principal), I(host), I(ssh), I(revoke), I(renew), I(rekey), I(not_before), I(not_after),
+      I(cert_not_before), I(cert_not_after), I(force), I(output_file) and I(return_token)).
+      Options that are not set in an entry default to the value of the top-level option.
+      Exactly one of I(name), I(names) or I(requests) must be set.
+    type: list
+    elements: dict
+    version_added: '0.25.0'
+    suboptions:
+      id:
+        description: >
+          The key of this token in I(tokens). Defaults to I(name).
+          Must be unique, so set this when requesting multiple tokens for the same name,
+          such as an X.509 and an SSH token for the same host.
+        type: str
+  reuse_if_valid_for:
+    description: >
+      Keep an existing token in I(output_file) instead of generating a new one, as long as it was issued for the same
+      request (subject, SANs or SSH principals, audience and provisioner) and is still valid for at least this duration.
+      The token is decoded locally, so neither C(step-cli) nor the CA are contacted for reused tokens.
+      Only tokens that have not been used yet can be reused, as the CA accepts each token only once.
+      Do not set this if the token may have been consumed since it was written, for example by a certificate
+      request in an earlier run.
+      The duration is a sequence of decimal numbers, each with optional fraction and a unit suffix,
+      such as "300ms", "1.5h" or "2h45m". Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
+      Has no effect on tokens that are returned with I(return_token) or that use I(cert_not_before)
+      or I(cert_not_after).
+    type: str
+    version_added: '0.25.0'
   revoke:
     description: Create a token for authorizing 'Revoke' requests. The audience will be invalid for any other API request.
     type: bool
@@ -129,12 +196,49 @@ options:
 extends_documentation_fragment:
   - maxhoesel.smallstep.cli_executable
   - maxhoesel.smallstep.ca_connection
+  - maxhoesel.smallstep.secret_passing
 """
 
 EXAMPLES = r"""
 - name: Generate a token on the CA, using the values from $STEPPATH
   maxhoesel.smallstep.step_ca_token:
     name: foo.bar
+    return_token: true
+
+- name: Generate a token for each host in the play on the CA host
+  maxhoesel.smallstep.step_ca_token:
+    names: "{{ ansible_play_hosts }}"
+    provisioner: hosts
+    provisioner_password_file: /etc/step-ca/provisioner-password
+    return_token: true
+  delegate_to: ca.example.com
+  run_once: true
+  register: host_tokens
+
+- name: Write a token for a certificate request, keeping the previous token if it is still valid for a minute
+  maxhoesel.smallstep.step_ca_token:
+    name: foo.bar
+    output_file: /etc/step/foo.bar.token
+    force: true
+    reuse_if_valid_for: 1m
+
+- name: Generate an X.509 and an SSH host token for one host
+  maxhoesel.smallstep.step_ca_token:
+    requests:
+      - name: web01.example.com
+        san:
+          - web01.example.com
+          - 10.0.0.10
+      - id: web01-ssh
+        name: web01.example.com
+        ssh: true
+        host: true
+        principal:
+          - web01.example.com
+    provisioner: hosts
+    provisioner_password_file: /etc/step-ca/provisioner-password
+    return_token: true
+  register: web01_tokens
 """
 
 RETURNS = r"""
@@ -143,16 +247,306 @@ token:
   returned: When I(return_token) is set
   type: str
   no_log: true
+tokens:
+  description: >
+    The generated tokens, keyed by name (for I(names)) or by the I(id) of each request (for I(requests)).
+    Only contains the tokens for which I(return_token) is set.
+  returned: When I(names) or I(requests) is set
+  type: dict
+  sample:
+    web01.example.com: eyJhbGciOiJFUzI1NiIsImtpZCI6...
+    web01-ssh: eyJhbGciOiJFUzI1NiIsImtpZCI6...
+  version_added: '0.25.0'
+errors:
+  description: The error message for each token that could not be generated, keyed like I(tokens).
+  returned: When generating any token from I(names) or I(requests) failed
+  type: dict
+  version_added: '0.25.0'
+reused_tokens:
+  description: >
+    Number of tokens that were not regenerated, as the token in I(output_file) could be reused
+    (see I(reuse_if_valid_for)). The module only reports a change if at least one token was generated.
+  returned: always
+  type: int
+  version_added: '0.25.0'
+native_tokens:
+  description: Number of tokens that were signed in-process, see I(native_signing).
+  returned: always
+  type: int
+  version_added: '0.25.0'
+native_signing_error:
+  description: >
+    Why tokens could not be signed in-process, such as the selected provisioner not being a JWK provisioner.
+    All tokens were generated with C(step-cli) instead.
+  returned: When native signing was attempted but not possible
+  type: str
+  version_added: '0.25.0'
 """
-from typing import cast, Dict, Any
+import datetime
+import json
+import os
+import time
+from typing import cast, Dict, List, Optional, Tuple, Any
 
 from ansible.module_utils.common.validation import check_required_one_of, check_mutually_exclusive
 from ansible.module_utils.basic import AnsibleModule
 
-from ..module_utils.cli_wrapper import CliCommandArgs, StepCliExecutable, CliCommand
+from ..module_utils import certinfo, ott
+from ..module_utils.cli_wrapper import CliCommandArgs, CliError, StepCliExecutable, CliCommand
+from ..module_utils.duration import parse_duration
 from ..module_utils.params.ca_connection import CaConnectionParams
+from ..module_utils.params.secret_passing import SecretPassingParams
+from ..module_utils.pool import map_parallel
 from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
 
+# Regular args
+TOKEN_CLIARGS = ["cert_not_after", "cert_not_before", "force", "host", "k8ssa_token_path", "key", "kid",
+                 "not_after", "not_before", "output_file", "principal", "provisioner", "provisioner_password_file",
+                 "revoke", "renew", "rekey", "san", "ssh", "sshpop_cert", "sshpop_key", "x5c_cert",
+                 "x5c_key"]
+# All parameters can be converted to a mapping by just appending -- and replacing the underscores
+TOKEN_CLIARG_MAP = {arg: f"--{arg.replace('_', '-')}" for arg in TOKEN_CLIARGS}
+# Options that the native token generator does not implement. Tokens using any of these are always generated by step-cli
+NATIVE_UNSUPPORTED_PARAMS = ["ca_config", "cert_not_after", "cert_not_before", "k8ssa_token_path", "key", "not_after",
+                             "not_before", "offline", "sshpop_cert", "sshpop_key", "x5c_cert", "x5c_key"]
+TOKEN_ITEM_PARAMS = ["name", "cert_not_after", "cert_not_before", "force", "host", "not_after", "not_before",
+                     "output_file", "principal", "return_token", "revoke", "renew", "rekey", "san", "ssh"]
+
+
+def generate_token(executable: StepCliExecutable, module: AnsibleModule, params: Dict[str, Any]) -> str:
+    """Generate a single token with step ca token and return it
+
+    Raises:
+        CliError: If the token could not be generated
+    """
+    token_args = CaConnectionParams.cli_args().join(CliCommandArgs(
+        ["ca", "token", params["name"]],
+        TOKEN_CLIARG_MAP,
+        {"provisioner_password": "--provisioner-password-file"}
+    ))
+    token_cmd = CliCommand(executable, token_args, params=params, raise_errors=True)
+    return token_cmd.run(module).stdout
+
+
+def _read_json(path: str) -> Any:
+    with open(path, "rb") as f:
+        return json.load(f)
+
+
+def defaults_files() -> List[str]:
+    """Return the step-cli defaults files that apply, with later files taking precedence.
+
+    If a context is selected (see `step context`), the defaults are read from the authority and profile
+    of the current context instead of from $STEPPATH/config.
+    """
+    steppath = os.environ.get("STEPPATH") or f"{os.path.expanduser('~')}/.step"
+    try:
+        context = _read_json(f"{steppath}/current-context.json").get("context")
+    except (OSError, ValueError, AttributeError):
+        context = None
+    if not context:
+        return [f"{steppath}/config/defaults.json"]
+
+    try:
+        entry = _read_json(f"{steppath}/contexts.json").get(context) or {}
+    except (OSError, ValueError, AttributeError):
+        entry = {}
+    authority = entry.get("authority") or context
+    profile = entry.get("profile") or context
+    return [f"{steppath}/authorities/{authority}/config/defaults.json",
+            f"{steppath}/profiles/{profile}/config/defaults.json"]
+
+
+def read_defaults() -> Dict[str, Any]:
+    """Read the step-cli defaults (such as ca-url and root) from $STEPPATH or the current context
+
+    Raises:
+        ott.TokenError: If the defaults file cannot be read
+    """
+    authority_file, *profile_files = defaults_files()
+    try:
+        defaults = _read_json(authority_file)
+    except (OSError, ValueError) as e:
+        raise ott.TokenError(f"Could not read {authority_file}: {e}") from e
+    for path in profile_files:
+        # Profile defaults are optional
+        try:
+            defaults.update(_read_json(path))
+        except (OSError, ValueError):
+            pass
+    return defaults
+
+
+def audience_flags(params: Dict[str, Any]) -> Dict[str, bool]:
+    return {flag: bool(params[flag]) for flag in ("ssh", "revoke", "renew", "rekey")}
+
+
+def requested_claims(params: Dict[str, Any]) -> Tuple[Optional[List[str]], Optional[Dict[str, Any]]]:
+    """Return the SANs and SSH options that step ca token puts into a token with these params.
+
+    X.509 signing tokens authorize the SANs (defaulting to the subject), SSH tokens the certificate type
+    and principals. Tokens for other operations contain neither.
+    """
+    if params["ssh"]:
+        return None, {
+            "certType": "host" if params["host"] else "user",
+            "keyID": params["name"],
+            "principals": params["principal"] or [params["name"]],
+            "validAfter": "",
+            "validBefore": "",
+        }
+    if not (params["revoke"] or params["renew"] or params["rekey"]):
+        return params["san"] or [params["name"]], None
+    return None, None
+
+
+def reusable_token(params: Dict[str, Any], ca_url: Optional[str], min_validity: float) -> Optional[Dict[str, Any]]:
+    """Check whether the token in output_file was issued for the same request
+    and is still valid for min_validity seconds.
+
+    The token is only decoded, not verified, as it was written by this module.
+
+    Returns:
+        Optional[Dict[str, Any]]: The claims of the existing token if it can be reused, otherwise None
+    """
+    if not params["output_file"] or params["cert_not_before"] or params["cert_not_after"]:
+        return None
+    try:
+        with open(params["output_file"], "r", encoding="utf-8") as f:
+            claims = ott.decode_claims(f.read())
+    except (OSError, UnicodeDecodeError, ott.TokenError):
+        return None
+
+    sans, ssh = requested_claims(params)
+    current_ssh = (claims.get("step") or {}).get("ssh")
+    audience = claims.get("aud")
+    if ca_url:
+        audience_matches = audience == ott.token_audience(ca_url, **audience_flags(params))
+    else:
+        audience_matches = isinstance(audience, str) and audience.endswith(
+            ott.token_audience_path(**audience_flags(params)))
+    matches = (
+        claims.get("sub") == params["name"] and audience_matches and
+        (not params["provisioner"] or claims.get("iss") == params["provisioner"]) and
+        sorted(claims.get("sans") or []) == sorted(sans or []) and
+        (ssh is None) == (current_ssh is None)
+    )
+    if matches and ssh is not None:
+        matches = isinstance(current_ssh, dict) and current_ssh.get("certType") == ssh["certType"] and \
+            current_ssh.get("keyID") == ssh["keyID"] and sorted(current_ssh.get("principals") or []) == \
+            sorted(ssh["principals"])
+    expires = claims.get("exp")
+    if not matches or not isinstance(expires, (int, float)) or expires - time.time() < min_validity:
+        return None
+    return claims
+
+
+class NativeTokenGenerator:
+    """Generates JWK provisioner tokens in-process, without running step ca token for each token.
+
+    The provisioner key is retrieved and decrypted once, and is then used to sign all tokens of the module run.
+    """
+
+    def __init__(self, signer: ott.JwkSigner, issuer: str, ca_url: str, root_fingerprint: str) -> None:
+        self.signer = signer
+        self.issuer = issuer
+        self.ca_url = ca_url
+        self.root_fingerprint = root_fingerprint
+
+    @classmethod
+    def create(cls, executable: StepCliExecutable, module: AnsibleModule) -> "NativeTokenGenerator":
+        """Load the JWK provisioner selected by the module params
+
+        Raises:
+            ott.TokenError: If tokens for the provisioner can't be generated natively
+        """
+        module_params = cast(Dict, module.params)
+        if not ott.HAS_CRYPTOGRAPHY:
+            raise ott.TokenError("cryptography is not installed")
+        defaults = {}
+        if not (module_params["ca_url"] and module_params["root"]):
+            defaults = read_defaults()
+        ca_url = module_params["ca_url"] or defaults.get("ca-url")
+        root = module_params["root"] or defaults.get("root")
+        if not (ca_url and root):
+            raise ott.TokenError("CA URL or root certificate not configured")
+        try:
+            root_fingerprint = certinfo.load_validity(root).fingerprint
+        except (OSError, certinfo.CertificateParseError) as e:
+            raise ott.TokenError(f"Could not read root certificate: {e}") from e
+
+        if module_params["provisioner_password"] is not None:
+            password = module_params["provisioner_password"]
+        elif module_params["provisioner_password_file"]:
+            try:
+                with open(module_params["provisioner_password_file"], "r", encoding="utf-8") as f:
+                    # step-cli strips trailing whitespace from password files
+                    password = f.read().rstrip()
+            except OSError as e:
+                raise ott.TokenError(f"Could not read provisioner password file: {e}") from e
+        else:
+            raise ott.TokenError("No provisioner password set")
+
+        list_args = CliCommandArgs(["ca", "provisioner", "list"], {"ca_url": "--ca-url", "root": "--root"})
+        list_cmd = CliCommand(executable, list_args, params={"ca_url": ca_url, "root": root}, raise_errors=True)
+        try:
+            provisioners = json.loads(list_cmd.run(module).stdout)
+        except (CliError, ValueError) as e:
+            raise ott.TokenError(f"Could not retrieve provisioners: {e}") from e
+
+        # Like step-cli, only select a provisioner implicitly if it is the only one
+        candidates = [p for p in provisioners if module_params["provisioner"] in (None, p.get("name"))]
+        if module_params["kid"]:
+            candidates = [p for p in candidates if (p.get("key") or {}).get("kid") == module_params["kid"]]
+        if len(candidates) != 1:
+            raise ott.TokenError(f"Found {len(candidates)} matching provisioners, expected exactly one")
+        provisioner = candidates[0]
+        if provisioner.get("type") != "JWK" or not provisioner.get("encryptedKey"):
+            raise ott.TokenError(f"Provisioner {provisioner.get('name')} is not a JWK provisioner")
+
+        signer = ott.JwkSigner.from_encrypted(provisioner["encryptedKey"], password.encode("utf-8"))
+        signer.kid = (provisioner.get("key") or {}).get("kid") or signer.kid
+        return cls(signer, provisioner["name"], ca_url, root_fingerprint)
+
+    @staticmethod
+    def supports(params: Dict[str, Any]) -> bool:
+        """Whether a token with these params can be generated natively
+        """
+        if any(params.get(param) for param in NATIVE_UNSUPPORTED_PARAMS):
+            return False
+        if params["ssh"] and (params["revoke"] or params["renew"] or params["rekey"]):
+            return False
+        # Without force, step-cli asks before overwriting the output file
+        return not (params["output_file"] and os.path.exists(params["output_file"]) and not params["force"])
+
+    def generate(self, params: Dict[str, Any]) -> str:
+        """Generate a token with the same claims as step ca token, writing it to output_file if set
+        """
+        sans, ssh = requested_claims(params)
+        audience = ott.token_audience(self.ca_url, **audience_flags(params))
+        token = self.signer.sign(ott.token_claims(self.issuer, params["name"], audience, self.root_fingerprint,
+                                                  sans=sans, ssh=ssh))
+        if params["output_file"]:
+            fd = os.open(params["output_file"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(token)
+        return token
+
+
+def token_items(module_params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Build the full set of params for each token to generate.
+
+    In list mode, each entry in I(names) or I(requests) is merged on top of the top-level params.
+    Otherwise, the top-level params describe the only token.
+    """
+    base = {k: v for k, v in module_params.items() if k not in ("names", "requests")}
+    if module_params["names"]:
+        return [{**base, "name": name, "id": name} for name in module_params["names"]]
+    if module_params["requests"]:
+        return [{**base, **{k: v for k, v in item.items() if v is not None}, "id": item["id"] or item["name"]}
+                for item in module_params["requests"]]
+    return [{**base, "id": module_params["name"]}]
+
 
 def run_module():
     argument_spec = dict(
@@ -163,7 +557,10 @@ def run_module():
         k8ssa_token_path=dict(type="path"),
         key=dict(type="path"),
         kid=dict(type="str"),
-        name=dict(aliases=["subject"], type="str", required=True),
+        max_workers=dict(type="int", default=4),
+        name=dict(aliases=["subject"], type="str"),
+        names=dict(type="list", elements="str"),
+        native_signing=dict(type="bool", default=False),
         not_after=dict(type="str"),
         not_before=dict(type="str"),
         output_file=dict(type="path"),
@@ -172,6 +569,7 @@ def run_module():
         provisioner_password=dict(type="str", no_log=True),
         provisioner_password_file=dict(type="path", no_log=False),
         return_token=dict(type="bool"),
+        reuse_if_valid_for=dict(type="str"),
         revoke=dict(type="bool"),
         renew=dict(type="bool"),
         rekey=dict(type="bool"),
@@ -181,47 +579,145 @@ def run_module():
         sshpop_key=dict(type="path"),
         x5c_cert=dict(type="str"),
         x5c_key=dict(type="path"),
-        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE)
+        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE),
+        step_cli_timings=dict(type="bool", default=False)
     )
+    # Items in the requests list accept the per-token subset of the regular params.
+    # Unset item values fall back to the top-level params, so the item options must not have defaults.
+    request_options = {
+        opt: {k: v for k, v in argument_spec[opt].items() if k != "default"} for opt in TOKEN_ITEM_PARAMS
+    }
+    request_options["name"]["required"] = True
+    request_options["id"] = dict(type="str")
+    argument_spec["requests"] = dict(type="list", elements="dict", options=request_options)
+
     result: Dict[str, Any] = dict(changed=False)
     module = AnsibleModule(argument_spec={
         **CaConnectionParams.argument_spec,
+        **SecretPassingParams.argument_spec,
         **argument_spec
-    }, supports_check_mode=True)
+    }, supports_check_mode=True,
+        required_one_of=[["name", "names", "requests"]],
+        mutually_exclusive=[["name", "names", "requests"], ["output_file", "names"], ["output_file", "requests"]])
     CaConnectionParams(module).check()
     module_params = cast(Dict, module.params)
 
     try:
-        check_mutually_exclusive(["return_token", "output_file"], module_params)
-        check_required_one_of(["return_token", "output_file"], module_params)
         check_mutually_exclusive(["provisioner_password", "provisioner_password_file"], module_params)
     except TypeError as e:
         module.fail_json(f"Parameter validation failed: {e}")
 
-    executable = StepCliExecutable(module, module_params["step_cli_executable"])
+    items = token_items(module_params)
+    ids = [params["id"] for params in items]
+    duplicates = sorted({token_id for token_id in ids if ids.count(token_id) > 1})
+    if duplicates:
+        module.fail_json(f"Parameter validation failed: duplicate token ids: {', '.join(duplicates)}. "
+                         "Set a unique id for requests with the same name")
 
-    # Regular args
-    token_cliargs = ["cert_not_after", "cert_not_before", "force", "host", "k8ssa_token_path", "key", "kid",
-                     "not_after", "not_before", "output_file", "principal", "provisioner", "provisioner_password_file",
-                     "revoke", "renew", "rekey", "san", "ssh", "sshpop_cert", "sshpop_key", "x5c_cert",
-                     "x5c_key"]
-    # All parameters can be converted to a mapping by just appending -- and replacing the underscores
-    token_cliarg_map = {arg: f"--{arg.replace('_', '-')}" for arg in token_cliargs}
+    errors: Dict[str, str] = {}
+    for params in items:
+        # Only count params that are actually set, as items always contain every key.
+        # return_token=false in a request overrides a top-level return_token=true, so it counts as unset
+        set_params = {k: v for k, v in params.items() if v is not None and v is not False}
+        try:
+            check_mutually_exclusive([["return_token", "output_file"]], set_params)
+            check_required_one_of([["return_token", "output_file"]], set_params)
+        except TypeError as e:
+            errors[params["id"]] = f"Parameter validation failed: {e}"
+    if errors and not (module_params["names"] or module_params["requests"]):
+        module.fail_json(errors[module_params["name"]])
+    if errors:
+        module.fail_json(f"Parameter validation failed for {len(errors)} of {len(items)} tokens",
+                         errors=errors, **result)
 
-    token_args = CaConnectionParams.cli_args().join(CliCommandArgs(
-        ["ca", "token", module_params["name"]],
-        token_cliarg_map,
-        {"provisioner_password": "--provisioner-password-file"}
-    ))
-    token_cmd = CliCommand(executable, token_args)
-    token_res = token_cmd.run(module)
+    outcomes: List[Dict[str, Any]] = [{} for _ in items]
+    if module_params["reuse_if_valid_for"]:
+        min_validity = parse_duration(module_params["reuse_if_valid_for"])
+        if min_validity is None:
+            module.fail_json(f"Parameter validation failed: invalid duration for reuse_if_valid_for: "
+                             f"{module_params['reuse_if_valid_for']}")
+        ca_url = module_params["ca_url"]
+        if not ca_url:
+            try:
+                ca_url = read_defaults().get("ca-url")
+            except ott.TokenError:
+                pass
+        for i, params in enumerate(items):
+            claims = reusable_token(params, ca_url, cast(int, min_validity) / 1e9)
+            if claims is not None:
+                expires = datetime.datetime.fromtimestamp(claims["exp"], datetime.timezone.utc)
+                outcomes[i] = {"reused": True, "msg": f"Token in {params['output_file']} is valid until "
+                                                      f"{expires.strftime('%Y-%m-%dT%H:%M:%SZ')} - not regenerated"}
+    result["reused_tokens"] = sum(1 for outcome in outcomes if outcome)
+    result["native_tokens"] = 0
+    pending = [i for i, outcome in enumerate(outcomes) if not outcome]
+
+    if pending:
+        # The executable is only probed if a token needs to be generated
+        executable = StepCliExecutable(module, module_params["step_cli_executable"])
+        result["version_cache_hits"] = executable.version_cache_hits
+        if executable.timings is not None:
+            result["timings"] = executable.timings
+        generate_tokens(executable, module, items, outcomes, pending, result)
 
-    result["changed"] = True
-    if module_params["return_token"]:
-        result["token"] = token_res.stdout
+    if not (module_params["names"] or module_params["requests"]):
+        outcome = outcomes[0]
+        if outcome.get("failed"):
+            module.fail_json(outcome["msg"], **result)
+        if outcome.get("reused"):
+            result["msg"] = outcome["msg"]
+            module.exit_json(**result)
+        result["changed"] = True
+        if module_params["return_token"]:
+            result["token"] = outcome["token"]
+        module.exit_json(**result)
+
+    result["tokens"] = {}
+    for params, outcome in zip(items, outcomes):
+        if outcome.get("failed"):
+            errors[params["id"]] = outcome["msg"]
+        elif not outcome.get("reused"):
+            result["changed"] = True
+            if params["return_token"]:
+                result["tokens"][params["id"]] = outcome["token"]
+    if errors:
+        module.fail_json(f"Failed to generate {len(errors)} of {len(items)} tokens: {', '.join(errors)}",
+                         errors=errors, **result)
     module.exit_json(**result)
 
 
+def generate_tokens(executable: StepCliExecutable, module: AnsibleModule, items: List[Dict[str, Any]],
+                    outcomes: List[Dict[str, Any]], pending: List[int], result: Dict[str, Any]) -> None:
+    """Generate the tokens for the pending items, storing the token or error of each item in outcomes.
+
+    Tokens are signed in-process where possible (see NativeTokenGenerator), all others are generated by step-cli.
+    """
+    module_params = cast(Dict, module.params)
+    native_items = [i for i in pending if NativeTokenGenerator.supports(items[i])]
+    if module_params["native_signing"] and native_items and not module.check_mode:
+        try:
+            generator = NativeTokenGenerator.create(executable, module)
+        except ott.TokenError as e:
+            result["native_signing_error"] = str(e)
+        else:
+            for i in native_items:
+                try:
+                    outcomes[i] = {"token": generator.generate(items[i])}
+                except OSError as e:
+                    outcomes[i] = {"failed": True, "msg": f"Could not write token to {items[i]['output_file']}: {e}"}
+    result["native_tokens"] = sum(1 for i in pending if "token" in outcomes[i])
+
+    def generate(params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return {"token": generate_token(executable, module, params)}
+        except CliError as e:
+            return {"failed": True, "msg": str(e)}
+    cli_items = [i for i in pending if not outcomes[i]]
+    for i, outcome in zip(cli_items, map_parallel(generate, [items[i] for i in cli_items],
+                                                  module_params["max_workers"])):
+        outcomes[i] = outcome
+
+
 def main():
     run_module()
 
@@ -18,13 +18,47 @@ description: >
     as determined by C(step certificate verify)
 notes:
   - Check mode is supported.
+  - >
+      If the Python C(cryptography) library is available on the remote host and I(path) is a local certificate file,
+      the JSON data is generated in-process instead of running C(step certificate inspect).
+      In this case, only the commonly used fields of the step-cli output are returned
+      (such as I(serial_number), I(subject), I(issuer), I(validity), I(subject_key_info), I(extensions) and I(names)).
+  - >
+      Likewise, the certificate is verified in-process if C(cryptography) is available.
+      This checks the validity period, the hostname (if I(server_name) is set)
+      and the signature chain against I(roots) or the system trust store.
+  - >
+      If I(paths) is set, each file is parsed and verified in-process if C(cryptography) is available.
+      C(step-cli) is only run for files that can't be handled natively, using up to I(max_workers) concurrent workers.
 options:
   path:
-    description: Path to a certificate or certificate signing request (CSR) to inspect
+    description: >
+      Path to a certificate or certificate signing request (CSR) to inspect.
+      Required unless I(paths) is set.
     type: path
     aliases:
       - crt_file
-    required: true
+  paths:
+    description: >
+      Inspect many certificates at once, such as all certificates below C(/etc/ssl).
+      Each entry may be a certificate file, a directory that is scanned recursively or a glob pattern
+      (C(**) matches any number of directories).
+      A summary of the first certificate in each file is returned in I(certificates), sorted by expiry.
+      Files that do not contain a certificate (such as private keys) are listed in I(ignored_files).
+      Files that can be reached through several paths (such as the hash links in C(/etc/ssl/certs))
+      are only inspected once.
+      Only I(roots) and I(server_name) apply to the certificates found this way, all other options are ignored.
+      Mutually exclusive with I(path).
+    type: list
+    elements: path
+    version_added: '0.25.0'
+  max_workers:
+    description: >
+      Maximum number of concurrent C(step-cli) invocations if I(paths) is set.
+      Only used for files that can't be inspected in-process.
+    type: int
+    default: 4
+    version_added: '0.25.0'
   format:
     description: What format to return. Determines which of the return values will be populated.
     type: str
@@ -73,37 +107,90 @@ EXAMPLES = r"""
   maxhoesel.smallstep.step_certificate_info:
     path: /path/to/certificate.crt
     bundle: true
+
+- name: List all certificates below /etc/ssl and /etc/nginx, soonest expiry first
+  maxhoesel.smallstep.step_certificate_info:
+    paths:
+      - /etc/ssl
+      - /etc/nginx/**/*.crt
+  register: certs
+
+- name: Show all certificates that are expired or otherwise invalid
+  ansible.builtin.debug:
+    msg: "{{ certs.certificates | rejectattr('valid') | map(attribute='path') | list }}"
 """
 
 RETURN = r"""
 json:
   description: The certificate data returned by step-cli, as a JSON data structure.
   type: raw
-  returned: When I(format=json)
+  returned: When I(format=json) and I(paths) is not set
 pem:
   description: The certificate data returned by step-cli, in PEM format
   type: str
-  returned: When I(format=pem)
+  returned: When I(format=pem) and I(paths) is not set
 text:
   description: The certificate data returned by step-cli, in text format
   type: str
-  returned: When I(format=text) or I(format=text-short)
+  returned: When I(format=text) or I(format=text-short) and I(paths) is not set
 valid:
   description: Whether the certificate passed verification by C(step certificate verify)
   type: bool
-  returned: always
+  returned: When I(paths) is not set
+certificates:
+  description: >
+    A summary of the first certificate in each file found in I(paths),
+    sorted by the end of the validity period (soonest first).
+  type: list
+  elements: dict
+  returned: When I(paths) is set
+  contains:
+    path:
+      description: Path of the certificate file.
+      type: str
+    subject:
+      description: Distinguished name of the certificate subject.
+      type: str
+      sample: CN=host.example.com
+    sans:
+      description: Subject alternative names (DNS names, email addresses, IP addresses and URIs).
+      type: list
+      elements: str
+    not_after:
+      description: End of the validity period, in UTC.
+      type: str
+      sample: "2024-01-31T00:00:00Z"
+    fingerprint:
+      description: Hex-encoded SHA-256 fingerprint of the certificate.
+      type: str
+    valid:
+      description: Whether the certificate passed verification, see I(valid).
+      type: bool
+    validity_fail_reason:
+      description: Reason for the failed certificate validity check.
+      type: str
+      returned: When I(valid=false)
+ignored_files:
+  description: Files found in I(paths) that do not contain a certificate.
+  type: list
+  elements: str
+  returned: When I(paths) is set
 validity_fail_reason:
   description: Reason for failed certificate validity check, as output by step-cli.
   type: str
-  returned: When I(valid=false)
+  returned: When I(valid=false) and I(paths) is not set
 """
-from typing import cast, Dict, Any
+import glob
+import json
+import os
+from typing import cast, Dict, Any, List, Optional, Tuple
 
 from ansible.module_utils.basic import AnsibleModule
 
-from ..module_utils.cli_wrapper import CliCommandArgs, StepCliExecutable, CliCommand
-from ..module_utils import helpers
+from ..module_utils.cli_wrapper import CliCommandArgs, CliError, StepCliExecutable, CliCommand
+from ..module_utils import certinfo, helpers
 from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
+from ..module_utils.pool import map_parallel
 
 FORMAT_CLIARGS = {
     "pem": ["--format", "pem"],
@@ -145,29 +232,153 @@ def inspect_non_json(executable: StepCliExecutable, module: AnsibleModule) -> st
     return res.stdout
 
 
+def scan_paths(module: AnsibleModule, paths: List[str]) -> List[str]:
+    """Expand files, directories and glob patterns into a list of files
+
+    Each file is only returned once, even if it is reachable through several paths (e.g. symlinks).
+    """
+    files: Dict[str, str] = {}
+
+    def add(path: str) -> None:
+        files.setdefault(os.path.realpath(path), path)
+
+    for path in paths:
+        if any(c in path for c in "*?["):
+            matches = sorted(glob.glob(path, recursive=True))
+        elif os.path.exists(path):
+            matches = [path]
+        else:
+            module.fail_json(f"Path {path} does not exist")
+            continue  # only here to satisfy the type checker, fail_json never returns
+        for match in matches:
+            if os.path.isdir(match):
+                for root, dirs, names in os.walk(match):
+                    dirs.sort()
+                    for name in sorted(names):
+                        if os.path.isfile(os.path.join(root, name)):
+                            add(os.path.join(root, name))
+            elif os.path.isfile(match):
+                add(match)
+    return list(files.values())
+
+
+def inspect_file_native(path: str, server_name: str, roots: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Inspect and verify the first certificate in a file in-process
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], Optional[str]]: The certificate data (see certinfo.certificate_to_dict())
+            and the reason why the certificate is invalid. Either is None if it could not be determined natively
+    """
+    certs = helpers.load_local_certificates(path)
+    if certs is None:
+        return None, None
+    return certinfo.certificate_to_dict(certs[0]), helpers.verify_certificate_native(certs, server_name, roots)
+
+
+def inspect_file_cli(executable: StepCliExecutable, module: AnsibleModule, path: str, data: Optional[Dict[str, Any]],
+                     server_name: str, roots: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """Inspect (unless data is set) and verify the first certificate in a file with step-cli
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], str]: The certificate data, or None if the file does not contain
+            a certificate, and the reason why the certificate is invalid
+    """
+    if data is None:
+        inspect_cmd = helpers.inspect_certificate_command(executable, path)
+        inspect_cmd.fail_on_error = False
+        inspect_res = inspect_cmd.run(module)
+        if inspect_res.rc != 0:
+            return None, ""
+        try:
+            data = json.loads(inspect_res.stdout)
+        except ValueError:
+            return None, ""
+    return data, helpers.verify_certificate_cli(executable, module, path, server_name, roots)
+
+
+def inspect_paths(module: AnsibleModule, result: Dict[str, Any]) -> None:
+    """Summarize all certificates found in the paths param, running step-cli only for files that can't be
+    handled in-process
+    """
+    module_params = cast(Dict, module.params)
+    server_name = module_params["server_name"] or ""
+    roots = module_params["roots"] or ""
+
+    inspected: List[Tuple[str, Optional[Dict[str, Any]], Optional[str]]] = []
+    pending = []
+    for path in scan_paths(module, module_params["paths"]):
+        data, reason = inspect_file_native(path, server_name, roots)
+        if reason is None and (data is not None or not certinfo.HAS_CRYPTOGRAPHY):
+            # Could not be verified (or, without cryptography, even inspected) natively
+            pending.append((len(inspected), path, data))
+        inspected.append((path, data, reason))
+
+    if pending:
+        executable = StepCliExecutable(module, module_params["step_cli_executable"])
+        result["version_cache_hits"] = executable.version_cache_hits
+        if executable.timings is not None:
+            result["timings"] = executable.timings
+        try:
+            outcomes = map_parallel(
+                lambda item: inspect_file_cli(executable, module, item[1], item[2], server_name, roots),
+                pending, module_params["max_workers"])
+        except CliError as e:
+            module.fail_json(str(e), **result)
+        for (index, path, _), (data, reason) in zip(pending, outcomes):
+            inspected[index] = (path, data, reason)
+
+    certificates = []
+    ignored_files = []
+    for path, data, reason in inspected:
+        if data is None:
+            ignored_files.append(path)
+            continue
+        summary = {"path": path, **certinfo.certificate_summary(data), "valid": not reason}
+        if reason:
+            summary["validity_fail_reason"] = reason
+        certificates.append(summary)
+    result["certificates"] = sorted(certificates, key=lambda c: c["not_after"])
+    result["ignored_files"] = ignored_files
+
+
 def main():
     argument_spec = dict(
-        path=dict(type="path", aliases=["crt_file"], required=True),
+        path=dict(type="path", aliases=["crt_file"]),
+        paths=dict(type="list", elements="path"),
+        max_workers=dict(type="int", default=4),
         format=dict(type="str", choices=["json", "text", "text-short", "pem"], default="json"),
         server_name=dict(type="str", aliases=["servername"]),
         roots=dict(type="str"),
         bundle=dict(type="bool", default=False),
         insecure=dict(type="bool", default=False),
-        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE)
+        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE),
+        step_cli_timings=dict(type="bool", default=False)
     )
     result: Dict[str, Any] = dict(changed=False)
     module = AnsibleModule(argument_spec={
         **argument_spec
-    }, supports_check_mode=True)
+    }, supports_check_mode=True,
+        required_one_of=[["path", "paths"]],
+        mutually_exclusive=[["path", "paths"]])
     module_params = cast(Dict, module.params)
 
+    if module_params["paths"]:
+        inspect_paths(module, result)
+        module.exit_json(**result)
+
     executable = StepCliExecutable(module, module_params["step_cli_executable"])
+    result["version_cache_hits"] = executable.version_cache_hits
+    if executable.timings is not None:
+        result["timings"] = executable.timings
 
-    cert_info = helpers.get_certificate_info(executable, module, module_params["path"],
-                                             bundle=module_params["bundle"],
-                                             insecure=module_params["insecure"],
-                                             server_name=module_params["server_name"],
-                                             roots=module_params["roots"])
+    try:
+        cert_info = helpers.get_certificate_info(executable, module, module_params["path"],
+                                                 bundle=module_params["bundle"],
+                                                 insecure=module_params["insecure"],
+                                                 server_name=module_params["server_name"],
+                                                 roots=module_params["roots"])
+    except CliError as e:
+        module.fail_json(str(e), **result)
     data = cert_info.data if module_params["format"] == "json" else inspect_non_json(executable, module)
     result.update({
         "valid": cert_info.valid,
@@ -19,10 +19,124 @@ notes:
   - Check mode is supported.
   - This module currently not supports all options provided by step-cli command.
   - Revoke and delete of certtificates not tested yet.
+  - >
+    If I(state=present) and the certificate exists, it is recreated if it is due for renewal (after two thirds of
+    its lifetime), or if its type, key ID, principals or public key do not match the module parameters.
+    The certificate is read without invoking step-cli.
 options:
   ca_url:
     description: URI of the targeted Step Certificate Authority
     type: str
+  certificates:
+    description: >
+      Manage multiple SSH certificates in a single module invocation, such as the user certificates of many service
+      accounts on a bastion host.
+      Each item describes one certificate and accepts a subset of the regular options.
+      Options that are not set on an item fall back to the top-level option of the same name,
+      so shared settings such as I(ca_url) or I(provisioner_password_file) only need to be set once.
+      Each certificate is processed independently - if one certificate fails, the remaining ones are still processed
+      and the module fails afterwards, listing all failed certificates.
+      Mutually exclusive with I(key_file).
+    type: list
+    elements: dict
+    version_added: '0.25.0'
+    suboptions:
+      key_file:
+        description: See the top-level I(key_file) option.
+        type: path
+        required: true
+      key_id:
+        description: See the top-level I(key_id) option.
+        type: str
+      principal:
+        description: See the top-level I(principal) option.
+        type: list
+        elements: str
+      host:
+        description: See the top-level I(host) option.
+        type: bool
+      sign:
+        description: See the top-level I(sign) option.
+        type: bool
+      private_key:
+        description: See the top-level I(private_key) option.
+        type: path
+      comment:
+        description: See the top-level I(comment) option.
+        type: str
+      kty:
+        description: See the top-level I(kty) option.
+        type: str
+        choices:
+          - EC
+          - OKP
+          - RSA
+      curve:
+        description: See the top-level I(curve) option.
+        type: str
+        aliases:
+          - crv
+        choices:
+          - P-256
+          - P-384
+          - P-521
+          - Ed25519
+      size:
+        description: See the top-level I(size) option.
+        type: int
+      no_password:
+        description: See the top-level I(no_password) option.
+        type: bool
+      password_file:
+        description: See the top-level I(password_file) option.
+        type: path
+      not_after:
+        description: See the top-level I(not_after) option.
+        type: str
+      not_before:
+        description: See the top-level I(not_before) option.
+        type: str
+      expires_in:
+        description: See the top-level I(expires_in) option.
+        type: str
+      force:
+        description: See the top-level I(force) option.
+        type: bool
+      state:
+        description: See the top-level I(state) option.
+        type: str
+        choices:
+          - present
+          - renewed
+          - revoked
+          - absent
+      token:
+        description: See the top-level I(token) option.
+        type: str
+      set:
+        description: See the top-level I(set) option.
+        type: list
+        elements: str
+      set_file:
+        description: See the top-level I(set_file) option.
+        type: path
+      provisioner:
+        description: See the top-level I(provisioner) option.
+        type: str
+        aliases:
+          - issuer
+      revoke_on_delete:
+        description: See the top-level I(revoke_on_delete) option.
+        type: bool
+      revoke_reason:
+        description: See the top-level I(revoke_reason) option.
+        type: str
+      revoke_reason_code:
+        description: See the top-level I(revoke_reason_code) option.
+        type: str
+      serial:
+        description: See the top-level I(serial) option.
+        type: str
   comment:
     description: The comment used when adding the certificate to an agent. Defaults to the subject if not provided.
     type: str
@@ -44,10 +158,19 @@ options:
       - P-384
       - P-521
       - Ed25519
+  expires_in:
+    description: >
+      The amount of time remaining before certificate expiration, at which point the certificate is renewed
+      (I(state=renewed)) or recreated (I(state=present)).
+      Defaults to the last third of the certificate lifetime.
+      The duration is a sequence of decimal numbers, each with optional fraction and a unit suffix,
+      such as "300ms", "-1.5h" or "2h45m". Valid time units are "ns", "us" (or "µs"), "ms", "s", "m", "h".
+    type: str
   force:
     description: >
         If I(true) and I(state=present), a new certificate will be generated each time this module is executed,
         regardless of existing certificates.
+        If I(true) and I(state=renewed), the certificate is renewed even if it is not due for renewal yet.
     type: bool
   host:
     description: Create a host certificate instead of a user certificate.
@@ -63,7 +186,9 @@ options:
     description: Configure the file from which to read the kubernetes service account token.
     type: path
   key_file:
-    description: The private key name when generating a new key pair, or the public key path when we are just signing it.
+    description: >
+      The private key name when generating a new key pair, or the public key path when we are just signing it.
+      Required unless I(certificates) is set.
     type: path
   key_id:
     description: The certificate identity. If no principals are passed we will use the key-id as a principal, if it has the format abc@def then the principal will be abc.
@@ -79,6 +204,14 @@ options:
       - EC
       - OKP
       - RSA
+  max_workers:
+    description: >
+      Maximum number of certificates from I(certificates) that are checked and issued concurrently.
+      Certificates are processed sequentially if set to 1.
+      Results are always returned in the order of I(certificates).
+    type: int
+    default: 4
+    version_added: '0.25.0'
   nebula_cert:
     description: Certificate file in PEM format to store in the 'nebula' header of a JWT.
     type: path
@@ -117,12 +250,14 @@ options:
   provisioner:
     aliases:
       - issuer
-    description: The provisioner name to use. Required if I(state=present).
+    description: >
+      The provisioner name to use. Required if I(state=present).
+      If I(state=renewed), the name of the SSHPOP provisioner to renew the certificate with.
     type: str
   provisioner_password:
     description: >
       The password to decrypt the one-time token generating key.
-      Will be passed to step-cli through a temporary file.
+      Will be passed to step-cli through a temporary file or file descriptor, see I(step_cli_secret_passing).
       Mutually exclusive with I(provisioner_password_file)
     type: str
   provisioner_password_file:
@@ -168,11 +303,15 @@ options:
         State that the certificate should be in.
         #If I(state=present), the certificate will be (re-)issued if it doesn't exist, is invalid/expired or if its SAN/private key parameters change.
         If I(state=present), the certificate will be (re-)issued if it doesn't exist, is invalid/expired.
+        If I(state=renewed), an existing host certificate will be renewed with C(step ssh renew) once it is due
+        for renewal (see I(expires_in)). This authenticates with the current certificate through the SSHPOP provisioner,
+        so no provisioner password or token is needed. The certificate must exist and still be valid.
         If I(state=revoked), the certificate will be revoked with the CA
         If I(state=absent), the certificate will be removed from the user/host (and optionally revoked with the CA beforehand, see I(revoke_on_delete).
     type: str
     choices:
       - present
+      - renewed
       - revoked
       - absent
     default: present
@@ -189,6 +328,7 @@ options:
 extends_documentation_fragment:
   - maxhoesel.smallstep.cli_executable
   - maxhoesel.smallstep.ca_connection
+  - maxhoesel.smallstep.secret_passing
 """
 
 EXAMPLES = r"""
@@ -197,19 +337,121 @@ EXAMPLES = r"""
   maxhoesel.smallstep.step_ssh_certificate:
     key_id: "mariano@work"
     key_file: "id_ecdsa"
+
+- name: Renew an SSH host certificate once it is due for renewal, using the SSHPOP provisioner
+  maxhoesel.smallstep.step_ssh_certificate:
+    key_id: "{{ ansible_fqdn }}"
+    key_file: /etc/ssh/ssh_host_ecdsa_key
+    state: renewed
+    expires_in: 24h
+
+- name: Ensure user certificates exist for several service accounts on a bastion host
+  maxhoesel.smallstep.step_ssh_certificate:
+    provisioner: "jwk"
+    provisioner_password_file: "/path/to/password_file"
+    no_password: true
+    certificates:
+      - key_id: "deploy@example.com"
+        key_file: "/home/deploy/.ssh/id_ecdsa"
+      - key_id: "backup@example.com"
+        key_file: "/home/backup/.ssh/id_ecdsa"
+        principal:
+          - backup
+          - restore
+"""
+
+RETURN = r"""
+recreate_reason:
+  description: Why an existing certificate was recreated
+  returned: when an existing certificate was recreated and I(certificates) is not set
+  type: str
+  sample: Certificate expires at 2024-01-01T00:00:00Z and needs to be renewed
+renew_reason:
+  description: Why the certificate was renewed
+  returned: when the certificate was renewed with I(state=renewed) and I(certificates) is not set
+  type: str
+  sample: Certificate expires at 2024-01-01T00:00:00Z and needs to be renewed
+certificate:
+  description: >
+    The certificate after the module ran. Only returned if I(state=renewed) and I(certificates) is not set.
+  returned: success and the certificate could be read
+  type: dict
+  contains:
+    key_id:
+      description: The key ID of the certificate
+      type: str
+    principals:
+      description: The principals of the certificate
+      type: list
+      elements: str
+    serial:
+      description: The serial number of the certificate, as a decimal string
+      type: str
+    valid_after:
+      description: The start of the validity period, in UTC
+      type: str
+      sample: "2024-01-01T00:00:00Z"
+    valid_before:
+      description: The end of the validity period in UTC, or C(forever)
+      type: str
+      sample: "2024-01-31T00:00:00Z"
+  sample:
+    key_id: host.example.com
+    principals:
+      - host.example.com
+    serial: "5127437712783637215"
+    valid_after: "2024-01-01T00:00:00Z"
+    valid_before: "2024-01-31T00:00:00Z"
+certificates:
+  description: Per-certificate results, in the same order as the I(certificates) option.
+  type: list
+  elements: dict
+  returned: When I(certificates) is set
+  contains:
+    key_file:
+      description: The I(key_file) of the certificate.
+      type: str
+      returned: always
+    changed:
+      description: Whether this certificate was changed.
+      type: bool
+      returned: always
+    recreate_reason:
+      description: Why the existing certificate was recreated.
+      type: str
+      returned: When an existing certificate was recreated
+    renew_reason:
+      description: Why the certificate was renewed.
+      type: str
+      returned: When the certificate was renewed with I(state=renewed)
+    certificate:
+      description: The certificate after the module ran, see the top-level I(certificate) return value.
+      type: dict
+      returned: If I(state=renewed) and the certificate could be read
+    failed:
+      description: Whether this certificate could not be managed.
+      type: bool
+      returned: When managing this certificate failed
+    msg:
+      description: Error message if this certificate failed.
+      type: str
+      returned: When managing this certificate failed
 """
 import os
 
 from pathlib import Path
-from typing import cast, Dict, Any
+from typing import cast, Dict, List, Tuple, Any
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.common.validation import check_required_if, check_mutually_exclusive
 
 from ..module_utils.params.ca_connection import CaConnectionParams
-from ..module_utils.cli_wrapper import CliCommand, CliCommandArgs, StepCliExecutable
-from ..module_utils import helpers
+from ..module_utils.params.secret_passing import SecretPassingParams
+from ..module_utils.cli_wrapper import CliCommand, CliCommandArgs, CliError, StepCliExecutable
+from ..module_utils import helpers, sshcert
 from ..module_utils.constants import DEFAULT_STEP_CLI_EXECUTABLE
+from ..module_utils.duration import parse_duration
+from ..module_utils.pool import map_parallel
 
 # maps the kty cli parameter to inspect outputs subject_key_info.key_algorithm.name
 CERTINFO_KEY_TYPES = {
@@ -221,10 +463,17 @@ CERTINFO_KEYINFO_KEY = {
     "RSA": "rsa_public_key",
     "ECDSA": "ecdsa_public_key"
 }
+# Params that can be set per certificate in batch mode (the certificates option)
+CERTIFICATE_ITEM_PARAMS = ["key_file", "key_id", "principal", "host", "sign", "private_key", "comment", "kty", "curve",
+                           "size", "no_password", "password_file", "not_after", "not_before", "expires_in", "force",
+                           "state", "token", "set", "set_file", "provisioner", "revoke_on_delete", "revoke_reason",
+                           "revoke_reason_code", "serial"]
+# Characters that step-cli keeps when deriving a user principal from the key ID
+SANITIZED_PRINCIPAL_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789-.")
 
 
-def create_certificate(executable: StepCliExecutable, module: AnsibleModule, force: bool = False) -> Dict[str, Any]:
-    module_params = cast(Dict, module.params)
+def create_certificate(executable: StepCliExecutable, module: AnsibleModule, params: Dict[str, Any],
+                       force: bool = False) -> Dict[str, Any]:
     # step ca certificate arguments
     cert_cliargs = ["comment", "console", "curve", "host", "host_id", "insecure",
                     "k8ssa_token_path", "kms", "kty", "nebula_cert", "nebula_key", "no_password", "not_after",
@@ -233,7 +482,7 @@ def create_certificate(executable: StepCliExecutable, module: AnsibleModule, for
     # All parameters can be converted to a mapping by just appending -- and replacing the underscores
     cert_cliarg_map = {arg: f"--{arg.replace('_', '-')}" for arg in cert_cliargs}
 
-    args = ["ssh", "certificate", module_params["key_id"], module_params["key_file"]]
+    args = ["ssh", "certificate", params["key_id"], params["key_file"]]
     if force:
         args.append("--force")
 
@@ -242,83 +491,222 @@ def create_certificate(executable: StepCliExecutable, module: AnsibleModule, for
 
     create_args = CaConnectionParams.cli_args().join(CliCommandArgs(
         args, cert_cliarg_map, {"provisioner_password": "--provisioner-password-file"}))
-    create_cmd = CliCommand(executable, create_args)
+    create_cmd = CliCommand(executable, create_args, params=params, raise_errors=True)
     create_cmd.run(module)
     return {"changed": True}
 
 
-def cert_needs_recreation(executable: StepCliExecutable, module: AnsibleModule) -> str:
+def ssh_certificate_paths(key_file: str, sign: bool) -> Tuple[Path, Path, Path]:
+    """Resolve the paths of the private key, public key and certificate, as written by step ssh certificate
+
+    Returns:
+        Tuple[Path, Path, Path]: The private key, public key and certificate paths
+    """
+    if not sign:
+        return Path(key_file), Path(f"{key_file}.pub"), Path(f"{key_file}-cert.pub")
+    # When signing, key_file is the public key and the certificate is written next to it
+    base = os.path.splitext(key_file)[0]
+    return Path(base), Path(f"{base}.pub"), Path(f"{base}-cert.pub")
+
+
+def sanitize_user_principal(key_id: str) -> str:
+    """Derive a user principal from a key ID the same way as SanitizeSSHUserPrincipal() in step-cli
+
+    The part before the last "@" is lowercased and any characters other than a-z, 0-9, "-" and "." are replaced by "_".
+    """
+    local_part = key_id.rsplit("@", 1)[0].lower()
+    return "".join(c if c in SANITIZED_PRINCIPAL_CHARS else "_" for c in local_part)
+
+
+def default_principals(key_id: str, host: bool) -> List[str]:
+    """Return the principals that step-cli may use for a certificate requested without a principal
+
+    Host certificates use the key ID, user certificates the key ID itself or its sanitized local part.
+    """
+    return [key_id] if host else [key_id, sanitize_user_principal(key_id)]
+
+
+def cert_needs_recreation(executable: StepCliExecutable, module: AnsibleModule, params: Dict[str, Any],
+                          crt_file: Path, pub_file: Path) -> str:
     """Check whether a certificate needs to be renewed/recreated
 
+    The certificate is parsed in-process and checked for expiry, as well as for any difference
+    between the certificate and the module params (type, key ID, principals and public key).
+
     Returns:
         str: Reason for certificate renewal/recreation, or empty string if no renewal/recreation
           is needed
     """
-    module_params = cast(Dict, module.params)
-
-    cert_info = helpers.get_ssh_renewal_info(
-        #executable, module, module_params["crt_file"], expires_in=module_params["expires_in"]
-        executable, module, module_params["crt_file"]
-    )
+    cert_info = helpers.get_ssh_renewal_info(executable, module, crt_file, params["expires_in"] or "")
 
     # certificate is invalid
     if not cert_info.valid:
         return cert_info.invalid_reason
-
-    # TODO: Check certificate info for any recreate reason
+    if not cert_info.data:
+        # The certificate could only be checked by step-cli, which does not return its contents
+        return ""
+
+    cert = cert_info.data
+    cert_type = "host" if params["host"] else "user"
+    if cert["type"] != cert_type:
+        return f"Certificate is a {cert['type']} certificate, but a {cert_type} certificate was requested"
+    if cert["key_id"] != params["key_id"]:
+        return f"Certificate key ID {cert['key_id']} does not match requested key ID {params['key_id']}"
+    if params["principal"]:
+        if sorted(set(cert["principals"])) != sorted(set(params["principal"])):
+            return (f"Certificate principals {', '.join(cert['principals'])} do not match requested principals "
+                    f"{', '.join(params['principal'])}")
+    elif not set(default_principals(params["key_id"], params["host"])) & set(cert["principals"]):
+        return f"Certificate principals {', '.join(cert['principals'])} do not include the key ID"
+    try:
+        with open(pub_file, "rb") as f:
+            public_key = sshcert.read_public_key_blob(f.read())[1]
+    except (OSError, sshcert.SshCertificateParseError):
+        return ""
+    if sshcert.key_fingerprint(public_key) != cert["public_key_fingerprint"]:
+        return f"Certificate does not match the public key in {pub_file}"
+    return ""
+
+
+def renew_certificate(executable: StepCliExecutable, module: AnsibleModule, params: Dict[str, Any], key_file: Path,
+                      crt_file: Path) -> Dict[str, Any]:
+    """Renew a host certificate with step ssh renew, if it is due for renewal
+    """
+    result: Dict[str, Any] = {}
+
+    cert_info = helpers.get_ssh_renewal_info(executable, module, crt_file, params["expires_in"] or "")
+    if cert_info.data:
+        if cert_info.data["type"] != "host":
+            raise CliError(f"Cannot renew {crt_file}: only host certificates can be renewed")
+        result["certificate"] = cert_info.data
+    if cert_info.valid and not params["force"]:
+        return result
+    result["renew_reason"] = cert_info.invalid_reason or "force parameter enabled"
+
+    # step ssh renew needs the private key to prove possession of the certificate
+    private_key = params["private_key"] or key_file
+    args = ["ssh", "renew", str(crt_file), str(private_key), "--force"]
+    renew_args = CaConnectionParams.cli_args().join(CliCommandArgs(
+        args, {"provisioner": "--issuer", "password_file": "--password-file"}))
+    CliCommand(executable, renew_args, params=params, raise_errors=True).run(module)
+    result["changed"] = True
+
+    if not module.check_mode:
+        try:
+            result["certificate"] = sshcert.load_certificate(str(crt_file)).to_dict()
+        except (OSError, sshcert.SshCertificateParseError):
+            result.pop("certificate", None)
+    return result
 
 
-def revoke_certificate(executable: StepCliExecutable, module: AnsibleModule) -> Dict[str, Any]:  # pylint: disable=unused-argument
-    module_params = cast(Dict, module.params)
+def revoke_certificate(executable: StepCliExecutable, module: AnsibleModule, params: Dict[str, Any]) -> Dict[str, Any]:
     revoke_cliarg_map = {
         "revoke_reason": "--reason",
         "revoke_reason_code": "--reasonCode",
         "token": "--token"
     }
-    args = ["ssh", "revoke", module_params["serial"]]
+    args = ["ssh", "revoke", params["serial"]]
     revoke_args = CaConnectionParams.cli_args().join(CliCommandArgs(args, revoke_cliarg_map))
-    revoke_cmd = CliCommand(executable, revoke_args, fail_on_error=False)
+    revoke_cmd = CliCommand(executable, revoke_args, fail_on_error=False, params=params, raise_errors=True)
     res = revoke_cmd.run(module)
 
     if res.rc != 0 and "is already revoked" in res.stderr:
         return {}
     elif res.rc != 0:
-        module.fail_json(f"Error revoking certificate: {res.stderr}")
-        return {"changed": True}  # only here to satisfy the type checker, fail_json never returns
+        raise CliError(f"Error revoking certificate: {res.stderr}")
     else:
         # ran successfully => revoked
         return {"changed": True}
 
 
-def delete_certificate(executable: StepCliExecutable, module: AnsibleModule, revoke: bool) -> Dict[str, Any]:
-    module_params = cast(Dict, module.params)
+def delete_certificate(executable: StepCliExecutable, module: AnsibleModule, params: Dict[str, Any],
+                       revoke: bool) -> Dict[str, Any]:
     result = {}
     if revoke:
-        result = revoke_certificate(executable, module)
-
-    param_key_file = Path(module_params["key_file"])
-
-    if not module_params["sign"]:
-        key_file = param_key_file
-        pub_file = key_file + ".pub"
-        crt_file = key_file + "-cert.pub"
-    else:
-        key_file = os.path.splitext(param_key_file)[0]
-        pub_file = key_file + ".pub"
-        crt_file = key_file + "-cert.pub"
+        result = revoke_certificate(executable, module, params)
 
-    for file in [key_file, pub_file, crt_file]:
+    for file in ssh_certificate_paths(params["key_file"], params["sign"]):
         if file.exists():
             try:
                 file.unlink()
             except FileNotFoundError:
                 pass
             except OSError as e:
-                module.fail_json(f"Could not delete file: {e}")
+                raise CliError(f"Could not delete file: {e}") from e
             result["changed"] = True
     return result
 
 
+def manage_certificate(executable: StepCliExecutable, module: AnsibleModule, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Bring a single SSH certificate into the state described by params
+
+    Raises:
+        CliError: If any step-cli invocation or file operation fails
+    """
+    result: Dict[str, Any] = {}
+    # Resolve file path names if 3 related files
+    key_file, pub_file, crt_file = ssh_certificate_paths(params["key_file"], params["sign"])
+
+    # Check existence of cert
+    crt_exists = crt_file.exists()
+
+    # Switch according to targat state parameter
+    if params["state"] == "present":
+        if not crt_exists:
+            # Create key pair and certificate
+            result.update(create_certificate(executable, module, params))
+        else:
+            # Check for reason to recreate (overwrite) existing certificate
+            if params["force"]:
+                recreate_reason = "force parameter enabled"
+            else:
+                recreate_reason = cert_needs_recreation(executable, module, params, crt_file, pub_file)
+            # Do recreate certificate
+            if recreate_reason:
+                result["recreate_reason"] = recreate_reason
+                result.update(create_certificate(executable, module, params, force=True))
+    elif params["state"] == "renewed":
+        if crt_exists:
+            result.update(renew_certificate(executable, module, params, key_file, crt_file))
+        else:
+            raise CliError("Cannot renew certificate as it does not exist")
+    elif params["state"] == "revoked":
+        if crt_exists:
+            result.update(revoke_certificate(executable, module, params))
+        else:
+            raise CliError("Cannot revoke certificate as it does not exist")
+    elif params["state"] == "absent" and crt_exists:
+        result.update(delete_certificate(executable, module, params, params["revoke_on_delete"]))
+    return result
+
+
+def manage_certificates(executable: StepCliExecutable, module: AnsibleModule, items: List[Dict[str, Any]],
+                        max_workers: int) -> List[Dict[str, Any]]:
+    """Run manage_certificate() for each item, using up to max_workers concurrent workers.
+
+    Returns:
+        List[Dict[str, Any]]: The result of each item in input order. Failed items contain failed and msg
+    """
+    def manage(params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return manage_certificate(executable, module, params)
+        except CliError as e:
+            return {"failed": True, "msg": str(e)}
+    return map_parallel(manage, items, max_workers)
+
+
+def certificate_items(module_params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Build the full set of params for each SSH certificate to manage.
+
+    In batch mode, each entry in I(certificates) is merged on top of the top-level params.
+    Otherwise, the top-level params describe the only certificate.
+    """
+    base = {k: v for k, v in module_params.items() if k != "certificates"}
+    if not module_params["certificates"]:
+        return [base]
+    return [{**base, **{k: v for k, v in item.items() if v is not None}} for item in module_params["certificates"]]
+
+
 def run_module():
     argument_spec = dict(
         comment=dict(type="str"),
@@ -326,6 +714,7 @@ def run_module():
         crt_file=dict(type="path"),
         curve=dict(type="str", choices=[
                    "P-256", "P-384", "P-521", "Ed25519"], aliases=["crv"]),
+        expires_in=dict(type="str"),
         force=dict(type="bool"),
         host=dict(type="bool"),
         host_id=dict(type="uuid"),
@@ -335,6 +724,7 @@ def run_module():
         key_id=dict(type="str"),
         kms=dict(type="str"),
         kty=dict(type="str", choices=["EC", "OKP", "RSA"]),
+        max_workers=dict(type="int", default=4),
         nebula_cert=dict(type="path"),
         nebula_key=dict(type="path"),
         no_password=dict(type="bool"),
@@ -354,70 +744,80 @@ def run_module():
         set_file=dict(type="path"),
         sign=dict(type="bool"),
         size=dict(type="int"),
-        state=dict(type="str", choices=["present", "revoked", "absent"], default="present"),
+        state=dict(type="str", choices=["present", "renewed", "revoked", "absent"], default="present"),
         token=dict(type="str", no_log=True),
         verify_roots=dict(type="str"),
         x5c_cert=dict(type="str"),
         x5c_key=dict(type="path"),
-        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE)
+        step_cli_executable=dict(type="path", default=DEFAULT_STEP_CLI_EXECUTABLE),
+        step_cli_timings=dict(type="bool", default=False)
     )
+    # Items in the certificates list accept the per-certificate subset of the regular params.
+    # Unset item values fall back to the top-level params, so the item options must not have defaults.
+    certificate_options = {
+        opt: {k: v for k, v in argument_spec[opt].items() if k != "default"} for opt in CERTIFICATE_ITEM_PARAMS
+    }
+    certificate_options["key_file"]["required"] = True
+    argument_spec["certificates"] = dict(type="list", elements="dict", options=certificate_options)
+
     result: Dict[str, Any] = dict(changed=False)
     module = AnsibleModule(argument_spec={
         **CaConnectionParams.argument_spec,
+        **SecretPassingParams.argument_spec,
         **argument_spec,
-    }, supports_check_mode=True)
+    }, supports_check_mode=True,
+        required_one_of=[["key_file", "certificates"]],
+        mutually_exclusive=[["key_file", "certificates"]])
     module_params = cast(Dict, module.params)
 
     try:
         CaConnectionParams(module).check()
-        check_required_if([
-            ["state", "present", ["key_file", "key_id", "provisioner"], True],
-        ], module_params)
         check_mutually_exclusive(["provisioner_password", "provisioner_password_file"], module_params)
     except TypeError as e:
         module.fail_json(f"Parameter validation failed: {e}")
 
-    executable = StepCliExecutable(module, module_params["step_cli_executable"])
-
-    param_key_file = Path(module_params["key_file"])
-
-    # Resolve file path names if 3 related files
-    if not module_params["sign"]:
-        key_file = param_key_file
-        pub_file = key_file.with_suffix(".pub")
-        crt_file = Path(key_file.stem + "-cert").with_suffix(".pub")
-    else:
-        key_file = os.path.splitext(param_key_file)[0]
-        pub_file = key_file + ".pub"
-        crt_file = key_file + "-cert.pub"
-
-    # Check existence of cert
-    crt_exists = Path(crt_file).exists()
-
-    # Switch according to targat state parameter
-    if module_params["state"] == "present":
-        if not crt_exists:
-            # Create key pair and certificate
-            result.update(create_certificate(executable, module))
+    item_results = []
+    pending = []
+    for params in certificate_items(module_params):
+        item_result: Dict[str, Any] = {"key_file": params["key_file"], "changed": False}
+        try:
+            # Only count params that are actually set, as items always contain every key
+            check_required_if([
+                ["state", "present", ["key_id"]],
+            ], {k: v for k, v in params.items() if v is not None})
+            if params["expires_in"] and parse_duration(params["expires_in"]) is None:
+                raise TypeError(f"invalid duration for expires_in: {params['expires_in']}")
+        except TypeError as e:
+            item_result.update(failed=True, msg=f"Parameter validation failed: {e}")
         else:
-            # Check for reason to recreate (overwrite) existing certificate
-            if module_params["force"]:
-                recreate_reason = "force parameter enabled"
-            else:
-                recreate_reason = cert_needs_recreation(executable, module)
-            # Do recreate certificate
-            if recreate_reason:
-                result["recreate_reason"] = recreate_reason
-                result.update(create_certificate(executable, module, force=True))
-    #elif module_params["state"] == "renewed": TODO: Renewal of ssh host certificate
-    elif module_params["state"] == "revoked":
-        if crt_exists:
-            result.update(revoke_certificate(executable, module))
-        else:
-            module.fail_json("Cannot revoke certificate as it does not exist")
-    elif module_params["state"] == "absent" and crt_exists:
-        result.update(delete_certificate(executable, module, module_params["revoke_on_delete"]))
-
+            pending.append((item_result, params))
+        item_results.append(item_result)
+
+    if pending:
+        # All certificates share one executable, so the version probe only runs once
+        executable = StepCliExecutable(module, module_params["step_cli_executable"])
+        result["version_cache_hits"] = executable.version_cache_hits
+        if executable.timings is not None:
+            result["timings"] = executable.timings
+        outcomes = manage_certificates(executable, module, [params for _, params in pending],
+                                       module_params["max_workers"])
+        for (item_result, _), outcome in zip(pending, outcomes):
+            item_result.update(outcome)
+
+    if not module_params["certificates"]:
+        item_result = item_results[0]
+        if item_result.get("failed"):
+            module.fail_json(item_result["msg"], **result)
+        del item_result["key_file"]
+        result.update(item_result)
+        module.exit_json(**result)
+
+    result["certificates"] = item_results
+    result["changed"] = any(item["changed"] for item in item_results)
+    failed = [item["key_file"] for item in item_results if item.get("failed")]
+    if failed:
+        module.fail_json(f"Failed to manage {len(failed)} of {len(item_results)} SSH certificates: "
+                         f"{', '.join(failed)}", **result)
     module.exit_json(**result)
 
 
@@ -19,16 +19,16 @@ notes:
   - This module currently not supports all options provided by step-cli command.
 options:
   host:
-    desscription: Configures a SSH server instead of a client.
+    description: Configures a SSH server instead of a client.
     type: bool
   roots:
-    desscription: Downloads the public keys used to verify user or host certificates.
+    description: Downloads the public keys used to verify user or host certificates.
     type: bool
   ca_url:
     description: URI of the targeted Step Certificate Authority
     type: str
 
-extends_documentation_fragment: maxhoesel.smallstep.step_cli
+extends_documentation_fragment: maxhoesel.smallstep.cli_executable
 """
 
 EXAMPLES = r"""
@@ -57,6 +57,7 @@ DEFAULTS_FILE = "{steppath}/config/defaults.json".format(
 def run_module():
     argument_spec = dict(
         step_cli_executable=dict(type="path", default="step-cli"),
+        step_cli_timings=dict(type="bool", default=False),
         host=dict(type="bool"),
         roots=dict(type="bool"),
         ca_url=dict(type="str"),
@@ -74,6 +75,9 @@ def run_module():
         module.fail_json(f"Parameter validation failed: {e}")
 
     executable = StepCliExecutable(module, module_params["step_cli_executable"])
+    result["version_cache_hits"] = executable.version_cache_hits
+    if executable.timings is not None:
+        result["timings"] = executable.timings
 
     # Regular args
     ssh_config_cliargs = ["host", "roots", "ca_url"]
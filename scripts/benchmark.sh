@@ -0,0 +1,36 @@
+#!/usr/bin/env bash
+# Run the module benchmarks in tests/benchmarks against the fake step-cli.
+#
+# Usage:
+#   scripts/benchmark.sh save [pytest args]     - store a new baseline
+#   scripts/benchmark.sh compare [pytest args]  - compare against the latest baseline and fail on regressions
+#
+# The allowed regression can be changed with BENCHMARK_THRESHOLD (default: mean:20%),
+# see the --benchmark-compare-fail option of pytest-benchmark for the format.
+set -eu
+set -o pipefail
+
+readonly storage="file://.benchmarks"
+readonly threshold="${BENCHMARK_THRESHOLD:-mean:20%}"
+
+function main()
+{
+  local mode="${1:-compare}"
+  shift || true
+
+  case "$mode" in
+    save)
+      pytest tests/benchmarks --benchmark-only --benchmark-storage="$storage" --benchmark-save=baseline "$@"
+      ;;
+    compare)
+      pytest tests/benchmarks --benchmark-only --benchmark-storage="$storage" \
+        --benchmark-compare --benchmark-compare-fail="$threshold" "$@"
+      ;;
+    *)
+      echo "Unknown mode '$mode', expected 'save' or 'compare'" >&2
+      exit 1
+      ;;
+  esac
+}
+
+main "$@"
@@ -0,0 +1,97 @@
+# pylint: disable=redefined-outer-name
+import contextlib
+import importlib
+import io
+import json
+import os
+from pathlib import Path
+import stat
+import sys
+from typing import Any, Callable, Dict, Generator
+from unittest import mock
+
+import pytest
+import yaml
+
+from ansible.module_utils import basic
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+FAKE_STEP_CLI = Path(__file__).resolve().parent / "fake_step_cli.py"
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+with open(REPO_ROOT / "galaxy.yml", encoding="utf-8") as f:
+    GALAXY_YML = yaml.safe_load(f)
+COLLECTION_PACKAGE = f"ansible_collections.{GALAXY_YML['namespace']}.{GALAXY_YML['name']}"
+
+
+@contextlib.contextmanager
+def module_args(args: Dict[str, Any]) -> Generator[None, None, None]:
+    """Expose args to AnsibleModule instances created within this context"""
+    try:
+        from ansible.module_utils.testing import patch_module_args  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        # ansible-core < 2.19
+        with mock.patch.object(basic, "_ANSIBLE_ARGS", json.dumps({"ANSIBLE_MODULE_ARGS": args}).encode()):
+            yield
+    else:
+        with patch_module_args(args):
+            yield
+
+
+@pytest.fixture(scope="session")
+def collection(tmp_path_factory) -> Generator[str, None, None]:
+    """Make the collection importable as ansible_collections.<namespace>.<name> and return the package name"""
+    root = tmp_path_factory.mktemp("collections")
+    namespace_dir = root / "ansible_collections" / GALAXY_YML["namespace"]
+    namespace_dir.mkdir(parents=True)
+    (namespace_dir / GALAXY_YML["name"]).symlink_to(REPO_ROOT, target_is_directory=True)
+    sys.path.insert(0, root.as_posix())
+    yield COLLECTION_PACKAGE
+    sys.path.remove(root.as_posix())
+
+
+@pytest.fixture(scope="session")
+def fake_step_cli(tmp_path_factory) -> Generator[Path, None, None]:
+    """Put the fake step-cli in $PATH and isolate all state that the modules write to the home directory"""
+    bin_dir = tmp_path_factory.mktemp("bin")
+    executable = bin_dir / "step-cli"
+    executable.write_text(f"#!{sys.executable}\nimport runpy\nrunpy.run_path({FAKE_STEP_CLI.as_posix()!r}, "
+                          "run_name='__main__')\n", encoding="utf-8")
+    executable.chmod(executable.stat().st_mode | stat.S_IXUSR)
+
+    env = {
+        "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+        "XDG_CACHE_HOME": tmp_path_factory.mktemp("cache").as_posix(),
+        "STEPPATH": tmp_path_factory.mktemp("steppath").as_posix(),
+        "FAKE_STEP_CLI_FIXTURES": FIXTURES.as_posix(),
+    }
+    with mock.patch.dict(os.environ, env):
+        yield executable
+
+
+@pytest.fixture
+def run_module(collection, fake_step_cli) -> Callable[[str, Dict[str, Any]], Dict[str, Any]]:
+    # pylint: disable=unused-argument
+    """Return a function that runs a module in-process with the given args and returns its result"""
+    def run(name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        module = importlib.import_module(f"{collection}.plugins.modules.{name}")
+        out = io.StringIO()
+        with module_args(args), contextlib.redirect_stdout(out):
+            try:
+                module.main()
+            except SystemExit:
+                pass
+        result = json.loads(out.getvalue())
+        assert not result.get("failed"), result.get("msg")
+        return result
+    return run
+
+
+@pytest.fixture
+def ansible_module(collection, fake_step_cli) -> Callable[..., basic.AnsibleModule]:
+    # pylint: disable=unused-argument
+    """Return a function that creates an AnsibleModule with the given argspec and args"""
+    def create(argument_spec: Dict[str, Any], args: Dict[str, Any]) -> basic.AnsibleModule:
+        with module_args(args):
+            return basic.AnsibleModule(argument_spec=argument_spec, supports_check_mode=True)
+    return create
@@ -0,0 +1,267 @@
+# pylint: disable=redefined-outer-name
+"""Benchmarks for the module overhead, run against the fake step-cli in fake_step_cli.py
+
+See CONTRIBUTING.md for how to store a baseline and compare against it.
+"""
+import importlib
+import json
+import shutil
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from .conftest import FIXTURES  # noqa: E402
+
+CERT_NAME = "bench.example.com"
+
+
+@pytest.fixture
+def cli_wrapper(collection):
+    return importlib.import_module(f"{collection}.plugins.module_utils.cli_wrapper")
+
+
+@pytest.fixture
+def helpers(collection):
+    return importlib.import_module(f"{collection}.plugins.module_utils.helpers")
+
+
+@pytest.fixture
+def certificate(tmp_path):
+    crt_file, key_file = tmp_path / "leaf.crt", tmp_path / "leaf.key"
+    shutil.copyfile(FIXTURES / "leaf.crt", crt_file)
+    shutil.copyfile(FIXTURES / "leaf.key", key_file)
+    return crt_file, key_file
+
+
+def test_executable_cached(benchmark, ansible_module, cli_wrapper):
+    module = ansible_module({}, {})
+    cli_wrapper.StepCliExecutable(module)  # populate the version cache
+    executable = benchmark(cli_wrapper.StepCliExecutable, module)
+    assert executable.version_cache_hits == 1
+
+
+def test_executable_uncached(benchmark, ansible_module, cli_wrapper, monkeypatch):
+    module = ansible_module({}, {})
+    monkeypatch.setattr(cli_wrapper.HostCache, "get", lambda self, key, stamp: None)
+    monkeypatch.setattr(cli_wrapper.HostCache, "set", lambda self, key, stamp, value: None)
+    executable = benchmark(cli_wrapper.StepCliExecutable, module)
+    assert executable.version_cache_hits == 0
+
+
+@pytest.mark.parametrize("secret_passing", ["tmpfile", "fd"])
+def test_args_build(benchmark, ansible_module, cli_wrapper, secret_passing):
+    argument_spec = {
+        "name": dict(type="str"),
+        "san": dict(type="list", elements="str"),
+        "force": dict(type="bool"),
+        "size": dict(type="int"),
+        "provisioner_password": dict(type="str", no_log=True),
+        "step_cli_secret_passing": dict(type="str"),
+    }
+    module = ansible_module(argument_spec, {
+        "name": CERT_NAME, "san": [f"san{i}.example.com" for i in range(20)], "force": True, "size": 4096,
+        "provisioner_password": "secret", "step_cli_secret_passing": secret_passing,
+    })
+    args = cli_wrapper.CliCommandArgs(
+        ["ca", "certificate"],
+        {"name": "--name", "san": "--san", "force": "--force", "size": "--size"},
+        {"provisioner_password": "--provisioner-password-file"})
+
+    def build():
+        with cli_wrapper.SecretFiles(secret_passing) as secrets:
+            return args.build(module, secrets)
+    assert "--provisioner-password-file" in benchmark(build)
+
+
+@pytest.mark.parametrize("native", [True, False], ids=["native", "cli"])
+def test_get_certificate_info(benchmark, ansible_module, cli_wrapper, helpers, certificate, monkeypatch, native):
+    module = ansible_module({}, {})
+    executable = cli_wrapper.StepCliExecutable(module)
+    if not native:
+        monkeypatch.setattr(helpers.certinfo, "HAS_CRYPTOGRAPHY", False)
+    info = benchmark(helpers.get_certificate_info, executable, module, certificate[0].as_posix(),
+                     roots=(FIXTURES / "root_ca.crt").as_posix())
+    assert info.valid, info.invalid_reason
+
+
+@pytest.mark.parametrize("recorded_state", [True, False], ids=["recorded-state", "full-check"])
+def test_step_ca_certificate(benchmark, run_module, certificate, recorded_state):
+    crt_file, key_file = certificate
+    args = {"name": CERT_NAME, "crt_file": crt_file.as_posix(), "key_file": key_file.as_posix(),
+            "provisioner": "bench", "verify_roots": (FIXTURES / "root_ca.crt").as_posix()}
+    run_module("step_ca_certificate", args)  # records the certificate state
+
+    def run():
+        if not recorded_state:
+            crt_file.with_name(f".{crt_file.name}.state.json").unlink(missing_ok=True)
+        return run_module("step_ca_certificate", args)
+    assert not benchmark(run)["changed"]
+
+
+def test_step_ca_certificate_batch(benchmark, run_module, tmp_path):
+    certificates = [{"name": CERT_NAME, "crt_file": (tmp_path / f"{i}.crt").as_posix(),
+                     "key_file": (tmp_path / f"{i}.key").as_posix(), "force": True} for i in range(10)]
+    result = benchmark(run_module, "step_ca_certificate", {"provisioner": "bench", "certificates": certificates})
+    assert result["changed"]
+
+
+def test_step_certificate_info(benchmark, run_module, certificate):
+    result = benchmark(run_module, "step_certificate_info", {
+        "path": certificate[0].as_posix(), "roots": (FIXTURES / "root_ca.crt").as_posix()})
+    assert result["valid"]
+
+
+@pytest.mark.parametrize("native", [True, False], ids=["native", "cli"])
+def test_step_certificate_info_paths(benchmark, run_module, helpers, tmp_path, monkeypatch, native):
+    for i in range(20):
+        shutil.copyfile(FIXTURES / ("leaf.crt" if i % 2 else "renewed.crt"), tmp_path / f"{i}.crt")
+        shutil.copyfile(FIXTURES / "leaf.key", tmp_path / f"{i}.key")
+    if not native:
+        monkeypatch.setattr(helpers.certinfo, "HAS_CRYPTOGRAPHY", False)
+    result = benchmark(run_module, "step_certificate_info", {
+        "paths": [tmp_path.as_posix()], "roots": (FIXTURES / "root_ca.crt").as_posix()})
+    assert len(result["certificates"]) == 20
+    assert len(result["ignored_files"]) == 20
+
+
+def test_step_ca_token(benchmark, run_module):
+    result = benchmark(run_module, "step_ca_token", {"name": CERT_NAME, "return_token": True})
+    assert result["token"]
+
+
+def test_step_ca_token_reused(benchmark, run_module, tmp_path):
+    args = {"name": CERT_NAME, "output_file": (tmp_path / "token").as_posix(), "provisioner": "bench-token",
+            "provisioner_password": "bench-password", "ca_url": "https://ca.example.com",
+            "root": (FIXTURES / "root_ca.crt").as_posix(), "reuse_if_valid_for": "1m", "native_signing": True}
+    assert run_module("step_ca_token", args)["changed"]
+    result = benchmark(run_module, "step_ca_token", args)
+    assert not result["changed"]
+    assert result["reused_tokens"] == 1
+
+
+@pytest.mark.parametrize("native", [True, False], ids=["native", "cli"])
+def test_step_ca_token_batch(benchmark, run_module, native):
+    result = benchmark(run_module, "step_ca_token", {
+        "names": [f"host{i}.example.com" for i in range(20)], "return_token": True, "provisioner": "bench-token",
+        "provisioner_password": "bench-password", "ca_url": "https://ca.example.com",
+        "root": (FIXTURES / "root_ca.crt").as_posix(), "native_signing": native})
+    assert len(result["tokens"]) == 20
+    assert result["native_tokens"] == (20 if native else 0)
+
+
+@pytest.mark.parametrize("expires_in", [None, "24h"], ids=["forced", "not-due"])
+def test_step_ca_renew(benchmark, run_module, certificate, expires_in):
+    result = benchmark(run_module, "step_ca_renew", {
+        "crt_file": certificate[0].as_posix(), "key_file": certificate[1].as_posix(), "force": True,
+        "expires_in": expires_in})
+    assert result["changed"] == (expires_in is None)
+
+
+def test_step_ca_renew_sweep(benchmark, run_module, tmp_path):
+    for i in range(10):
+        shutil.copyfile(FIXTURES / "leaf.crt", tmp_path / f"{i}.crt")
+        shutil.copyfile(FIXTURES / "leaf.key", tmp_path / f"{i}.key")
+    result = benchmark(run_module, "step_ca_renew", {
+        "certificate_glob": (tmp_path / "*.crt").as_posix(), "force": True})
+    assert result["renewed"] == 10
+
+
+@pytest.mark.parametrize("state,max_dur", [("present", None), ("updated", "24h"), ("updated", "48h")],
+                         ids=["present", "updated-unchanged", "updated-changed"])
+def test_step_ca_provisioner(benchmark, run_module, state, max_dur):
+    result = benchmark(run_module, "step_ca_provisioner", {
+        "name": "bench-jwk-199", "type": "JWK", "state": state, "x509_max_dur": max_dur})
+    assert result["changed"] == (max_dur == "48h")
+
+
+def test_step_ca_provisioner_cached(benchmark, run_module):
+    args = {"name": "bench-jwk-199", "type": "JWK", "provisioner_cache_ttl": 300}
+    run_module("step_ca_provisioner", args)  # populate the provisioner cache
+    assert benchmark(run_module, "step_ca_provisioner", args)["provisioner_cache_hit"]
+
+
+def test_step_ca_provisioner_offline(benchmark, run_module, tmp_path, monkeypatch):
+    # A large ca.json, as produced by embedded templates
+    ca_config = tmp_path / "ca.json"
+    ca_config.write_text(json.dumps({
+        "templates": {"x509": "x" * 10_000_000},
+        "authority": {"provisioners": json.loads((FIXTURES / "provisioners.json").read_text(encoding="utf-8"))},
+    }), encoding="utf-8")
+    monkeypatch.setenv("FAKE_STEP_CLI_OFFLINE", "1")
+    args = {"name": "bench-jwk-199", "type": "JWK", "ca_config": ca_config.as_posix()}
+
+    def run():
+        ca_config.touch()  # invalidate the cached provisioners
+        return run_module("step_ca_provisioner", args)
+    assert not benchmark(run)["changed"]
+
+
+@pytest.mark.parametrize("batch", [True, False], ids=["batched", "unbatched"])
+def test_step_ca_provisioner_offline_changes(benchmark, run_module, tmp_path, monkeypatch, batch):
+    ca_config = tmp_path / "ca.json"
+    monkeypatch.setenv("FAKE_STEP_CLI_OFFLINE", "1")
+    args = {"provisioners": [{"name": f"bench-new-{i}", "type": "ACME"} for i in range(5)],
+            "ca_config": ca_config.as_posix(), "batch_offline_changes": batch}
+
+    def run():
+        ca_config.write_text(json.dumps({"authority": {"provisioners": []}}), encoding="utf-8")
+        return run_module("step_ca_provisioner", args)
+    assert benchmark(run)["changed"]
+
+
+def test_step_ca_provisioner_reconcile(benchmark, run_module):
+    provisioners = [{"name": f"bench-jwk-{i}", "type": "JWK"} for i in range(0, 200, 2)]
+    result = benchmark(run_module, "step_ca_provisioner", {"provisioners": provisioners})
+    assert not result["changed"]
+
+
+def test_step_ca_root(benchmark, run_module, tmp_path):
+    root_file = tmp_path / "root_ca.crt"
+
+    def run():
+        root_file.unlink(missing_ok=True)
+        return run_module("step_ca_root", {"root_file": root_file.as_posix(), "force": True})
+    assert benchmark(run)["changed"]
+
+
+def test_step_ca_bootstrap(benchmark, run_module):
+    result = benchmark(run_module, "step_ca_bootstrap", {"ca_url": "https://ca.example.com", "fingerprint": "abc"})
+    assert result["changed"]
+
+
+def test_step_ssh_certificate(benchmark, run_module, tmp_path):
+    result = benchmark(run_module, "step_ssh_certificate", {
+        "key_id": CERT_NAME, "key_file": (tmp_path / "id_ecdsa").as_posix(), "provisioner": "bench"})
+    assert result["changed"]
+
+
+def test_step_ssh_certificate_unchanged(benchmark, run_module, tmp_path):
+    for name in ("ssh_host.pub", "ssh_host-cert.pub"):
+        shutil.copyfile(FIXTURES / name, tmp_path / name)
+    result = benchmark(run_module, "step_ssh_certificate", {
+        "key_id": CERT_NAME, "key_file": (tmp_path / "ssh_host").as_posix(), "provisioner": "bench", "host": True})
+    assert not result["changed"]
+
+
+def test_step_ssh_certificate_batch(benchmark, run_module, tmp_path):
+    certificates = [{"key_id": f"svc{i}@example.com", "key_file": (tmp_path / f"svc{i}").as_posix()}
+                    for i in range(10)]
+    result = benchmark(run_module, "step_ssh_certificate", {"provisioner": "bench", "certificates": certificates})
+    assert result["changed"]
+    assert len(result["certificates"]) == 10
+
+
+@pytest.mark.parametrize("force", [False, True], ids=["not-due", "forced"])
+def test_step_ssh_certificate_renewed(benchmark, run_module, tmp_path, force):
+    for name in ("ssh_host.pub", "ssh_host-cert.pub"):
+        shutil.copyfile(FIXTURES / name, tmp_path / name)
+    result = benchmark(run_module, "step_ssh_certificate", {
+        "key_file": (tmp_path / "ssh_host").as_posix(), "state": "renewed", "expires_in": "24h", "force": force})
+    assert result["changed"] == force
+    assert result["certificate"]["type"] == "host"
+
+
+def test_step_ssh_config(benchmark, run_module):
+    result = benchmark(run_module, "step_ssh_config", {"roots": True})
+    assert result["roots"]
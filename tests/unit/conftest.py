@@ -0,0 +1,35 @@
+# pylint: disable=redefined-outer-name
+import importlib
+from pathlib import Path
+import sys
+from types import ModuleType
+from typing import Callable, Generator
+
+import pytest
+import yaml
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+with open(REPO_ROOT / "galaxy.yml", encoding="utf-8") as f:
+    GALAXY_YML = yaml.safe_load(f)
+COLLECTION_PACKAGE = f"ansible_collections.{GALAXY_YML['namespace']}.{GALAXY_YML['name']}"
+
+
+@pytest.fixture(scope="session")
+def collection(tmp_path_factory) -> Generator[str, None, None]:
+    """Make the collection importable as ansible_collections.<namespace>.<name> and return the package name"""
+    root = tmp_path_factory.mktemp("collections")
+    namespace_dir = root / "ansible_collections" / GALAXY_YML["namespace"]
+    namespace_dir.mkdir(parents=True)
+    (namespace_dir / GALAXY_YML["name"]).symlink_to(REPO_ROOT, target_is_directory=True)
+    sys.path.insert(0, root.as_posix())
+    yield COLLECTION_PACKAGE
+    sys.path.remove(root.as_posix())
+
+
+@pytest.fixture(scope="session")
+def module_utils(collection) -> Callable[[str], ModuleType]:
+    """Return a function that imports a module from plugins/module_utils by name"""
+    def load(name: str) -> ModuleType:
+        return importlib.import_module(f"{collection}.plugins.module_utils.{name}")
+    return load
@@ -0,0 +1,125 @@
+# pylint: disable=redefined-outer-name
+import io
+import json
+from typing import Any, List, Tuple
+
+import pytest
+
+PATH = ("authority", "provisioners")
+DOCUMENTS = [
+    {"authority": {"provisioners": []}},
+    {"authority": {"provisioners": [{"name": "a", "type": "JWK"}, {"name": "b", "type": "ACME"}]}},
+    # Values before the array that must be skipped, including strings with escapes and brackets
+    {"templates": {"x509": "{{ .Subject }} \\\" ] } [", "nested": [[1, 2], {"a": [None, True, False]}]},
+     "root": "C:\\path\\", "authority": {"claims": {"x": 1.5e3}, "provisioners": [
+         {"name": "quote\"d", "type": "JWK", "options": {"x509": {"template": "\\\\\"[]{}"}}},
+         {"name": "ünïcödé 🔑", "type": "OIDC", "admins": ["a@example.com"]},
+     ]}},
+    # Scalars of all kinds as array items
+    {"authority": {"provisioners": [1, -2.5e-3, "x", None, True, False, [], {}]}},
+]
+
+
+@pytest.fixture
+def caconfig(module_utils):
+    return module_utils("caconfig")
+
+
+@pytest.fixture(params=["python", "ijson"])
+def reader(request, caconfig, monkeypatch):
+    """Run read_provisioners() tests with both the pure-Python reader and ijson (if installed)"""
+    if request.param == "ijson":
+        monkeypatch.setattr(caconfig, "ijson", pytest.importorskip("ijson"), raising=False)
+    monkeypatch.setattr(caconfig, "HAS_IJSON", request.param == "ijson")
+    return caconfig
+
+
+def scan(caconfig, data: bytes, path: Tuple[str, ...], chunk_size: int) -> List[Any]:
+    # pylint: disable=protected-access
+    scanner = caconfig._Scanner(io.BytesIO(data), chunk_size)
+    if not caconfig._find(scanner, path):
+        return []
+    return list(caconfig._iter_array(scanner))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64 * 1024])
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_scanner_matches_json(caconfig, document, chunk_size):
+    for data in (json.dumps(document), json.dumps(document, indent=2, ensure_ascii=False)):
+        assert scan(caconfig, data.encode("utf-8"), PATH, chunk_size) == document["authority"]["provisioners"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5])
+def test_scanner_backslashes_across_chunks(caconfig, chunk_size):
+    # Strings ending in an even or odd number of backslashes, so escapes are split at every chunk boundary
+    values = ["\\", "\\\\", "\\\"", "a\\\\\\\"b", "\\\\\\\\"]
+    data = json.dumps({"skip": values, "authority": {"provisioners": values}}).encode("utf-8")
+    assert scan(caconfig, data, PATH, chunk_size) == values
+
+
+@pytest.mark.parametrize("document", [
+    {},
+    {"authority": {}},
+    {"authority": {"provisioners": None}},
+    {"authority": {"provisioners": {"name": "a"}}},
+    {"authority": []},
+    [],
+])
+def test_iter_json_items_missing_path(caconfig, document):
+    assert not list(caconfig.iter_json_items(io.BytesIO(json.dumps(document).encode("utf-8")), PATH))
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"{",
+    b'{"authority": {"provisioners": [',
+    b'{"authority": {"provisioners": [{"name": "a"',
+    b'{"authority": {"provisioners": [{"name": "a}]}}',
+    b'{"authority" {"provisioners": []}}',
+    b'{"authority": {"provisioners": [{"name": "a"} {"name": "b"}]}}',
+    b'{"authority": {"provisioners": [,{"name": "a"}]}}',
+    b'{"authority": {"provisioners": [{"name": "a"},]}}',
+    b'{"skip": 1 "authority": {"provisioners": []}}',
+    b'{, "authority": {"provisioners": []}}',
+    b'{"authority": {"provisioners": [nul]}}',
+])
+def test_iter_json_items_invalid(caconfig, data):
+    with pytest.raises(caconfig.CaConfigError):
+        list(caconfig.iter_json_items(io.BytesIO(data), PATH))
+
+
+def test_read_provisioners_projects_fields(reader, tmp_path):
+    ca_config = tmp_path / "ca.json"
+    ca_config.write_text(json.dumps({"authority": {"provisioners": [
+        {"name": "jwk", "type": "JWK", "key": {"kid": "abc", "x": "public"}, "encryptedKey": "secret",
+         "claims": {"enableSSHCA": True}},
+        {"name": "oidc", "type": "OIDC", "clientID": "id", "clientSecret": "secret"},
+        {"name": "acme", "type": "ACME", "key": "not-an-object"},
+    ]}}), encoding="utf-8")
+
+    provisioners = reader.read_provisioners(ca_config.as_posix(), {"name", "type", "key", "claims", "clientID"})
+    assert provisioners == [
+        {"name": "jwk", "type": "JWK", "key": {"kid": "abc"}, "claims": {"enableSSHCA": True}},
+        {"name": "oidc", "type": "OIDC", "clientID": "id"},
+        {"name": "acme", "type": "ACME"},
+    ]
+
+
+@pytest.mark.parametrize("provisioners", [[{"type": "JWK"}], [{"name": 1}], ["a"], [None]])
+def test_read_provisioners_invalid(reader, tmp_path, provisioners):
+    ca_config = tmp_path / "ca.json"
+    ca_config.write_text(json.dumps({"authority": {"provisioners": provisioners}}), encoding="utf-8")
+    with pytest.raises(reader.CaConfigError):
+        reader.read_provisioners(ca_config.as_posix(), {"name"})
+
+
+def test_read_provisioners_not_json(reader, tmp_path):
+    ca_config = tmp_path / "ca.json"
+    ca_config.write_text('{"authority": {"provisioners": [{"name": "a"}', encoding="utf-8")
+    with pytest.raises(reader.CaConfigError):
+        reader.read_provisioners(ca_config.as_posix(), {"name"})
+
+
+def test_read_provisioners_missing_file(reader, tmp_path):
+    with pytest.raises(reader.CaConfigError):
+        reader.read_provisioners((tmp_path / "missing.json").as_posix(), {"name"})
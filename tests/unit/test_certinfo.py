@@ -0,0 +1,328 @@
+# pylint: disable=redefined-outer-name
+import base64
+import datetime
+import ipaddress
+import os
+import re
+
+import pytest
+
+UTC = datetime.timezone.utc
+
+
+@pytest.fixture
+def certinfo(module_utils):
+    return module_utils("certinfo")
+
+
+def der(tag: int, content: bytes) -> bytes:
+    length = len(content)
+    if length < 0x80:
+        return bytes([tag, length]) + content
+    size = (length.bit_length() + 7) // 8
+    return bytes([tag, 0x80 | size]) + length.to_bytes(size, "big") + content
+
+
+def certificate(serial: bytes = b"\x01", not_before: bytes = der(0x17, b"240101000000Z"),
+                not_after: bytes = der(0x17, b"240131000000Z"), version: bool = True, issuer: bytes = b"") -> bytes:
+    """Build a DER certificate with a minimal TBSCertificate and an empty signature"""
+    tbs = b"".join([
+        der(0xa0, der(0x02, b"\x02")) if version else b"",
+        der(0x02, serial),
+        der(0x30, der(0x06, b"\x2a\x86\x48\xce\x3d\x04\x03\x02")),  # ecdsa-with-SHA256
+        der(0x30, issuer),
+        der(0x30, not_before + not_after),
+        der(0x30, b""),  # subject
+    ])
+    return der(0x30, der(0x30, tbs) + der(0x30, b"") + der(0x03, b"\x00"))
+
+
+def pem(data: bytes) -> bytes:
+    return b"-----BEGIN CERTIFICATE-----\n" + base64.encodebytes(data) + b"-----END CERTIFICATE-----\n"
+
+
+def test_read_validity(certinfo):
+    data = certificate()
+    validity = certinfo.read_validity(data)
+    assert validity.serial == 1
+    assert validity.not_before == datetime.datetime(2024, 1, 1, tzinfo=UTC)
+    assert validity.not_after == datetime.datetime(2024, 1, 31, tzinfo=UTC)
+    assert validity.fingerprint == certinfo.fingerprint(data)
+    assert validity.to_dict()["serial"] == "1"
+
+
+def test_read_validity_without_version(certinfo):
+    assert certinfo.read_validity(certificate(version=False)).serial == 1
+
+
+def test_read_validity_long_lengths(certinfo):
+    # A large issuer forces multi-byte length encodings for the enclosing elements
+    validity = certinfo.read_validity(certificate(serial=b"\x00" + b"\xff" * 20, issuer=b"\x00" * 70000))
+    assert validity.serial == int.from_bytes(b"\xff" * 20, "big")
+
+
+@pytest.mark.parametrize("value, expected", [
+    (der(0x17, b"491231235959Z"), datetime.datetime(2049, 12, 31, 23, 59, 59, tzinfo=UTC)),
+    (der(0x17, b"500101000000Z"), datetime.datetime(1950, 1, 1, tzinfo=UTC)),
+    (der(0x18, b"20500101000000Z"), datetime.datetime(2050, 1, 1, tzinfo=UTC)),
+    (der(0x18, b"99991231235959Z"), datetime.datetime(9999, 12, 31, 23, 59, 59, tzinfo=UTC)),
+])
+def test_read_validity_times(certinfo, value, expected):
+    assert certinfo.read_validity(certificate(not_after=value)).not_after == expected
+
+
+def test_read_validity_truncated(certinfo):
+    data = certificate()
+    for length in range(len(data)):
+        with pytest.raises(certinfo.CertificateParseError):
+            certinfo.read_validity(data[:length])
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"\x30",
+    der(0x31, b""),
+    der(0x30, der(0x30, der(0x04, b"\x01"))),
+    certificate(not_before=der(0x04, b"240101000000Z")),
+    certificate(not_before=der(0x17, b"2401010000Z")),
+    certificate(not_before=der(0x17, b"24010100000\xffZ")),
+    certificate(not_after=der(0x18, b"240131000000Z")),
+    # Indefinite and oversized length encodings
+    b"\x30\x80" + certificate()[2:],
+    b"\x30\x85\x00\x00\x00\x00\x10",
+])
+def test_read_validity_invalid(certinfo, data):
+    with pytest.raises(certinfo.CertificateParseError):
+        certinfo.read_validity(data)
+
+
+def test_read_validity_matches_cryptography(certinfo):
+    x509 = pytest.importorskip("cryptography.x509")
+    ec = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.ec")
+    hashes = pytest.importorskip("cryptography.hazmat.primitives.hashes")
+    serialization = pytest.importorskip("cryptography.hazmat.primitives.serialization")
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, "test")])
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(datetime.datetime(2024, 1, 1, 12, 30, tzinfo=UTC))
+            .not_valid_after(datetime.datetime(2060, 1, 1, tzinfo=UTC))
+            .sign(key, hashes.SHA256()))
+
+    validity = certinfo.read_validity(cert.public_bytes(serialization.Encoding.DER))
+    assert validity.serial == cert.serial_number
+    assert validity.not_before == datetime.datetime(2024, 1, 1, 12, 30, tzinfo=UTC)
+    assert validity.not_after == datetime.datetime(2060, 1, 1, tzinfo=UTC)
+
+
+def test_load_validity(certinfo, tmp_path):
+    path = tmp_path / "bundle.crt"
+    path.write_bytes(pem(certificate(serial=b"\x07")) + pem(certificate()))
+    assert certinfo.load_validity(path.as_posix()).serial == 7
+    assert certinfo.try_load_validity(path.as_posix()).serial == 7
+
+    csr = tmp_path / "host.csr"
+    csr.write_bytes(b"-----BEGIN CERTIFICATE REQUEST-----\nAAAA\n-----END CERTIFICATE REQUEST-----\n")
+    with pytest.raises(certinfo.CertificateParseError):
+        certinfo.load_validity(csr.as_posix())
+    assert certinfo.try_load_validity(csr.as_posix()) is None
+    assert certinfo.try_load_validity((tmp_path / "missing.crt").as_posix()) is None
+
+
+def test_split_certificates(certinfo):
+    data = certificate()
+    assert certinfo.split_certificates(data) == [data]
+    assert certinfo.split_certificates(b"leading text\n" + pem(data) + pem(data)) == [data, data]
+    assert not certinfo.split_certificates(b"-----BEGIN CERTIFICATE REQUEST-----\nAAAA\n")
+    assert not certinfo.split_certificates(b"")
+    assert not certinfo.split_certificates(b"not a certificate")
+
+
+def test_split_certificates_invalid_pem(certinfo):
+    with pytest.raises(certinfo.CertificateParseError):
+        certinfo.split_certificates(b"-----BEGIN CERTIFICATE-----\nAAAAA\n-----END CERTIFICATE-----\n")
+
+
+def test_load_certificates_invalid(certinfo, tmp_path):
+    pytest.importorskip("cryptography")
+    empty = tmp_path / "empty.crt"
+    empty.write_bytes(b"")
+    garbage = tmp_path / "garbage.crt"
+    garbage.write_bytes(pem(b"\x30\x03\x02\x01\x01"))
+    for path in (empty, garbage):
+        with pytest.raises(certinfo.CertificateParseError):
+            certinfo.load_certificates(path.as_posix())
+    with pytest.raises(OSError):
+        certinfo.load_certificates((tmp_path / "missing.crt").as_posix())
+
+
+def test_certificate_to_dict(certinfo, tmp_path):
+    x509 = pytest.importorskip("cryptography.x509")
+    ec = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.ec")
+    hashes = pytest.importorskip("cryptography.hazmat.primitives.hashes")
+    serialization = pytest.importorskip("cryptography.hazmat.primitives.serialization")
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    subject = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, "host.example.com")])
+    issuer = x509.Name([x509.NameAttribute(x509.NameOID.ORGANIZATION_NAME, "Example"),
+                        x509.NameAttribute(x509.NameOID.COMMON_NAME, "Example Root CA")])
+    cert = (x509.CertificateBuilder().subject_name(subject).issuer_name(issuer).public_key(key.public_key())
+            .serial_number(1234)
+            .not_valid_before(datetime.datetime(2024, 1, 1, tzinfo=UTC))
+            .not_valid_after(datetime.datetime(2024, 1, 2, tzinfo=UTC))
+            .add_extension(x509.SubjectAlternativeName([
+                x509.DNSName("host.example.com"), x509.DNSName("alt.example.com"),
+                x509.IPAddress(ipaddress.ip_address("10.0.0.1"))]), critical=False)
+            .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+            .add_extension(x509.ExtendedKeyUsage([x509.ExtendedKeyUsageOID.SERVER_AUTH]), critical=False)
+            .sign(key, hashes.SHA256()))
+    path = tmp_path / "host.crt"
+    path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+
+    data = certinfo.certificate_to_dict(certinfo.load_certificates(path.as_posix())[0])
+    assert data["version"] == 3
+    assert data["serial_number"] == "1234"
+    assert data["signature_algorithm"] == {"name": "ECDSA-SHA256", "oid": "1.2.840.10045.4.3.2"}
+    assert data["issuer"] == {"organization": ["Example"], "common_name": ["Example Root CA"]}
+    assert data["issuer_dn"] == "CN=Example Root CA, O=Example"
+    assert data["subject_dn"] == "CN=host.example.com"
+    assert data["validity"] == {"start": "2024-01-01T00:00:00Z", "end": "2024-01-02T00:00:00Z", "length": 86400}
+    assert data["subject_key_info"]["key_algorithm"] == {"name": "ECDSA"}
+    assert data["subject_key_info"]["ecdsa_public_key"]["curve"] == "P-256"
+    assert data["extensions"]["subject_alt_name"] == {"dns_names": ["host.example.com", "alt.example.com"],
+                                                      "ip_addresses": ["10.0.0.1"]}
+    assert data["extensions"]["basic_constraints"] == {"is_ca": False}
+    assert data["extensions"]["extended_key_usage"] == {"server_auth": True}
+    assert not data["signature"]["self_signed"]
+    assert data["fingerprint_sha256"] == certinfo.fingerprint(cert.public_bytes(serialization.Encoding.DER))
+    # The subject common name is listed once, even though it is also a SAN
+    assert data["names"] == ["host.example.com", "alt.example.com", "10.0.0.1"]
+
+
+@pytest.fixture(scope="module")
+def pki():
+    """A root CA, an intermediate CA and a key pair for leaf certificates"""
+    pytest.importorskip("cryptography.x509")
+    from cryptography import x509  # pylint: disable=import-outside-toplevel
+    from cryptography.hazmat.primitives import hashes  # pylint: disable=import-outside-toplevel
+    from cryptography.hazmat.primitives.asymmetric import ec  # pylint: disable=import-outside-toplevel
+
+    def build(common_name, key, issuer_name, issuer_key, ca, days=(-1, 1), sans=None, eku=None):
+        now = datetime.datetime.now(UTC)
+        builder = (x509.CertificateBuilder()
+                   .subject_name(x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, common_name)]))
+                   .issuer_name(issuer_name).public_key(key.public_key())
+                   .serial_number(x509.random_serial_number())
+                   .not_valid_before(now + datetime.timedelta(days=days[0]))
+                   .not_valid_after(now + datetime.timedelta(days=days[1]))
+                   .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True))
+        if sans is not None:
+            builder = builder.add_extension(x509.SubjectAlternativeName(sans), critical=False)
+        if eku is not None:
+            builder = builder.add_extension(x509.ExtendedKeyUsage(eku), critical=False)
+        return builder.sign(issuer_key, hashes.SHA256())
+
+    root_key = ec.generate_private_key(ec.SECP256R1())
+    root_name = x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, "Root CA")])
+    root = build("Root CA", root_key, root_name, root_key, True)
+    inter_key = ec.generate_private_key(ec.SECP256R1())
+    inter = build("Intermediate CA", inter_key, root_name, root_key, True)
+    leaf_key = ec.generate_private_key(ec.SECP256R1())
+
+    def leaf(sans=(x509.DNSName("host.example.com"), x509.IPAddress(ipaddress.ip_address("10.0.0.1"))),
+             days=(-1, 1), eku=None, issuer=None):
+        issuer_cert, issuer_key = issuer or (inter, inter_key)
+        return build("host.example.com", leaf_key, issuer_cert.subject, issuer_key, False, days,
+                     None if sans is None else list(sans), eku)
+
+    other_key = ec.generate_private_key(ec.SECP256R1())
+    other = build("Other CA", other_key, x509.Name([x509.NameAttribute(x509.NameOID.COMMON_NAME, "Other CA")]),
+                  other_key, True)
+    return {"x509": x509, "root": root, "inter": inter, "inter_key": inter_key, "other": other,
+            "other_key": other_key, "leaf": leaf}
+
+
+def test_verify_certificate(certinfo, pki):
+    if not certinfo.HAS_NATIVE_VERIFY:
+        pytest.skip("cryptography is too old for native verification")
+    leaf = pki["leaf"]()
+    assert certinfo.verify_certificate([leaf, pki["inter"]], [pki["root"]]) == ""
+    assert certinfo.verify_certificate([leaf, pki["inter"]], [pki["root"]], "host.example.com.") == ""
+    assert certinfo.verify_certificate([leaf, pki["inter"]], [pki["root"]], "10.0.0.1") == ""
+    # Intermediates that are trusted directly don't need a chain
+    assert certinfo.verify_certificate([leaf], [pki["inter"]]) == ""
+    assert certinfo.verify_certificate([pki["root"]], [pki["root"]]) == ""
+
+
+@pytest.mark.parametrize("kwargs, server_name, reason", [
+    ({"days": (-2, -1)}, "", "has expired or is not yet valid: current time .* is after"),
+    ({"days": (1, 2)}, "", "has expired or is not yet valid: current time .* is before"),
+    ({}, "other.example.com", "is valid for host.example.com, not other.example.com"),
+    ({}, "10.0.0.2", "is valid for 10.0.0.1, not 10.0.0.2"),
+    ({"sans": None}, "host.example.com", "relies on legacy Common Name field"),
+    ({"sans": ()}, "host.example.com", "is not valid for any names"),
+    ({"eku": "CLIENT_AUTH"}, "", "incompatible key usage"),
+])
+def test_verify_certificate_invalid(certinfo, pki, kwargs, server_name, reason):
+    if not certinfo.HAS_NATIVE_VERIFY:
+        pytest.skip("cryptography is too old for native verification")
+    if "eku" in kwargs:
+        kwargs = {"eku": [getattr(pki["x509"].ExtendedKeyUsageOID, kwargs["eku"])]}
+    result = certinfo.verify_certificate([pki["leaf"](**kwargs), pki["inter"]], [pki["root"]], server_name)
+    assert result.startswith("failed to verify certificate: x509: certificate ")
+    assert re.search(reason, result)
+
+
+def test_verify_certificate_wildcard(certinfo, pki):
+    if not certinfo.HAS_NATIVE_VERIFY:
+        pytest.skip("cryptography is too old for native verification")
+    leaf = pki["leaf"](sans=[pki["x509"].DNSName("*.Example.com")])
+    assert certinfo.verify_certificate([leaf, pki["inter"]], [pki["root"]], "host.example.com") == ""
+    # Wildcards only cover a single label
+    assert certinfo.verify_certificate([leaf, pki["inter"]], [pki["root"]], "a.host.example.com")
+    assert certinfo.verify_certificate([leaf, pki["inter"]], [pki["root"]], "example.com")
+
+
+def test_verify_certificate_unknown_authority(certinfo, pki):
+    if not certinfo.HAS_NATIVE_VERIFY:
+        pytest.skip("cryptography is too old for native verification")
+    unknown = "failed to verify certificate: x509: certificate signed by unknown authority"
+    leaf = pki["leaf"]()
+    assert certinfo.verify_certificate([leaf], [pki["root"]]) == unknown
+    assert certinfo.verify_certificate([leaf, pki["inter"]], [pki["other"]]) == unknown
+    # An issuer with the right name but the wrong key is not part of the chain
+    forged = pki["leaf"](issuer=(pki["inter"], pki["other_key"]))
+    assert certinfo.verify_certificate([forged, pki["inter"]], [pki["root"]]) == unknown
+
+
+def test_load_roots(certinfo, pki, tmp_path):
+    serialization = pytest.importorskip("cryptography.hazmat.primitives.serialization")
+    root_file = tmp_path / "root.crt"
+    root_file.write_bytes(pki["root"].public_bytes(serialization.Encoding.PEM))
+    other_file = tmp_path / "other.crt"
+    other_file.write_bytes(pki["other"].public_bytes(serialization.Encoding.PEM))
+    assert certinfo.load_roots(root_file.as_posix()) == [pki["root"]]
+    assert certinfo.load_roots(f"{root_file.as_posix()}, {other_file.as_posix()}") == [pki["root"], pki["other"]]
+
+    # Unrelated files in a directory are skipped, but explicitly listed files must be valid
+    (tmp_path / "README").write_text("not a certificate", encoding="utf-8")
+    assert certinfo.load_roots(tmp_path.as_posix()) == [pki["other"], pki["root"]]
+    with pytest.raises(certinfo.CertificateParseError):
+        certinfo.load_roots((tmp_path / "README").as_posix())
+    with pytest.raises(OSError):
+        certinfo.load_roots((tmp_path / "missing.crt").as_posix())
+    empty = tmp_path / "empty"
+    empty.mkdir()
+    with pytest.raises(certinfo.CertificateParseError):
+        certinfo.load_roots(empty.as_posix())
+
+
+def test_load_roots_reloads_changed_files(certinfo, pki, tmp_path):
+    serialization = pytest.importorskip("cryptography.hazmat.primitives.serialization")
+    root_file = tmp_path / "root.crt"
+    root_file.write_bytes(pki["root"].public_bytes(serialization.Encoding.PEM))
+    assert certinfo.load_roots(root_file.as_posix()) == [pki["root"]]
+    root_file.write_bytes(pki["other"].public_bytes(serialization.Encoding.PEM))
+    os.utime(root_file, ns=(0, 0))
+    assert certinfo.load_roots(root_file.as_posix()) == [pki["other"]]
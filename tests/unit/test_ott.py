@@ -0,0 +1,184 @@
+# pylint: disable=redefined-outer-name
+import base64
+import json
+import os
+from typing import Any, Dict
+
+import pytest
+
+pytest.importorskip("cryptography")
+# pylint: disable=wrong-import-position
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature  # noqa: E402
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM  # noqa: E402
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC  # noqa: E402
+from cryptography.hazmat.primitives.keywrap import aes_key_wrap  # noqa: E402
+
+PASSWORD = b"correct horse battery staple"
+CLAIMS = {"sub": "host.example.com", "sans": ["host.example.com"]}
+
+
+@pytest.fixture
+def ott(module_utils):
+    return module_utils("ott")
+
+
+def b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def b64url_int(value: int) -> str:
+    return b64url(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+def encrypt_jwe(plaintext: bytes, password: bytes, alg: str = "PBES2-HS256+A128KW", enc: str = "A256GCM",
+                cek_length: int = 0, **header_fields: Any) -> str:
+    """Encrypt plaintext like step-cli encrypts provisioner keys"""
+    hash_algorithm, key_length = {
+        "PBES2-HS256+A128KW": (hashes.SHA256(), 16),
+        "PBES2-HS384+A192KW": (hashes.SHA384(), 24),
+        "PBES2-HS512+A256KW": (hashes.SHA512(), 32),
+    }[alg]
+    salt = os.urandom(16)
+    header = {"alg": alg, "enc": enc, "cty": "jwk+json", "p2c": 1000, "p2s": b64url(salt), **header_fields}
+    protected = b64url(json.dumps(header).encode("utf-8"))
+    kek = PBKDF2HMAC(hash_algorithm, key_length, alg.encode("utf-8") + b"\x00" + salt, 1000).derive(password)
+    cek = os.urandom(cek_length or int(enc[1:4]) // 8)
+    iv = os.urandom(12)
+    sealed = AESGCM(cek).encrypt(iv, plaintext, protected.encode("ascii"))
+    return ".".join([protected, b64url(aes_key_wrap(kek, cek)), b64url(iv), b64url(sealed[:-16]),
+                     b64url(sealed[-16:])])
+
+
+def ec_jwk(key: ec.EllipticCurvePrivateKey, crv: str) -> Dict[str, Any]:
+    numbers = key.private_numbers()
+    return {"kty": "EC", "crv": crv, "kid": "ec-kid", "d": b64url_int(numbers.private_value),
+            "x": b64url_int(numbers.public_numbers.x), "y": b64url_int(numbers.public_numbers.y)}
+
+
+def signed_parts(token: str):
+    header, claims, signature = token.split(".")
+    padded = [part + "=" * (-len(part) % 4) for part in (header, claims, signature)]
+    return (json.loads(base64.urlsafe_b64decode(padded[0])), json.loads(base64.urlsafe_b64decode(padded[1])),
+            base64.urlsafe_b64decode(padded[2]), f"{header}.{claims}".encode("ascii"))
+
+
+@pytest.mark.parametrize("alg", ["PBES2-HS256+A128KW", "PBES2-HS384+A192KW", "PBES2-HS512+A256KW"])
+@pytest.mark.parametrize("enc", ["A128GCM", "A192GCM", "A256GCM"])
+def test_decrypt_jwe(ott, alg, enc):
+    assert ott.decrypt_jwe(encrypt_jwe(b'{"kty": "EC"}', PASSWORD, alg, enc), PASSWORD) == b'{"kty": "EC"}'
+
+
+def test_decrypt_jwe_wrong_password(ott):
+    with pytest.raises(ott.TokenError, match="incorrect password"):
+        ott.decrypt_jwe(encrypt_jwe(b"{}", PASSWORD), b"wrong")
+
+
+def test_decrypt_jwe_tampered(ott):
+    parts = encrypt_jwe(b"secret key material", PASSWORD).split(".")
+    parts[3] = b64url(bytes(b ^ 1 for b in base64.urlsafe_b64decode(parts[3] + "=" * (-len(parts[3]) % 4))))
+    with pytest.raises(ott.TokenError):
+        ott.decrypt_jwe(".".join(parts), PASSWORD)
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "a.b.c.d",
+    "a.b.c.d.e.f",
+    "!!!.b.c.d.e",
+    f"{b64url(b'not json')}.b.c.d.e",
+    f"{b64url(json.dumps({'alg': 'dir', 'enc': 'A256GCM'}).encode())}.b.c.d.e",
+    f"{b64url(json.dumps({'alg': 'PBES2-HS256+A128KW', 'enc': 'A256CBC-HS512'}).encode())}.b.c.d.e",
+])
+def test_decrypt_jwe_invalid(ott, token):
+    with pytest.raises(ott.TokenError):
+        ott.decrypt_jwe(token, PASSWORD)
+
+
+@pytest.mark.parametrize("header_fields", [{"p2c": "many"}, {"p2s": "!!!"}])
+def test_decrypt_jwe_invalid_header_fields(ott, header_fields):
+    with pytest.raises(ott.TokenError):
+        ott.decrypt_jwe(encrypt_jwe(b"{}", PASSWORD, **header_fields), PASSWORD)
+
+
+def test_decrypt_jwe_wrong_key_length(ott):
+    with pytest.raises(ott.TokenError, match="wrong length"):
+        ott.decrypt_jwe(encrypt_jwe(b"{}", PASSWORD, enc="A256GCM", cek_length=16), PASSWORD)
+
+
+@pytest.mark.parametrize("crv, curve, hash_algorithm", [
+    ("P-256", ec.SECP256R1(), hashes.SHA256()),
+    ("P-384", ec.SECP384R1(), hashes.SHA384()),
+    ("P-521", ec.SECP521R1(), hashes.SHA512()),
+])
+def test_jwk_signer_ec(ott, crv, curve, hash_algorithm):
+    key = ec.generate_private_key(curve)
+    signer = ott.JwkSigner(ec_jwk(key, crv))
+    header, claims, signature, signing_input = signed_parts(signer.sign(CLAIMS))
+    assert header == {"alg": signer.alg, "kid": "ec-kid", "typ": "JWT"}
+    assert claims == CLAIMS
+    size = len(signature) // 2
+    key.public_key().verify(encode_dss_signature(int.from_bytes(signature[:size], "big"),
+                                                 int.from_bytes(signature[size:], "big")),
+                            signing_input, ec.ECDSA(hash_algorithm))
+
+
+def test_jwk_signer_ed25519(ott):
+    key = ed25519.Ed25519PrivateKey.generate()
+    raw = key.private_bytes(serialization.Encoding.Raw, serialization.PrivateFormat.Raw,
+                            serialization.NoEncryption())
+    signer = ott.JwkSigner({"kty": "OKP", "crv": "Ed25519", "d": b64url(raw)})
+    header, _, signature, signing_input = signed_parts(signer.sign(CLAIMS))
+    assert header["alg"] == "EdDSA"
+    key.public_key().verify(signature, signing_input)
+
+
+def test_jwk_signer_rsa(ott):
+    key = rsa.generate_private_key(65537, 2048)
+    numbers = key.private_numbers()
+    signer = ott.JwkSigner({
+        "kty": "RSA", "n": b64url_int(numbers.public_numbers.n), "e": b64url_int(numbers.public_numbers.e),
+        "d": b64url_int(numbers.d), "p": b64url_int(numbers.p), "q": b64url_int(numbers.q),
+        "dp": b64url_int(numbers.dmp1), "dq": b64url_int(numbers.dmq1), "qi": b64url_int(numbers.iqmp),
+    })
+    header, _, signature, signing_input = signed_parts(signer.sign(CLAIMS))
+    assert header["alg"] == "RS256"
+    key.public_key().verify(signature, signing_input, padding.PKCS1v15(), hashes.SHA256())
+
+
+@pytest.mark.parametrize("jwk", [
+    {},
+    {"kty": "oct", "k": "AAAA"},
+    {"kty": "EC", "crv": "P-192", "d": "AAAA"},
+    {"kty": "OKP", "crv": "X25519", "d": "AAAA"},
+    {"kty": "EC", "crv": "P-256"},
+    {"kty": "OKP", "crv": "Ed25519", "d": "AAAA"},
+    {"kty": "RSA", "n": "AAAA", "e": "AQAB"},
+])
+def test_jwk_signer_invalid(ott, jwk):
+    with pytest.raises(ott.TokenError):
+        ott.JwkSigner(jwk)
+
+
+def test_jwk_signer_unsupported_alg(ott):
+    with pytest.raises(ott.TokenError, match="Unsupported JWS algorithm"):
+        ott.JwkSigner({**ec_jwk(ec.generate_private_key(ec.SECP256R1()), "P-256"), "alg": "HS256"})
+
+
+def test_jwk_signer_from_encrypted(ott):
+    jwk = ec_jwk(ec.generate_private_key(ec.SECP256R1()), "P-256")
+    signer = ott.JwkSigner.from_encrypted(encrypt_jwe(json.dumps(jwk).encode("utf-8"), PASSWORD), PASSWORD)
+    assert signer.kid == "ec-kid"
+    assert signer.alg == "ES256"
+
+
+def test_jwk_signer_from_encrypted_not_json(ott):
+    with pytest.raises(ott.TokenError, match="Invalid JWK"):
+        ott.JwkSigner.from_encrypted(encrypt_jwe(b"not json", PASSWORD), PASSWORD)
+
+
+@pytest.mark.parametrize("token", ["", "a.b", f"a.{b64url(b'[1]')}.c", f"a.{b64url(b'{')}.c", "a.!!!.c"])
+def test_decode_claims_invalid(ott, token):
+    with pytest.raises(ott.TokenError):
+        ott.decode_claims(token)
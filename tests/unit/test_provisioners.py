@@ -0,0 +1,131 @@
+# pylint: disable=redefined-outer-name
+import base64
+import json
+
+import pytest
+
+
+@pytest.fixture
+def provisioners(module_utils):
+    return module_utils("provisioners")
+
+
+def test_diff_unset_params_are_ignored(provisioners):
+    assert provisioners.provisioner_diff({"name": "p", "type": "JWK"}, {"name": "p", "x509_max_dur": None}) == \
+        {"before": {}, "after": {}}
+
+
+@pytest.mark.parametrize("current, params", [
+    ({"claims": {"disableRenewal": True}}, {"disable_renewal": True}),
+    # false values are never passed to step-cli, so they can't differ
+    ({}, {"disable_renewal": False}),
+    ({"encryptionAlgorithmIdentifier": 2}, {"scep_encryption_algorithm_identifier": "2"}),
+    ({"gcp_projects": None, "projectIDs": ["b", "a"]}, {"gcp_projects": ["a", "b"]}),
+    ({"claims": {"maxTLSCertDuration": "24h0m0s"}}, {"x509_max_dur": "24h"}),
+    ({"claims": {"maxTLSCertDuration": "1440m"}}, {"x509_max_dur": "24h"}),
+    # An empty list equals a missing one
+    ({"projectIDs": None}, {"gcp_projects": []}),
+])
+def test_diff_equal(provisioners, current, params):
+    assert provisioners.provisioner_diff(current, params) == {"before": {}, "after": {}}
+
+
+@pytest.mark.parametrize("current, params, before", [
+    ({}, {"disable_renewal": True}, None),
+    ({"claims": None}, {"disable_renewal": True}, None),
+    ({"claims": "invalid"}, {"x509_max_dur": "24h"}, None),
+    ({"claims": {"maxTLSCertDuration": "25h"}}, {"x509_max_dur": "24h"}, "25h"),
+    ({"claims": {"maxTLSCertDuration": "invalid"}}, {"x509_max_dur": "invalid"}, "invalid"),
+    ({"claims": {"maxTLSCertDuration": 24}}, {"x509_max_dur": "24h"}, 24),
+    ({"projectIDs": ["a"]}, {"gcp_projects": ["a", "b"]}, ["a"]),
+    ({"clientID": None}, {"oidc_client_id": "None"}, None),
+])
+def test_diff_changed(provisioners, current, params, before):
+    param = next(iter(params))
+    assert provisioners.provisioner_diff(current, params) == \
+        {"before": {param: before}, "after": {param: params[param]}}
+
+
+def test_diff_secrets_are_masked(provisioners):
+    diff = provisioners.provisioner_diff({"clientSecret": "old"}, {"oidc_client_secret": "new"})
+    assert diff == {"before": {"oidc_client_secret": "********"}, "after": {"oidc_client_secret": "********"}}
+    assert provisioners.provisioner_diff({"clientSecret": "same"}, {"oidc_client_secret": "same"})["after"] == {}
+
+
+def test_diff_opaque_params(provisioners):
+    diff = provisioners.provisioner_diff({}, {"jwk_create": True, "password": "secret", "jwk_private_key": None})
+    assert diff == {"before": {"jwk_create": None, "password": None},
+                    "after": {"jwk_create": True, "password": "********"}}
+
+
+def test_diff_files(provisioners, tmp_path):
+    root = tmp_path / "root.crt"
+    root.write_bytes(b"root certificate")
+    encoded = base64.b64encode(b"root certificate").decode("ascii")
+    assert not provisioners.provisioner_diff({"roots": encoded}, {"x5c_root": root.as_posix()})["after"]
+    assert provisioners.provisioner_diff({"roots": "bm90IHRoZSByb290"}, {"x5c_root": root.as_posix()}) == \
+        {"before": {"x5c_root": None}, "after": {"x5c_root": root.as_posix()}}
+    # Invalid base64 or a missing file always differ
+    assert provisioners.provisioner_diff({"roots": "!!!"}, {"x5c_root": root.as_posix()})["after"]
+    missing = (tmp_path / "missing.crt").as_posix()
+    assert provisioners.provisioner_diff({"roots": encoded}, {"x5c_root": missing})["after"]
+
+
+def test_diff_templates(provisioners, tmp_path):
+    template = tmp_path / "x509.tpl"
+    template.write_text('{"subject": {{ toJson .Subject }}}', encoding="utf-8")
+    content = template.read_text(encoding="utf-8")
+    path = template.as_posix()
+    for options in ({"templateFile": path}, {"template": content},
+                    {"template": base64.b64encode(content.encode("utf-8")).decode("ascii")}):
+        assert not provisioners.provisioner_diff({"options": {"x509": options}}, {"x509_template": path})["after"]
+
+    diff = provisioners.provisioner_diff({"options": {"x509": {"templateFile": "/other.tpl"}}},
+                                         {"x509_template": path})
+    assert diff == {"before": {"x509_template": "/other.tpl"}, "after": {"x509_template": path}}
+    assert provisioners.provisioner_diff({"options": {"x509": "invalid"}}, {"x509_template": path}) == \
+        {"before": {"x509_template": None}, "after": {"x509_template": path}}
+
+
+def test_diff_template_data(provisioners, tmp_path):
+    data = tmp_path / "data.json"
+    data.write_text(json.dumps({"a": [1, 2]}), encoding="utf-8")
+    path = data.as_posix()
+    current = {"options": {"ssh": {"templateData": {"a": [1, 2]}}}}
+    assert not provisioners.provisioner_diff(current, {"ssh_template_data": path})["after"]
+    current["options"]["ssh"]["templateData"]["a"].append(3)
+    assert provisioners.provisioner_diff(current, {"ssh_template_data": path})["after"] == {"ssh_template_data": path}
+    data.write_text("not json", encoding="utf-8")
+    assert provisioners.provisioner_diff(current, {"ssh_template_data": path})["after"] == {"ssh_template_data": path}
+
+
+def test_diff_public_key(provisioners, tmp_path):
+    key = tmp_path / "key.pem"
+    key.write_bytes(b"k8s public key")
+    encoded = base64.b64encode(b"k8s public key").decode("ascii")
+    path = key.as_posix()
+    assert not provisioners.provisioner_diff({"type": "K8SSA", "publicKeys": [encoded]}, {"public_key": path})["after"]
+    assert provisioners.provisioner_diff({"type": "K8SSA", "publicKeys": []}, {"public_key": path})["after"]
+    # JWK keys are stored encrypted, so they always differ
+    assert provisioners.provisioner_diff({"type": "JWK", "publicKeys": [encoded]}, {"public_key": path})["after"]
+
+
+def test_inventory(provisioners):
+    inventory = provisioners.ProvisionerInventory([
+        {"name": "a", "type": "JWK"}, {"name": "b", "type": "ACME"}, {"name": "a", "type": "OIDC"}, {"name": "c"},
+    ])
+    assert len(inventory) == 3
+    assert inventory.get("a") == {"name": "a", "type": "OIDC"}
+    assert not inventory.of_type("JWK")
+    assert inventory.of_type("") == [{"name": "c"}]
+    inventory.remove("b")
+    inventory.remove("missing")
+    assert "b" not in inventory
+    assert not inventory.of_type("ACME")
+    assert [p["name"] for p in inventory] == ["a", "c"]
+
+
+def test_strip_secrets(provisioners):
+    provisioner = {"name": "p", "clientSecret": "s", "challenge": "c", "encryptedKey": "k", "clientID": "id"}
+    assert provisioners.strip_secrets(provisioner) == {"name": "p", "clientID": "id"}
+    assert "clientSecret" in provisioner
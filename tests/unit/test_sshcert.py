@@ -0,0 +1,153 @@
+# pylint: disable=redefined-outer-name
+import base64
+import datetime
+import struct
+from typing import List, Tuple
+
+import pytest
+
+ED25519_CERT = "ssh-ed25519-cert-v01@openssh.com"
+VALID_AFTER = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+VALID_BEFORE = datetime.datetime(2024, 1, 31, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def sshcert(module_utils):
+    return module_utils("sshcert")
+
+
+def string(value: bytes) -> bytes:
+    return struct.pack(">I", len(value)) + value
+
+
+def options(values: List[Tuple[str, bytes]]) -> bytes:
+    return string(b"".join(string(name.encode("utf-8")) + string(data) for name, data in values))
+
+
+def cert_blob(key_type: str = ED25519_CERT, key_fields: Tuple[bytes, ...] = (b"k" * 32,), serial: int = 42,
+              cert_type: int = 2, key_id: bytes = b"host.example.com",
+              principals: Tuple[bytes, ...] = (b"host.example.com", b"10.0.0.1"),
+              valid_after: int = int(VALID_AFTER.timestamp()), valid_before: int = int(VALID_BEFORE.timestamp()),
+              critical_options: Tuple[Tuple[str, bytes], ...] = (("force-command", string(b"/bin/true")),),
+              extensions: Tuple[Tuple[str, bytes], ...] = (("permit-pty", b""), ("permit-X11-forwarding", b""))
+              ) -> bytes:
+    return b"".join([
+        string(key_type.encode("ascii")),
+        string(b"nonce"),
+        *[string(value) for value in key_fields],
+        struct.pack(">Q", serial),
+        struct.pack(">I", cert_type),
+        string(key_id),
+        string(b"".join(string(p) for p in principals)),
+        struct.pack(">Q", valid_after),
+        struct.pack(">Q", valid_before),
+        options(list(critical_options)),
+        options(list(extensions)),
+        string(b""),  # reserved
+        string(string(b"ssh-ed25519") + string(b"c" * 32)),  # signature key
+        string(b"signature"),
+    ])
+
+
+def test_parse_certificate(sshcert):
+    cert = sshcert.parse_certificate(cert_blob())
+    assert cert.key_type == ED25519_CERT
+    assert cert.public_key == string(b"ssh-ed25519") + string(b"k" * 32)
+    assert cert.serial == 42
+    assert cert.cert_type == "host"
+    assert cert.key_id == "host.example.com"
+    assert cert.principals == ["host.example.com", "10.0.0.1"]
+    assert cert.valid_after == VALID_AFTER
+    assert cert.valid_before == VALID_BEFORE
+    assert cert.critical_options == {"force-command": "/bin/true"}
+    assert cert.extensions == ["permit-pty", "permit-X11-forwarding"]
+    assert cert.signature_key_fingerprint == sshcert.key_fingerprint(string(b"ssh-ed25519") + string(b"c" * 32))
+    assert cert.to_dict()["valid_before"] == "2024-01-31T00:00:00Z"
+
+
+def test_parse_certificate_security_key(sshcert):
+    cert = sshcert.parse_certificate(cert_blob("sk-ssh-ed25519-cert-v01@openssh.com", (b"k" * 32, b"ssh:")))
+    assert cert.public_key == string(b"sk-ssh-ed25519@openssh.com") + string(b"k" * 32) + string(b"ssh:")
+
+
+def test_parse_certificate_empty_fields(sshcert):
+    cert = sshcert.parse_certificate(cert_blob(cert_type=1, key_id=b"", principals=(), critical_options=(),
+                                               extensions=()))
+    assert cert.cert_type == "user"
+    assert cert.key_id == ""
+    assert not cert.principals
+    assert not cert.critical_options
+    assert not cert.extensions
+
+
+def test_parse_certificate_forever(sshcert):
+    cert = sshcert.parse_certificate(cert_blob(valid_after=0, valid_before=sshcert.FOREVER))
+    assert cert.valid_before is None
+    assert cert.to_dict()["valid_before"] == "forever"
+    assert not cert.needs_renewal(datetime.timedelta(days=365 * 1000))
+
+
+def test_parse_certificate_clamps_timestamps(sshcert):
+    cert = sshcert.parse_certificate(cert_blob(valid_before=sshcert.FOREVER - 1))
+    assert cert.valid_before.year == 9999
+
+
+def test_parse_certificate_binary_option(sshcert):
+    # Option data that is not a string field is returned as hex
+    cert = sshcert.parse_certificate(cert_blob(critical_options=(("source-address", b"\x00\x01"),)))
+    assert cert.critical_options == {"source-address": "0001"}
+
+
+def test_parse_certificate_truncated(sshcert):
+    blob = cert_blob()
+    for length in range(len(blob)):
+        with pytest.raises(sshcert.SshCertificateParseError):
+            sshcert.parse_certificate(blob[:length])
+
+
+@pytest.mark.parametrize("blob_args", [
+    {"key_type": "ssh-ed25519"},
+    {"key_type": "unknown-cert-v01@openssh.com"},
+    {"cert_type": 3},
+    {"key_id": b"\xff\xfe"},
+    {"principals": (b"\xc3\x28",)},
+])
+def test_parse_certificate_invalid(sshcert, blob_args):
+    with pytest.raises(sshcert.SshCertificateParseError):
+        sshcert.parse_certificate(cert_blob(**blob_args))
+
+
+def test_parse_certificate_oversized_length(sshcert):
+    blob = string(ED25519_CERT.encode("ascii")) + struct.pack(">I", 0xFFFFFFFF) + b"nonce"
+    with pytest.raises(sshcert.SshCertificateParseError):
+        sshcert.parse_certificate(blob)
+
+
+@pytest.mark.parametrize("now, expires_in, expected", [
+    (datetime.datetime(2024, 1, 10, tzinfo=datetime.timezone.utc), None, False),
+    # The default renewal window is the last third of the lifetime
+    (datetime.datetime(2024, 1, 21, tzinfo=datetime.timezone.utc), None, True),
+    (datetime.datetime(2024, 1, 10, tzinfo=datetime.timezone.utc), datetime.timedelta(days=25), True),
+    (datetime.datetime(2024, 2, 1, tzinfo=datetime.timezone.utc), datetime.timedelta(0), True),
+])
+def test_needs_renewal(sshcert, now, expires_in, expected):
+    assert sshcert.parse_certificate(cert_blob()).needs_renewal(expires_in, now) is expected
+
+
+@pytest.mark.parametrize("line", [b"", b"ssh-ed25519", b"ssh-ed25519 not*base64", b"\xff AAAA"])
+def test_read_public_key_blob_invalid(sshcert, line):
+    with pytest.raises(sshcert.SshCertificateParseError):
+        sshcert.read_public_key_blob(line)
+
+
+def test_load_certificate(sshcert, tmp_path):
+    path = tmp_path / "host-cert.pub"
+    path.write_bytes(ED25519_CERT.encode("ascii") + b" " + base64.b64encode(cert_blob()) + b" comment\n")
+    assert sshcert.load_certificate(path.as_posix()).key_id == "host.example.com"
+
+
+def test_load_certificate_type_mismatch(sshcert, tmp_path):
+    path = tmp_path / "host-cert.pub"
+    path.write_bytes(b"ssh-rsa-cert-v01@openssh.com " + base64.b64encode(cert_blob()) + b"\n")
+    with pytest.raises(sshcert.SshCertificateParseError):
+        sshcert.load_certificate(path.as_posix())
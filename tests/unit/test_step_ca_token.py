@@ -0,0 +1,39 @@
+# pylint: disable=redefined-outer-name
+import importlib
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import pytest
+
+
+@pytest.fixture
+def step_ca_token(collection):
+    return importlib.import_module(f"{collection}.plugins.modules.step_ca_token")
+
+
+class FileTokenGenerator:
+    """Stands in for NativeTokenGenerator, writing a fixed token to output_file"""
+
+    def generate(self, params: Dict[str, Any]) -> str:
+        with open(params["output_file"], "w", encoding="utf-8") as f:
+            f.write("token")
+        return "token"
+
+
+def item(output_file: str) -> Dict[str, Any]:
+    return {"output_file": output_file, "force": True, "ssh": False, "revoke": False, "renew": False,
+            "rekey": False}
+
+
+def test_native_tokens_excludes_failed_writes(step_ca_token, monkeypatch, tmp_path):
+    monkeypatch.setattr(step_ca_token.NativeTokenGenerator, "create", lambda executable, module: FileTokenGenerator())
+    module = SimpleNamespace(params={"native_signing": True, "max_workers": 1}, check_mode=False)
+    items = [item((tmp_path / "token").as_posix()), item((tmp_path / "missing" / "token").as_posix())]
+    outcomes: List[Dict[str, Any]] = [{}, {}]
+    result: Dict[str, Any] = {}
+
+    step_ca_token.generate_tokens(None, module, items, outcomes, [0, 1], result)
+    assert outcomes[0] == {"token": "token"}
+    assert outcomes[1]["failed"]
+    assert outcomes[1]["msg"].startswith(f"Could not write token to {items[1]['output_file']}")
+    assert result["native_tokens"] == 1
@@ -0,0 +1,46 @@
+# pylint: disable=redefined-outer-name
+import importlib
+
+import pytest
+
+
+@pytest.fixture
+def step_ssh_certificate(collection):
+    return importlib.import_module(f"{collection}.plugins.modules.step_ssh_certificate")
+
+
+@pytest.mark.parametrize("key_id, expected", [
+    ("alice", "alice"),
+    ("alice@example.com", "alice"),
+    ("Alice@example.com", "alice"),
+    ("first+tag@x", "first_tag"),
+    ("first.last-1@example.com", "first.last-1"),
+    # Only the part after the last @ is removed
+    ("a@b@example.com", "a_b"),
+    ("jürgen@example.com", "j_rgen"),
+])
+def test_sanitize_user_principal(step_ssh_certificate, key_id, expected):
+    assert step_ssh_certificate.sanitize_user_principal(key_id) == expected
+
+
+@pytest.mark.parametrize("key_id, host, principals, expected", [
+    ("Alice@example.com", False, ["alice"], ""),
+    ("first+tag@x", False, ["first_tag"], ""),
+    ("alice@example.com", False, ["alice@example.com"], ""),
+    ("Alice@example.com", False, ["Alice"], "do not include the key ID"),
+    ("host.example.com", True, ["host.example.com"], ""),
+    ("Host.example.com", True, ["host.example.com"], "do not include the key ID"),
+])
+def test_cert_needs_recreation_default_principals(step_ssh_certificate, monkeypatch, tmp_path, key_id, host,
+                                                  principals, expected):
+    data = {"type": "host" if host else "user", "key_id": key_id, "principals": principals,
+            "public_key_fingerprint": ""}
+    monkeypatch.setattr(step_ssh_certificate.helpers, "get_ssh_renewal_info",
+                        lambda *args: step_ssh_certificate.helpers.CertificateInfo(data, True))
+    params = {"expires_in": None, "host": host, "key_id": key_id, "principal": None}
+    reason = step_ssh_certificate.cert_needs_recreation(None, None, params, tmp_path / "id-cert.pub",
+                                                        tmp_path / "id.pub")
+    if expected:
+        assert expected in reason
+    else:
+        assert reason == ""